@@ -0,0 +1,105 @@
+import argparse
+from train import run_batch, EarlyStopping, ReferenceSet
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate music with GA for many reference midi files in one run."
+    )
+    parser.add_argument(
+        "source", help="a folder of reference midi files, or a json manifest"
+    )
+    parser.add_argument("-o", "--output", default="midi/batch", help="output folder")
+    parser.add_argument(
+        "-n", "--variations", type=int, default=1, help="pieces for each reference"
+    )
+    parser.add_argument("-p", "--population", type=int, default=20)
+    parser.add_argument("-m", "--mutation", type=float, default=0.8)
+    parser.add_argument("-i", "--iteration", type=int, default=1000)
+    parser.add_argument(
+        "-j", "--processes", type=int, default=None, help="all the cores by default"
+    )
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--no-accompaniment", action="store_true")
+    parser.add_argument(
+        "--cache",
+        default="midi/.cache",
+        help="folder of the parsed references, empty to disable it",
+    )
+    parser.add_argument(
+        "--patience",
+        type=int,
+        default=None,
+        help="stop a phase after so many generations without improvement",
+    )
+    parser.add_argument(
+        "--plateau",
+        type=int,
+        default=None,
+        help="stop a phase when it improves by less than 0.1%% in so many generations",
+    )
+    parser.add_argument(
+        "--time-budget", type=float, default=None, help="seconds of each phase"
+    )
+    parser.add_argument(
+        "--evaluation-budget",
+        type=int,
+        default=None,
+        help="fitness evaluations of each phase",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        type=int,
+        default=0,
+        help="save the state every so many generations to resume a killed run",
+    )
+    parser.add_argument(
+        "--style",
+        default=None,
+        help="train the pitch against all the midi files in a folder or manifest",
+    )
+    parser.add_argument(
+        "--nearest",
+        action="store_true",
+        help="score by the nearest file of the style instead of their mean",
+    )
+    parser.add_argument(
+        "-v", "--verbose", action="store_true", help="print the training output"
+    )
+    args = parser.parse_args()
+
+    stopping = None
+    if (
+        args.patience is not None
+        or args.plateau is not None
+        or args.time_budget is not None
+        or args.evaluation_budget is not None
+    ):
+        stopping = EarlyStopping(
+            patience=args.patience,
+            window=args.plateau,
+            time_budget=args.time_budget,
+            evaluation_budget=args.evaluation_budget,
+        )
+
+    run_batch(
+        args.source,
+        args.output,
+        args.variations,
+        args.population,
+        args.mutation,
+        args.iteration,
+        not args.no_accompaniment,
+        args.processes,
+        args.seed,
+        args.verbose,
+        args.cache or None,
+        stopping,
+        args.checkpoint,
+        args.style,
+        ReferenceSet.NEAREST if args.nearest else ReferenceSet.MEAN,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+import io
+import sys
+import json
+import random
+import argparse
+import platform
+import statistics
+import numpy as np
+from time import perf_counter
+from contextlib import redirect_stdout
+from typing import Callable, Dict, Tuple
+from midoWrapper import *
+from train import train, repeat_reference
+from train.base import random_population, random_population_on_rhythm
+from train.pitch import GAForPitch, PitchParameter
+from train.rhythm import GAForRhythm, RhythmParameter
+
+reference_file = "midi/reference.mid"
+seed = 0
+
+# Each case returns a function to be timed, prepared with a fixed seed
+Case_T = Callable[[], Callable[[], object]]
+
+
+def reference_of_bars(bars: int) -> Track:
+    return repeat_reference(reference_file, bars)
+
+
+def case_from_midi():
+    return lambda: Midi.from_midi(reference_file)
+
+
+def case_from_stream():
+    return lambda: Midi.from_stream(reference_file)
+
+
+def case_split_into_bars():
+    track = reference_of_bars(32)
+
+    def split():
+        # not the bars cached by the first call
+        track.touch()
+        return track.split_into_bars()
+
+    return split
+
+
+def case_to_mido_track():
+    track = reference_of_bars(32)
+    return track.to_mido_track
+
+
+def case_to_bytes():
+    midi = Midi.from_midi(reference_file)
+    return midi.to_bytes
+
+
+def case_transform_batch():
+    genomes = [Genome.from_track(reference_of_bars(32))] * 100
+    steps = [step % 7 - 3 for step in range(len(genomes))]
+    return lambda: batch_transform(genomes, diatonic_transpose, steps, key="C")
+
+
+def case_rhythm_parameter():
+    track = reference_of_bars(32)
+    return lambda: RhythmParameter(track)
+
+
+def case_pitch_parameter():
+    track = reference_of_bars(32)
+    return lambda: PitchParameter(track)
+
+
+def case_rhythm_epoch(population_size: int, bars: int) -> Case_T:
+    def case():
+        ref_track = reference_of_bars(bars)
+        ga = GAForRhythm(random_population(ref_track.sts, population_size), 0.8)
+        return ga.epoch
+
+    return case
+
+
+def case_pitch_epoch(population_size: int, bars: int) -> Case_T:
+    def case():
+        ref_track = reference_of_bars(bars)
+        rhythm = random_population(ref_track.sts, 1)[0].to_track()
+        population = random_population_on_rhythm(ref_track.sts, rhythm, population_size)
+        ga = GAForPitch(ref_track, population, 0.8)
+        return ga.epoch
+
+    return case
+
+
+def case_train(population_size: int, bars: int, iteration_num: int) -> Case_T:
+    def case():
+        ref_track = reference_of_bars(bars)
+
+        def run():
+            with redirect_stdout(io.StringIO()):
+                train(ref_track, population_size, 0.8, iteration_num, seed=seed)
+
+        return run
+
+    return case
+
+
+def all_cases(quick: bool) -> Dict[str, Case_T]:
+    cases = {
+        "from_midi": case_from_midi,
+        "from_stream": case_from_stream,
+        "split_into_bars": case_split_into_bars,
+        "to_mido_track": case_to_mido_track,
+        "to_bytes": case_to_bytes,
+        "transform_batch": case_transform_batch,
+        "rhythm_parameter": case_rhythm_parameter,
+        "pitch_parameter": case_pitch_parameter,
+        "rhythm_epoch": case_rhythm_epoch(20, 8),
+        "pitch_epoch": case_pitch_epoch(20, 8),
+    }
+    sizes = (10, 50) if quick else (10, 20, 50)
+    bar_numbers = (8, 32) if quick else (8, 16, 32)
+    for population_size in sizes:
+        for bars in bar_numbers:
+            cases[f"train_p{population_size}_b{bars}"] = case_train(
+                population_size, bars, 50
+            )
+    return cases
+
+
+def measure(case: Case_T, repeat: int, min_time: float) -> dict:
+    """Time the case `repeat` times, each of them calling it enough times
+    to take `min_time` seconds at least. The case is prepared again with
+    the same seed every time, so that every time does the same work."""
+
+    def run(number: int) -> float:
+        random.seed(seed)
+        func = case()
+        start = perf_counter()
+        for _ in range(number):
+            func()
+        return perf_counter() - start
+
+    # find the number of calls for each time
+    number = 1
+    while True:
+        elapsed = run(number)
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 2 if elapsed == 0 else max(2, int(min_time / elapsed) + 1)
+
+    times = [elapsed / number] + [run(number) / number for _ in range(repeat - 1)]
+    return {
+        "min": min(times),
+        "median": statistics.median(times),
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> Tuple[str, bool]:
+    """The report comparing the median times with the baseline,
+    and whether any case is slower than the baseline beyond the tolerance."""
+    lines, regressed = [], False
+    for name, result in results.items():
+        if name not in baseline:
+            lines.append(f"{name:<24} {result['median'] * 1e3:>12.3f} ms  (new)")
+            continue
+        ratio = result["median"] / baseline[name]["median"]
+        mark = ""
+        if ratio > 1 + tolerance:
+            mark, regressed = "  REGRESSION", True
+        elif ratio < 1 - tolerance:
+            mark = "  faster"
+        lines.append(
+            f"{name:<24} {result['median'] * 1e3:>12.3f} ms  "
+            f"{baseline[name]['median'] * 1e3:>12.3f} ms  x{ratio:.2f}{mark}"
+        )
+    return "\n".join(lines), regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the hot paths of midoWrapper and the GA."
+    )
+    parser.add_argument("-o", "--output", help="save the results in a json file")
+    parser.add_argument("-b", "--baseline", help="compare with the saved results")
+    parser.add_argument(
+        "-k", "--filter", default="", help="only the cases containing it"
+    )
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    parser.add_argument(
+        "--min-time", type=float, default=0.05, help="seconds of each measure"
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="allowed slowdown, 0.2 for 20%%"
+    )
+    parser.add_argument("--quick", action="store_true", help="fewer train cases")
+    args = parser.parse_args()
+
+    results = {}
+    for name, case in all_cases(args.quick).items():
+        if args.filter in name:
+            results[name] = measure(case, args.repeat, args.min_time)
+            print(f"{name:<24} {results[name]['median'] * 1e3:>12.3f} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "python": platform.python_version(),
+                    "numpy": np.__version__,
+                    "machine": platform.platform(),
+                    "seed": seed,
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        report, regressed = compare(results, baseline, args.tolerance)
+        print(f"\n{'case':<24} {'now':>15}  {'baseline':>15}")
+        print(report)
+        if regressed:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,4 @@
-from time import time
-from midoWrapper import Midi
-from train import train
+from train import generate
 
 reference_file = "midi/reference.mid"
 output_file = "midi/result.mid"
@@ -9,27 +7,32 @@ with_accompaniment = True
 mutation_rate = 0.8
 iteration_num = 1000
 population_size = 20
+workers = 0  # processes for fitness evaluation, 0 for none, None for all cores
+seed = None
+islands = 0  # populations in parallel processes with migration, 0 for one
+# e.g. EarlyStopping(patience=200, time_budget=60) imported from train,
+# None to run all the iterations
+stopping = None
+# e.g. Checkpoint("midi/result.ckpt.npz", 50) imported from train, to save the state
+# every 50 generations, and continue from it the next time if the run is killed
+checkpoint = None
 
 
 def main():
-    t_start = time()
-
-    refmidi = Midi.from_midi(reference_file)
-    ref_track, left_hand = refmidi.tracks
-    result = train(ref_track, population_size, mutation_rate, iteration_num)
-
-    s = Midi(ref_track.sts)
-    s.sts.bpm = 120
-    s.tracks.append(result)
-
-    # accompaniment (stolen from reference)
-    if with_accompaniment:
-        for note in left_hand.note:
-            note.velocity = ref_track.sts.velocity
-        s.tracks.append(left_hand)
-
-    s.save_midi(output_file)
-    print(f"Time cost: {time() - t_start}s")
+    generate(
+        reference_file,
+        output_file,
+        population_size,
+        mutation_rate,
+        iteration_num,
+        with_accompaniment,
+        workers,
+        islands,
+        seed,
+        stopping=stopping,
+        checkpoint=checkpoint,
+        resume=True,
+    )
 
 
 if __name__ == "__main__":
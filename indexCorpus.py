@@ -0,0 +1,66 @@
+import argparse
+from midoWrapper import CorpusIndex
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Index the midi files of a folder, and find the references."
+    )
+    parser.add_argument("folder", nargs="?", help="the folder to index (again)")
+    parser.add_argument(
+        "-d", "--database", default="midi/.cache/corpus.sqlite", help="index file"
+    )
+    parser.add_argument(
+        "-j", "--processes", type=int, default=None, help="all the cores by default"
+    )
+    parser.add_argument("--key", help="e.g. C or Am")
+    parser.add_argument("--rhythm", help="the time signature, e.g. 4/4")
+    parser.add_argument("--min-bars", type=int, default=None)
+    parser.add_argument("--max-bars", type=int, default=None)
+    parser.add_argument("--min-bpm", type=float, default=None)
+    parser.add_argument("--max-bpm", type=float, default=None)
+    parser.add_argument("--min-tracks", type=int, default=None)
+    parser.add_argument("--max-tracks", type=int, default=None)
+    parser.add_argument("-n", "--limit", type=int, default=None)
+    parser.add_argument(
+        "--failures", action="store_true", help="list the files failing to be parsed"
+    )
+    args = parser.parse_args()
+
+    numerator = denominator = None
+    if args.rhythm:
+        numerator, denominator = (int(value) for value in args.rhythm.split("/"))
+
+    with CorpusIndex(args.database) as index:
+        if args.folder:
+            counts = index.update(args.folder, args.processes)
+            print(", ".join(f"{name}: {count}" for name, count in counts.items()))
+
+        if args.failures:
+            for row in index.failures():
+                print(f"{row['path']}: {row['error']}")
+            return
+
+        rows = index.find(
+            key=args.key,
+            numerator=numerator,
+            denominator=denominator,
+            min_bars=args.min_bars,
+            max_bars=args.max_bars,
+            min_bpm=args.min_bpm,
+            max_bpm=args.max_bpm,
+            min_tracks=args.min_tracks,
+            max_tracks=args.max_tracks,
+            limit=args.limit,
+        )
+        for row in rows:
+            print(
+                f"{row['path']}  {row['key']}  {row['numerator']}/{row['denominator']}"
+                f"  {row['bpm']:.0f} bpm  {row['bar_number']} bars"
+                f"  {row['track_number']} tracks"
+            )
+        print(f"{len(rows)} of {len(index)} files")
+
+
+if __name__ == "__main__":
+    main()
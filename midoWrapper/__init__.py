@@ -3,9 +3,12 @@ midoWrapper
 =====
 
 A wrapper module for `mido`. Provide:
-* API for note keys.
+* API for note keys, with precomputed scale tables.
 * A more convenient way for track management.
-* Basic utils for midi file.
+* Basic utils for midi file, with a streaming reader and a direct writer.
+* A compact array-backed genome for the genetic algorithm.
+* Vectorized transforms of the notes of a track or a batch of tracks.
+* An SQLite index of the metadata of a corpus of midi files.
 
 tips: the module not include `mido`, you should import it when you need.
 """
@@ -13,6 +16,23 @@ tips: the module not include `mido`, you should import it when you need.
 # flake8: noqa
 from .musicType import *
 from .musicSettings import MusicSettings
+from .rng import Rng_T, get_rng, numpy_rng, spawn_rngs
+from .scale import ScaleTable, scale_table
 from .note import Note
 from .track import Track, Bar
+from .reader import MidiReader, MidiMessage
+from .writer import encode_midi, encode_track, write_midi
 from .midi import Midi
+from .genome import Genome, BarIndex, NOTE_DTYPE, split_bars
+from .corpus import CorpusIndex, content_hash, describe_midi, midi_files
+from .transform import (
+    stack_notes,
+    unstack_notes,
+    transpose_notes,
+    inverse_notes,
+    diatonic_transpose,
+    retrograde_notes,
+    scale_time,
+    shift_time,
+    batch_transform,
+)
@@ -0,0 +1,327 @@
+import os
+import time
+import hashlib
+import sqlite3
+from multiprocessing import Pool
+from typing import Iterator, List, Optional, Tuple
+
+from .musicSettings import MusicSettings
+from .genome import Genome
+from .midi import Midi
+
+# Change it when the schema or the extracted values change, to index again
+INDEX_VERSION = 1
+
+_schema = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    key TEXT,
+    bpm REAL,
+    numerator INTEGER,
+    denominator INTEGER,
+    bar_number INTEGER,
+    track_number INTEGER,
+    error TEXT,
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tracks (
+    path TEXT NOT NULL REFERENCES files(path) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    instrument INTEGER NOT NULL,
+    note_number INTEGER NOT NULL,
+    bar_number INTEGER NOT NULL,
+    note_density REAL NOT NULL,
+    pitch_min INTEGER,
+    pitch_max INTEGER,
+    PRIMARY KEY (path, idx)
+);
+CREATE INDEX IF NOT EXISTS files_key ON files(key);
+CREATE INDEX IF NOT EXISTS files_bar_number ON files(bar_number);
+"""
+
+_file_columns = (
+    "path",
+    "mtime",
+    "size",
+    "hash",
+    "key",
+    "bpm",
+    "numerator",
+    "denominator",
+    "bar_number",
+    "track_number",
+    "error",
+    "indexed_at",
+)
+_track_columns = (
+    "path",
+    "idx",
+    "instrument",
+    "note_number",
+    "bar_number",
+    "note_density",
+    "pitch_min",
+    "pitch_max",
+)
+
+# The files indexed by a worker: (path, mtime, size, hash)
+_Stat_T = Tuple[str, float, int, Optional[str]]
+
+
+def content_hash(filename: str) -> str:
+    """The hash of the content of the file."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def midi_files(folder: str) -> Iterator[str]:
+    """The midi files in the folder and its subfolders."""
+    for root, folders, names in os.walk(folder):
+        folders.sort()
+        for name in sorted(names):
+            if name.lower().endswith((".mid", ".midi")):
+                yield os.path.join(root, name)
+
+
+def describe_midi(filename: str) -> Tuple[dict, List[dict]]:
+    """The metadata of the midi file, and of each of its tracks of notes.
+    The file is read by `Midi.iter_tracks`, without mido."""
+    settings = MusicSettings()
+    tracks = []
+    for idx, track in enumerate(Midi.iter_tracks(filename, settings=settings)):
+        notes = Genome.from_track(track).notes
+        bar_number = track.bar_number if len(notes) else 0
+        tracks.append(
+            {
+                "idx": idx,
+                "instrument": track.instrument,
+                "note_number": len(notes),
+                "bar_number": bar_number,
+                # the notes in each bar
+                "note_density": len(notes) / bar_number if bar_number else 0.0,
+                "pitch_min": int(notes["pitch"].min()) if len(notes) else None,
+                "pitch_max": int(notes["pitch"].max()) if len(notes) else None,
+            }
+        )
+    info = {
+        "key": settings.key,
+        "bpm": settings.bpm,
+        "numerator": settings.numerator,
+        "denominator": settings.denominator,
+        "bar_number": max((track["bar_number"] for track in tracks), default=0),
+        "track_number": len(tracks),
+    }
+    return info, tracks
+
+
+def _index_file(stat: _Stat_T) -> Tuple[dict, List[dict]]:
+    # run in the workers: hash the file if needed, and describe it
+    path, mtime, size, known_hash = stat
+    row = {"path": path, "mtime": mtime, "size": size, "indexed_at": time.time()}
+    try:
+        row["hash"] = content_hash(path)
+    except OSError as e:
+        row["hash"], row["error"] = "", str(e)
+        return row, []
+    if row["hash"] == known_hash:
+        # touched but not changed, the rest of the row is kept
+        return row, None
+    try:
+        info, tracks = describe_midi(path)
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+        return row, []
+    row.update(info)
+    for track in tracks:
+        track["path"] = path
+    return row, tracks
+
+
+class CorpusIndex:
+    """An index of the metadata of a corpus of midi files, saved in SQLite,
+    to find the references without parsing the files again.
+
+    `update` indexes the files of a folder in parallel processes, parsing
+    only the new files and those whose content changed: a file with the
+    same modification time and size is skipped without being read, and one
+    with the same hash is not parsed again. The files failing to be parsed
+    are indexed with the error, so they are not retried until changed.
+
+    Use `find` to query the files, or `connection` for any other query."""
+
+    def __init__(self, database: str):
+        folder = os.path.dirname(database)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.database = database
+        self.connection = sqlite3.connect(database)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version != INDEX_VERSION:
+            # outdated, index everything again
+            with self.connection:
+                self.connection.execute("DROP TABLE IF EXISTS tracks")
+                self.connection.execute("DROP TABLE IF EXISTS files")
+                self.connection.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+        self.connection.executescript(_schema)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def update(
+        self,
+        folder: str,
+        processes: int = None,
+        prune: bool = True,
+        batch_size: int = 500,
+    ) -> dict:
+        """Index the midi files in the folder with a pool of processes,
+        one for each core by default, saving every `batch_size` files.
+        If `prune`, remove the files in the folder which no longer exist.
+
+        Return the numbers of the files `indexed` (new or changed),
+        `touched` (changed in time only), `unchanged`, `failed` and `removed`."""
+        known = {
+            row["path"]: (row["mtime"], row["size"], row["hash"])
+            for row in self.connection.execute(
+                "SELECT path, mtime, size, hash FROM files"
+            )
+        }
+        counts = dict.fromkeys(
+            ("indexed", "touched", "unchanged", "failed", "removed"), 0
+        )
+        stats, seen = [], set()
+        for path in midi_files(folder):
+            path = os.path.abspath(path)
+            seen.add(path)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            mtime, size, known_hash = known.get(path, (None, None, None))
+            if mtime == st.st_mtime and size == st.st_size:
+                counts["unchanged"] += 1
+            else:
+                stats.append((path, st.st_mtime, st.st_size, known_hash))
+
+        if stats:
+            # a few chunks for each worker, to balance the load
+            workers = processes or os.cpu_count() or 1
+            chunksize = max(1, min(64, len(stats) // (workers * 4)))
+            with Pool(processes) as pool:
+                results = pool.imap_unordered(_index_file, stats, chunksize)
+                batch = []
+                for row, tracks in results:
+                    batch.append((row, tracks))
+                    if tracks is None:
+                        counts["touched"] += 1
+                    elif "error" in row:
+                        counts["failed"] += 1
+                    else:
+                        counts["indexed"] += 1
+                    if len(batch) >= batch_size:
+                        self._save(batch)
+                        batch = []
+                self._save(batch)
+
+        if prune:
+            root = os.path.join(os.path.abspath(folder), "")
+            removed = [
+                (path,) for path in known if path.startswith(root) and path not in seen
+            ]
+            with self.connection:
+                self.connection.executemany("DELETE FROM files WHERE path = ?", removed)
+            counts["removed"] = len(removed)
+        return counts
+
+    def _save(self, batch: List[Tuple[dict, List[dict]]]):
+        with self.connection:
+            for row, tracks in batch:
+                if tracks is None:
+                    self.connection.execute(
+                        "UPDATE files SET mtime = ?, size = ? WHERE path = ?",
+                        (row["mtime"], row["size"], row["path"]),
+                    )
+                    continue
+                self.connection.execute(
+                    "DELETE FROM files WHERE path = ?", (row["path"],)
+                )
+                self.connection.execute(
+                    f"INSERT INTO files ({', '.join(_file_columns)}) "
+                    f"VALUES ({', '.join('?' * len(_file_columns))})",
+                    tuple(row.get(column) for column in _file_columns),
+                )
+                self.connection.executemany(
+                    f"INSERT INTO tracks ({', '.join(_track_columns)}) "
+                    f"VALUES ({', '.join('?' * len(_track_columns))})",
+                    [
+                        tuple(track[column] for column in _track_columns)
+                        for track in tracks
+                    ],
+                )
+
+    def find(
+        self,
+        key: str = None,
+        numerator: int = None,
+        denominator: int = None,
+        min_bars: int = None,
+        max_bars: int = None,
+        min_bpm: float = None,
+        max_bpm: float = None,
+        min_tracks: int = None,
+        max_tracks: int = None,
+        limit: int = None,
+    ) -> List[sqlite3.Row]:
+        """The files matching all the given conditions, ordered by path,
+        without those failing to be parsed. The rows can be read like dicts."""
+        conditions = [
+            ("key = ?", key),
+            ("numerator = ?", numerator),
+            ("denominator = ?", denominator),
+            ("bar_number >= ?", min_bars),
+            ("bar_number <= ?", max_bars),
+            ("bpm >= ?", min_bpm),
+            ("bpm <= ?", max_bpm),
+            ("track_number >= ?", min_tracks),
+            ("track_number <= ?", max_tracks),
+        ]
+        where, values = ["error IS NULL"], []
+        for condition, value in conditions:
+            if value is not None:
+                where.append(condition)
+                values.append(value)
+        query = f"SELECT * FROM files WHERE {' AND '.join(where)} ORDER BY path"
+        if limit is not None:
+            query += " LIMIT ?"
+            values.append(limit)
+        return self.connection.execute(query, values).fetchall()
+
+    def tracks(self, path: str) -> List[sqlite3.Row]:
+        """The tracks of notes of the indexed file, in order."""
+        return self.connection.execute(
+            "SELECT * FROM tracks WHERE path = ? ORDER BY idx",
+            (os.path.abspath(path),),
+        ).fetchall()
+
+    def failures(self) -> List[sqlite3.Row]:
+        """The files failing to be parsed, with the errors."""
+        return self.connection.execute(
+            "SELECT path, error FROM files WHERE error IS NOT NULL ORDER BY path"
+        ).fetchall()
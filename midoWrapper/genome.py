@@ -0,0 +1,209 @@
+import math
+import numpy as np
+from typing import List, Tuple
+
+from .note import Note
+from .musicSettings import MusicSettings
+from .track import Track
+
+# The compact representation of a note: one record per note
+NOTE_DTYPE = np.dtype(
+    [
+        ("pitch", np.int16),
+        ("length", np.int32),
+        ("start_time", np.int32),
+        ("velocity", np.int16),
+    ]
+)
+
+
+class Genome:
+    """An array-backed track, used as the individual of the genetic algorithm.
+
+    The notes are saved in a numpy structured array with the fields
+    `pitch`, `length`, `start_time` and `velocity`, so copying is cheap.
+    Convert it from and to `Track` only when reading or writing the music.
+
+    `cache` keeps the values calculated from the notes by its user, who
+    should update it when changing the notes. It is copied with the genome.
+
+    `clone` shares the notes between the genomes until one of them changes
+    them: call `detach` before changing the notes in place."""
+
+    __slots__ = ("notes", "sts", "instrument", "cache", "shared")
+
+    def __init__(
+        self,
+        notes: np.ndarray,
+        settings: MusicSettings = None,
+        instrument: int = 0,
+    ):
+        self.notes = notes
+        self.sts = settings
+        self.instrument = instrument
+        self.cache = None
+        self.shared = False  # if the notes may be shared with other genomes
+
+    def __len__(self):
+        return len(self.notes)
+
+    @staticmethod
+    def from_track(track: Track) -> "Genome":
+        """Generate a genome from a track."""
+        notes = np.array(
+            [
+                (note.pitch, note.length, note.start_time, note.velocity)
+                for note in track.note
+            ],
+            dtype=NOTE_DTYPE,
+        )
+        return Genome(notes, track.sts, track.instrument)
+
+    def to_track(self) -> Track:
+        """Generate a track from the genome."""
+        track = Track(self.sts, self.instrument)
+        track.note = [
+            Note(pitch, length, start_time, velocity)
+            for pitch, length, start_time, velocity in self.notes.tolist()
+        ]
+        return track
+
+    def copy(self) -> "Genome":
+        """A copy of the genome, sharing the settings."""
+        genome = Genome(self.notes.copy(), self.sts, self.instrument)
+        if self.cache is not None:
+            genome.cache = self.cache.copy()
+        return genome
+
+    def clone(self) -> "Genome":
+        """A copy-on-write copy of the genome, sharing the notes with it."""
+        genome = Genome(self.notes, self.sts, self.instrument)
+        if self.cache is not None:
+            genome.cache = self.cache.copy()
+        self.shared = genome.shared = True
+        return genome
+
+    def detach(self) -> "Genome":
+        """Own the notes before changing them in place."""
+        if self.shared:
+            self.notes = self.notes.copy()
+            self.shared = False
+        return self
+
+    @property
+    def pitch(self) -> np.ndarray:
+        return self.notes["pitch"]
+
+    @property
+    def length(self) -> np.ndarray:
+        return self.notes["length"]
+
+    @property
+    def start_time(self) -> np.ndarray:
+        return self.notes["start_time"]
+
+    @property
+    def velocity(self) -> np.ndarray:
+        return self.notes["velocity"]
+
+    @property
+    def end_time(self) -> np.ndarray:
+        return self.notes["start_time"] + self.notes["length"]
+
+    @property
+    def full_length(self):
+        """The length of the genome"""
+        return int(self.end_time.max())
+
+    @property
+    def bar_number(self):
+        """The number of bars"""
+        return math.ceil(self.full_length / self.sts.whole)
+
+    @property
+    def key(self):
+        return self.sts.key
+
+    def index_bars(self) -> "BarIndex":
+        """The bars of the genome, as the offsets of the bars in the notes."""
+        return BarIndex(self.notes, self.sts.bar_length, self.bar_number)
+
+
+class BarIndex:
+    """The bars of some notes, as the offsets of the bars in a note array.
+
+    If the notes are ordered by bar and none of them exceeds its bar,
+    which is always the case in the rhythm GA, the array is the notes
+    themselves, and the bars are read-only views of them. Otherwise it is
+    the notes split by `split_bars`, with the exceeding notes split."""
+
+    __slots__ = ("notes", "offsets", "aligned")
+
+    def __init__(self, notes: np.ndarray, bar_length: int, bar_number: int):
+        start = notes["start_time"]
+        bars = start // bar_length
+        self.aligned = bool(
+            np.all(bars[1:] >= bars[:-1])
+            and np.all(start + notes["length"] <= (bars + 1) * bar_length)
+        )
+        if self.aligned:
+            self.notes = notes
+        else:
+            self.notes, _, bars = split_bars(notes, bar_length)
+        # the last bar keeps the parts beyond it, like `np.split`
+        self.offsets = np.empty(bar_number + 1, dtype=np.intp)
+        self.offsets[0], self.offsets[-1] = 0, len(self.notes)
+        self.offsets[1:-1] = np.searchsorted(bars, np.arange(1, bar_number))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def span(self, first: int, last: int) -> np.ndarray:
+        """The notes of the bars from `first` to `last` (excluded),
+        a read-only view without copying."""
+        view = self.notes[self.offsets[first] : self.offsets[max(first, last)]]
+        view.flags.writeable = False
+        return view
+
+    def bar(self, idx: int) -> np.ndarray:
+        """The notes of the bar, a read-only view without copying."""
+        return self.span(idx, idx + 1)
+
+    def bars(self) -> List[np.ndarray]:
+        return [self.bar(idx) for idx in range(len(self))]
+
+
+def split_bars(
+    notes: np.ndarray, bar_length: int, groups: np.ndarray = None
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Split the notes into bars like `Track.split_into_bars`,
+    where the notes exceeding a bar are split into two parts.
+    The notes of several genomes can be split at once,
+    with `groups` giving the genome each note belongs to.
+
+    Return the parts ordered by group and bar, the index of the note
+    each part comes from, and the bar index of each part."""
+    start = notes["start_time"]
+    end = start + notes["length"]
+    bars = start // bar_length
+    cross = end > (bars + 1) * bar_length
+    # the second part is placed right after the first one
+    repeat = np.where(cross, 2, 1)
+    index = np.repeat(np.arange(len(notes)), repeat)
+    part_bars = np.repeat(bars, repeat)
+    part_bars[np.cumsum(repeat)[cross] - 1] += 1
+    if groups is None:
+        order = np.argsort(part_bars, kind="stable")
+    else:
+        order = np.lexsort((part_bars, groups[index]))
+    index, part_bars = index[order], part_bars[order]
+
+    segments = notes[index]
+    start, end = start[index], end[index]
+    bar_time = part_bars * bar_length
+    first = end > bar_time + bar_length
+    second = start < bar_time
+    segments["length"][first] = bar_time[first] + bar_length - start[first]
+    segments["start_time"][second] = bar_time[second]
+    segments["length"][second] = end[second] - bar_time[second]
+    return segments, index, part_bars
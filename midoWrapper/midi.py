@@ -1,8 +1,9 @@
-import os
 import mido
-from typing import List
+from typing import BinaryIO, Iterator, List, Union
 from .musicSettings import MusicSettings
 from .track import Track
+from .reader import MidiReader, until_time
+from .writer import encode_midi, write_midi
 
 
 class Midi:
@@ -75,11 +76,62 @@ class Midi:
         ga_midi.sts.bar_number = max(track.bar_number for track in ga_midi.tracks)
         return ga_midi
 
+    @staticmethod
+    def from_stream(
+        source: Union[str, bytes, BinaryIO],
+        max_tracks: int = None,
+        max_bars: int = None,
+    ) -> "Midi":
+        """Read a midi file like `from_midi`, but parse it directly from
+        the bytes track by track, reading only the first `max_tracks` tracks
+        of notes and the notes starting in the first `max_bars` bars."""
+        ga_midi = Midi()
+        ga_midi.tracks = list(
+            Midi.iter_tracks(source, max_tracks, max_bars, ga_midi.sts)
+        )
+        ga_midi.sts.bar_number = max(track.bar_number for track in ga_midi.tracks)
+        return ga_midi
+
+    @staticmethod
+    def iter_tracks(
+        source: Union[str, bytes, BinaryIO],
+        max_tracks: int = None,
+        max_bars: int = None,
+        settings: MusicSettings = None,
+    ) -> Iterator[Track]:
+        """Generate the tracks of a midi file one by one, with at most
+        `max_tracks` tracks of notes and the notes starting in the first
+        `max_bars` bars. The parameters of the music are saved in `settings`
+        before the first track. Stop reading the file when stopped."""
+        ga_midi = Midi(settings)
+        parsed, count = False, 0
+        if max_tracks is not None and max_tracks <= 0:
+            return
+        with MidiReader(source) as reader:
+            for messages in reader.tracks():
+                if not parsed:
+                    # the whole first track is needed to find the parameters
+                    messages = list(messages)
+                    ga_midi._parse_midi_parameters(messages)
+                    parsed = True
+                    if Midi._is_meta_track(messages):
+                        continue
+                if max_bars is not None:
+                    messages = until_time(messages, max_bars * ga_midi.sts.bar_length)
+                yield Track(ga_midi.sts).from_mido_track(messages)
+                count += 1
+                if max_tracks is not None and count >= max_tracks:
+                    # stop before reading the next chunk
+                    return
+
     def save_midi(self, filename: str):
-        """Save a midi file."""
-        midi = self.to_mido_midi()
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
-        midi.save(filename)
+        """Save a midi file.
+        The bytes are written directly, the same as saving `to_mido_midi()`."""
+        write_midi(filename, self.sts, self.tracks)
+
+    def to_bytes(self) -> bytes:
+        """The bytes of the midi file."""
+        return encode_midi(self.sts, self.tracks)
 
     @staticmethod
     def _is_meta_track(track: mido.MidiTrack):
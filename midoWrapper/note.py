@@ -1,37 +1,15 @@
-from random import randint
 from .musicType import *
 
-note_name_dict = {
-    "C": 0,
-    "C#": 1,
-    "Cb": -1,
-    "D": 2,
-    "D#": 3,
-    "Db": 1,
-    "E": 4,
-    "E#": 5,
-    "Eb": 3,
-    "F": 5,
-    "Fb": 4,
-    "G": 7,
-    "G#": 8,
-    "Gb": 6,
-    "A": 9,
-    "A#": 10,
-    "Ab": 8,
-    "B": 11,
-    "B#": 12,
-    "Bb": 10,
-}
-
-
-# offset of the notes in the major mode and minor mode
-major_offset = (0, 2, 4, 5, 7, 9, 11)
-minor_offset = (0, 2, 3, 5, 7, 8, 10)
-
-# The range of notes to be generated
-NOTE_MIN = 60  # C4
-NOTE_MAX = 84  # C6
+# The names and the scales are kept in `scale`, and imported here for the old users
+from .scale import (
+    note_name_dict,
+    major_offset,
+    minor_offset,
+    NOTE_MIN,
+    NOTE_MAX,
+    scale_table,
+)
+from .rng import Rng_T
 
 
 class Note:
@@ -53,39 +31,27 @@ class Note:
     @staticmethod
     def in_mode(pitch: Pitch_T, key: Key_T):
         """Judge if the note is in the given mode."""
-        if key.endswith("m"):
-            # minor mode
-            base = note_name_dict[key[:-1]]
-            return (pitch - base) % 12 in minor_offset
-        else:
-            # major mode
-            base = note_name_dict[key]
-            return (pitch - base) % 12 in major_offset
+        return scale_table(key).in_mode(pitch)
 
     @staticmethod
     def random_pitch_in_mode(
-        key: Key_T, min_pitch: Pitch_T = NOTE_MIN, max_pitch: Pitch_T = NOTE_MAX
+        key: Key_T,
+        min_pitch: Pitch_T = NOTE_MIN,
+        max_pitch: Pitch_T = NOTE_MAX,
+        rng: Rng_T = None,
     ):
         """Generate a random note in the given mode
         with the pitch in the range [min_pitch, max_pitch]."""
-        while True:
-            pitch = randint(max(min_pitch, NOTE_MIN), min(max_pitch, NOTE_MAX))
-            if Note.in_mode(pitch, key):
-                return pitch
+        return scale_table(key).random_pitch(
+            max(min_pitch, NOTE_MIN), min(max_pitch, NOTE_MAX), rng=rng
+        )
 
     @staticmethod
     def ord_in_mode(pitch: Pitch_T, key: Key_T):
         """Get the order of the note in the given mode.
         For example, in C major, C is 1, D is 2, E is 3, etc.
         Raise error if the note is not in the mode."""
-        if key.endswith("m"):
-            # minor mode
-            base = note_name_dict[key[:-1]]
-            return minor_offset.index((pitch - base) % 12) + 1
-        else:
-            # major mode
-            base = note_name_dict[key]
-            return major_offset.index((pitch - base) % 12) + 1
+        return scale_table(key).ord_in_mode(pitch)
 
     @staticmethod
     def name_to_pitch(note_name: str) -> Pitch_T:
@@ -0,0 +1,233 @@
+import io
+import struct
+from typing import BinaryIO, Iterator, Union
+
+# The number of data bytes after the status byte, by the high nibble of
+# the channel messages, and by the status byte of the system messages
+_channel_data_length = {0x8: 2, 0x9: 2, 0xA: 2, 0xB: 2, 0xC: 1, 0xD: 1, 0xE: 2}
+_system_data_length = {0xF1: 1, 0xF2: 2, 0xF3: 1}
+
+_channel_types = {
+    0x8: "note_off",
+    0x9: "note_on",
+    0xA: "polytouch",
+    0xB: "control_change",
+    0xC: "program_change",
+    0xD: "aftertouch",
+    0xE: "pitchwheel",
+}
+
+# (sharps or -flats, minor) -> key, the same as mido
+_key_signature_decode = {
+    **{
+        (sf, 0): key
+        for sf, key in zip(
+            range(-7, 8),
+            "Cb Gb Db Ab Eb Bb F C G D A E B F# C#".split(),
+        )
+    },
+    **{
+        (sf, 1): key
+        for sf, key in zip(
+            range(-7, 8),
+            "Abm Ebm Bbm Fm Cm Gm Dm Am Em Bm F#m C#m G#m D#m A#m".split(),
+        )
+    },
+}
+
+
+class MidiMessage:
+    """A lightweight midi message with the attributes of the mido message
+    of the same type used by this package, e.g. `note` and `velocity`."""
+
+    def __init__(self, type: str, time: int, **attributes):
+        self.type = type
+        self.time = time
+        self.__dict__.update(attributes)
+
+    def copy(self, **attributes) -> "MidiMessage":
+        """A copy of the message with the given attributes changed."""
+        return MidiMessage(**{**self.__dict__, **attributes})
+
+    def __repr__(self):
+        attributes = " ".join(f"{k}={v}" for k, v in self.__dict__.items())
+        return f"<MidiMessage {attributes}>"
+
+
+def _read_variable_int(data: bytes, pos: int):
+    value = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value = (value << 7) | (byte & 0x7F)
+        if byte < 0x80:
+            return value, pos
+
+
+def _meta_message(meta_type: int, data: bytes, time: int) -> MidiMessage:
+    if meta_type == 0x51:
+        tempo = (data[0] << 16) | (data[1] << 8) | data[2]
+        return MidiMessage("set_tempo", time, tempo=tempo)
+    if meta_type == 0x58:
+        return MidiMessage(
+            "time_signature", time, numerator=data[0], denominator=2 ** data[1]
+        )
+    if meta_type == 0x59:
+        sf = data[0] - 256 if data[0] > 127 else data[0]
+        key = _key_signature_decode[sf, data[1]]
+        return MidiMessage("key_signature", time, key=key)
+    if meta_type == 0x2F:
+        return MidiMessage("end_of_track", time)
+    return MidiMessage("meta", time, meta_type=meta_type, data=data)
+
+
+def parse_track(data: bytes) -> Iterator[MidiMessage]:
+    """Parse the messages in the data of a track chunk one by one,
+    the same as mido reads them."""
+    pos, last_status = 0, None
+    while pos < len(data):
+        delta, pos = _read_variable_int(data, pos)
+        status = data[pos]
+        pos += 1
+        if status < 0x80:
+            # running status, the byte is the first data byte
+            if last_status is None:
+                raise OSError("running status without last_status")
+            status = last_status
+            pos -= 1
+        elif status != 0xFF:
+            # meta messages don't set running status
+            last_status = status
+
+        if status == 0xFF:
+            meta_type = data[pos]
+            length, pos = _read_variable_int(data, pos + 1)
+            yield _meta_message(meta_type, data[pos : pos + length], delta)
+            pos += length
+        elif status in (0xF0, 0xF7):
+            length, pos = _read_variable_int(data, pos)
+            yield MidiMessage("sysex", delta, data=data[pos : pos + length])
+            pos += length
+        elif status < 0xF0:
+            kind, channel = status >> 4, status & 0x0F
+            values = data[pos : pos + _channel_data_length[kind]]
+            pos += _channel_data_length[kind]
+            if kind in (0x8, 0x9):
+                yield MidiMessage(
+                    _channel_types[kind],
+                    delta,
+                    channel=channel,
+                    note=values[0],
+                    velocity=values[1],
+                )
+            elif kind == 0xC:
+                yield MidiMessage(
+                    "program_change", delta, channel=channel, program=values[0]
+                )
+            else:
+                yield MidiMessage(
+                    _channel_types[kind], delta, channel=channel, data=values
+                )
+        else:
+            length = _system_data_length.get(status, 0)
+            values = data[pos : pos + length]
+            yield MidiMessage("system", delta, status=status, data=values)
+            pos += length
+
+
+class MidiReader:
+    """Read a midi file track by track, directly from its bytes.
+
+    Only the header and the track being parsed are kept in memory,
+    and nothing after the first `max_tracks` tracks is read.
+    The source can be a file name, the bytes of the file or a binary file."""
+
+    def __init__(self, source: Union[str, bytes, BinaryIO]):
+        # only close the file opened here
+        self.owned = not hasattr(source, "read")
+        if isinstance(source, str):
+            self.file = open(source, "rb")
+        elif isinstance(source, (bytes, bytearray)):
+            self.file = io.BytesIO(source)
+        else:
+            self.file = source
+        name, size = self._read_chunk_header()
+        if name != b"MThd":
+            raise OSError("MThd not found. Probably not a MIDI file")
+        header = self.file.read(size)
+        self.type, self.track_number, self.ticks_per_beat = struct.unpack(
+            ">hhh", header[:6]
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self.owned:
+            self.file.close()
+
+    def _read_chunk_header(self):
+        header = self.file.read(8)
+        if len(header) < 8:
+            raise EOFError("unexpected end of the midi file")
+        name, size = struct.unpack(">4sL", header)
+        return name, size
+
+    def track_chunks(self, max_tracks: int = None) -> Iterator[bytes]:
+        """The data of the track chunks, read one by one."""
+        count = self.track_number if max_tracks is None else max_tracks
+        count = min(count, self.track_number)
+        read = 0
+        while read < count:
+            try:
+                name, size = self._read_chunk_header()
+            except EOFError:
+                return
+            if name != b"MTrk":
+                # skip the unknown chunks
+                self.file.seek(size, io.SEEK_CUR)
+                continue
+            read += 1
+            yield self.file.read(size)
+
+    def tracks(self, max_tracks: int = None) -> Iterator[Iterator[MidiMessage]]:
+        """The messages of the tracks, parsed one track at a time."""
+        for data in self.track_chunks(max_tracks):
+            yield parse_track(data)
+
+
+def until_time(
+    messages: Iterator[MidiMessage], limit: int
+) -> Iterator[MidiMessage]:
+    """The messages of the notes starting before `limit` (and the others
+    before it), with the time counted like `Track.from_mido_track` does.
+    Stop reading as soon as all these notes end."""
+    time, skipped, playing, stopped = 0, 0, set(), False
+    for msg in messages:
+        if msg.type not in ("note_on", "note_off"):
+            if not stopped:
+                yield msg
+            continue
+        time += msg.time
+        # a note_on without velocity ends the note too
+        note_off = msg.type == "note_off" or msg.velocity == 0
+        if not note_off and time >= limit:
+            stopped = True
+        if stopped and not (note_off and msg.note in playing):
+            # the message of a note after the limit
+            skipped += msg.time
+            continue
+
+        if note_off:
+            playing.discard(msg.note)
+        else:
+            playing.add(msg.note)
+        if skipped:
+            msg = msg.copy(time=msg.time + skipped)
+            skipped = 0
+        yield msg
+        if stopped and not playing:
+            return
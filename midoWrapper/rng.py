@@ -0,0 +1,30 @@
+import random
+import numpy as np
+from typing import List, Union
+
+# A generator of `random`, used by everything drawing random numbers here.
+# The module itself works as one: its functions share the global generator.
+Rng_T = random.Random
+
+
+def get_rng(rng: Rng_T = None) -> Rng_T:
+    """The given generator, or the global one of `random` if None,
+    so that `random.seed` still makes the results reproducible."""
+    return random if rng is None else rng
+
+
+def numpy_rng(rng: Union[Rng_T, np.random.Generator] = None) -> np.random.Generator:
+    """A numpy generator for drawing many numbers at once,
+    seeded from the given generator (see `get_rng`)."""
+    if isinstance(rng, np.random.Generator):
+        return rng
+    return np.random.default_rng(get_rng(rng).getrandbits(64))
+
+
+def spawn_rngs(seed: int, number: int) -> List[Rng_T]:
+    """Independent generators for the workers, derived from one seed.
+    They are seeded from the entropy of the system if the seed is None."""
+    return [
+        random.Random(int.from_bytes(child.generate_state(4).tobytes(), "little"))
+        for child in np.random.SeedSequence(seed).spawn(number)
+    ]
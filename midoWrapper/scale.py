@@ -0,0 +1,126 @@
+import numpy as np
+from functools import lru_cache
+from typing import Tuple, Union
+from .musicType import *
+from .rng import Rng_T, get_rng, numpy_rng
+
+note_name_dict = {
+    "C": 0,
+    "C#": 1,
+    "Cb": -1,
+    "D": 2,
+    "D#": 3,
+    "Db": 1,
+    "E": 4,
+    "E#": 5,
+    "Eb": 3,
+    "F": 5,
+    "Fb": 4,
+    "G": 7,
+    "G#": 8,
+    "Gb": 6,
+    "A": 9,
+    "A#": 10,
+    "Ab": 8,
+    "B": 11,
+    "B#": 12,
+    "Bb": 10,
+}
+
+
+# offset of the notes in the major mode and minor mode
+major_offset = (0, 2, 4, 5, 7, 9, 11)
+minor_offset = (0, 2, 3, 5, 7, 8, 10)
+
+# The range of notes to be generated
+NOTE_MIN = 60  # C4
+NOTE_MAX = 84  # C6
+
+# All the midi pitches
+PITCH_NUMBER = 128
+
+
+class ScaleTable:
+    """The precomputed pitches of a key, so that judging and sampling
+    the pitches in the mode need neither parsing the key nor retrying.
+
+    `degree` is the order in the mode of the 12 pitch classes starting from C,
+    0 for those not in the mode. `pitches` and `tonics` are all the midi
+    pitches in the mode and of the tonic, in ascending order."""
+
+    def __init__(self, key: Key_T):
+        self.key = key
+        minor = key.endswith("m")
+        base = note_name_dict[key[:-1] if minor else key]
+        self.degree = np.zeros(12, dtype=int)
+        for order, offset in enumerate(minor_offset if minor else major_offset, 1):
+            self.degree[(base + offset) % 12] = order
+        # the python list is faster for looking up a single pitch
+        self.degree_list = self.degree.tolist()
+
+        all_pitches = np.arange(PITCH_NUMBER)
+        self.pitches = all_pitches[self.degree[all_pitches % 12] > 0]
+        self.tonics = all_pitches[self.degree[all_pitches % 12] == 1]
+        for table in (self.degree, self.pitches, self.tonics):
+            table.flags.writeable = False  # shared by all the users of the key
+        self._ranges = {}
+
+    def in_mode(self, pitch: Pitch_T) -> bool:
+        return self.degree_list[pitch % 12] > 0
+
+    def ord_in_mode(self, pitch: Pitch_T) -> int:
+        order = self.degree_list[pitch % 12]
+        if order == 0:
+            raise ValueError(f"Pitch {pitch} is not in the mode {self.key}")
+        return order
+
+    def pitches_in_range(
+        self, min_pitch: Pitch_T, max_pitch: Pitch_T, tonic: bool = False
+    ) -> Tuple[Pitch_T, ...]:
+        """The pitches (or only the tonics) in the mode
+        in the range [min_pitch, max_pitch]."""
+        range_key = (min_pitch, max_pitch, tonic)
+        pitches = self._ranges.get(range_key)
+        if pitches is None:
+            source = self.tonics if tonic else self.pitches
+            pitches = tuple(
+                source[(source >= min_pitch) & (source <= max_pitch)].tolist()
+            )
+            if not pitches:
+                raise ValueError(
+                    f"No pitch of the mode {self.key} "
+                    f"in the range [{min_pitch}, {max_pitch}]"
+                )
+            self._ranges[range_key] = pitches
+        return pitches
+
+    def random_pitch(
+        self,
+        min_pitch: Pitch_T,
+        max_pitch: Pitch_T,
+        tonic: bool = False,
+        rng: Rng_T = None,
+    ) -> Pitch_T:
+        """A random pitch (or tonic) in the mode
+        in the range [min_pitch, max_pitch]."""
+        return get_rng(rng).choice(self.pitches_in_range(min_pitch, max_pitch, tonic))
+
+    def random_pitches(
+        self,
+        size: int,
+        min_pitch: Pitch_T,
+        max_pitch: Pitch_T,
+        tonic: bool = False,
+        rng: Union[Rng_T, np.random.Generator] = None,
+    ) -> np.ndarray:
+        """`size` random pitches (or tonics) in the mode in the range
+        [min_pitch, max_pitch] at once, drawn by a numpy generator
+        (or one seeded from the generator of `random`, see `numpy_rng`)."""
+        pitches = np.array(self.pitches_in_range(min_pitch, max_pitch, tonic))
+        return pitches[numpy_rng(rng).integers(len(pitches), size=size)]
+
+
+@lru_cache(maxsize=None)
+def scale_table(key: Key_T) -> ScaleTable:
+    """The scale table of the key, built once for each key."""
+    return ScaleTable(key)
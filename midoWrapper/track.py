@@ -1,24 +1,99 @@
 import mido
 import math
-from copy import deepcopy
-from random import choice
-from typing import List
+from typing import Callable, Iterable, List, Tuple
 
 from .note import *
 from .musicSettings import *
+from .rng import Rng_T, get_rng, numpy_rng
 
 
 Bar = List[Note]
 
 
+def _changing(method: Callable) -> Callable:
+    def wrapper(self: "NoteList", *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        self.owner.touch()
+        return result
+
+    wrapper.__name__ = method.__name__
+    return wrapper
+
+
+class NoteList(list):
+    """The list of the notes of a track, telling the track
+    when it is changed, so that the track updates its derived values."""
+
+    def __init__(self, owner: "Track", notes: Iterable[Note] = ()):
+        super().__init__(notes)
+        self.owner = owner
+
+    def __reduce__(self):
+        # copied and pickled with the owner, without telling it
+        return NoteList, (self.owner, list(self))
+
+    append = _changing(list.append)
+    extend = _changing(list.extend)
+    insert = _changing(list.insert)
+    pop = _changing(list.pop)
+    remove = _changing(list.remove)
+    clear = _changing(list.clear)
+    sort = _changing(list.sort)
+    reverse = _changing(list.reverse)
+    __setitem__ = _changing(list.__setitem__)
+    __delitem__ = _changing(list.__delitem__)
+    __iadd__ = _changing(list.__iadd__)
+    __imul__ = _changing(list.__imul__)
+
+
 class Track:
-    """A wrapper for mido.MidiTrack."""
+    """A wrapper for mido.MidiTrack.
+
+    The values derived from the time of the notes, like `full_length`,
+    `bar_number` and the bars of the notes, are calculated when first used,
+    and kept until the notes change. Changing the list of notes is noticed,
+    but call `touch` after changing the time of the notes in place.
+    A copy of the track has its own list of the same notes."""
 
     def __init__(self, settings: MusicSettings = None, instrument: int = 0):
         self.instrument = instrument
         self.sts = settings
+        self.version = 0  # increased whenever the notes change
+        self._cache = {}
+        self._cache_version = 0
         self.note: List[Note] = []
 
+    @property
+    def note(self) -> List[Note]:
+        return self._note
+
+    @note.setter
+    def note(self, notes: Iterable[Note]):
+        self._note = NoteList(self, notes)
+        self.touch()
+
+    def touch(self):
+        """Tell the track that its notes have changed."""
+        self.version += 1
+
+    def __copy__(self) -> "Track":
+        # the copy has its own list of the same notes, and its own cache
+        track = type(self).__new__(type(self))
+        track.__dict__.update(self.__dict__)
+        track._cache = {}
+        track._note = NoteList(track, self._note)
+        return track
+
+    def _cached(self, key, compute: Callable):
+        """The value computed from the notes, cached until they change."""
+        if self._cache_version != self.version:
+            # a new dict, never clearing the one a copy may still hold
+            self._cache = {}
+            self._cache_version = self.version
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
     def __str__(self):  # used for debug
         bars = self.split_into_bars()
         msg = ""
@@ -40,6 +115,7 @@ class Track:
         """Generate a track from a mido track.
         Available for chords."""
         ga_track = Track(self.sts)
+        notes = []
         time = 0
         note_dict = {}  # pitch -> (start_time, velocity)
         for msg in track:
@@ -47,15 +123,15 @@ class Track:
                 ga_track.instrument = msg.program
             elif msg.type == "key_signature":
                 ga_track.sts.key = msg.key
-            elif msg.type == "note_on":
+            elif msg.type == "note_on" and msg.velocity > 0:
                 time += msg.time
                 note_dict[msg.note] = (time, msg.velocity)
-            elif msg.type == "note_off":
+            elif msg.type in ("note_on", "note_off"):
+                # a note_on without velocity ends the note too
                 time += msg.time
                 start_time, velocity = note_dict.pop(msg.note)
-                ga_track.note.append(
-                    Note(msg.note, time - start_time, start_time, velocity)
-                )
+                notes.append(Note(msg.note, time - start_time, start_time, velocity))
+        ga_track.note = notes
         return ga_track
 
     def to_mido_track(self) -> mido.MidiTrack:
@@ -88,64 +164,86 @@ class Track:
             last_time = event_time
         return midi_track
 
-    def generate_random_pitch_on_rhythm(self, track: "Track"):
-        """Generate random pitches on the given track with rhythm."""
-        for note in track.note:
-            note.pitch = Note.random_pitch_in_mode(self.key)
+    def generate_random_pitch_on_rhythm(self, track: "Track", rng: Rng_T = None):
+        """Generate random pitches on the given track with rhythm.
+        The random numbers are drawn from `rng`, `random` by default."""
+        rng = get_rng(rng)
+        table = scale_table(self.key)
+        pitches = table.random_pitches(
+            len(track.note), NOTE_MIN, NOTE_MAX, rng=numpy_rng(rng)
+        ).tolist()
+        for note, pitch in zip(track.note, pitches):
+            note.pitch = pitch
         # We want the pitch of the last note is the tonic
-        while True:
-            pitch = Note.random_pitch_in_mode(self.key)
-            if Note.ord_in_mode(pitch, self.key) == 1:
-                track.note[-1].pitch = pitch
-                return track
-
-    def generate_random_track(self):
-        """Generate a random track with the given bar number"""
+        track.note[-1].pitch = table.random_pitch(
+            NOTE_MIN, NOTE_MAX, tonic=True, rng=rng
+        )
+        track.touch()
+        return track
+
+    def generate_random_track(self, rng: Rng_T = None):
+        """Generate a random track with the given bar number.
+        The random numbers are drawn from `rng`, `random` by default."""
+        rng = get_rng(rng)
         velocity = self.sts.velocity
+        notes = []  # added to the track at once
 
         for i in range(self.sts.bar_number - 1):
             length = self.sts.bar_length
             while length > 0:
-                note_length = choice(self.sts.note_length)
+                note_length = rng.choice(self.sts.note_length)
                 if note_length <= length:
                     start_time = (i + 1) * self.sts.bar_length - length
                     note = Note(0, note_length, start_time, velocity)
                     length -= note_length
-                    self.note.append(note)
+                    notes.append(note)
 
         # For the last bar, we want to make sure that the last note is a half note
         length = self.sts.bar_length
         while length > self.sts.half:
-            note_length = choice(self.sts.note_length)
+            note_length = rng.choice(self.sts.note_length)
             if note_length <= length - self.sts.half:
                 start_time = self.sts.bar_number * self.sts.bar_length - length
                 note = Note(0, note_length, start_time, velocity)
                 length -= note_length
-                self.note.append(note)
+                notes.append(note)
         start_time = self.sts.bar_number * self.sts.bar_length - self.sts.half
         note = Note(0, self.sts.half, start_time, velocity)
-        self.note.append(note)
+        notes.append(note)
+        self.note.extend(notes)
 
-        self.generate_random_pitch_on_rhythm(self)
+        self.generate_random_pitch_on_rhythm(self, rng)
         return self
 
+    def bar_index(self) -> List[Tuple[int, bool]]:
+        """The bar of each note, and if it exceeds the bar."""
+
+        def compute():
+            bar_length = self.sts.bar_length
+            index = []
+            for note in self.note:
+                idx = note.start_time // bar_length
+                index.append((idx, note.end_time > (idx + 1) * bar_length))
+            return index
+
+        return self._cached(("bar_index", self.sts.bar_length), compute)
+
     def split_into_bars(self) -> List[Bar]:
         """Split the track into bars."""
         bars = [[] for _ in range(self.bar_number)]
-        for note in self.note:
-            idx = note.start_time // self.sts.bar_length
-
-            if note.end_time <= (idx + 1) * self.sts.bar_length:
+        for note, (idx, exceeds) in zip(self.note, self.bar_index()):
+            if not exceeds:
                 bars[idx].append(note)
             else:
                 # The note exceeds the bar, split it into two parts
-                note1, note2 = deepcopy(note), deepcopy(note)
                 bar_time = (idx + 1) * self.sts.bar_length
-                note1.length = bar_time - note.start_time
-                note2.length = note.end_time - bar_time
-                note2.start_time = bar_time
-                bars[idx].append(note1)
-                bars[idx + 1].append(note2)
+                pitch, velocity = note.pitch, note.velocity
+                bars[idx].append(
+                    Note(pitch, bar_time - note.start_time, note.start_time, velocity)
+                )
+                bars[idx + 1].append(
+                    Note(pitch, note.end_time - bar_time, bar_time, velocity)
+                )
         return bars
 
     def join_bars(self, bars: List[Bar]):
@@ -156,7 +254,9 @@ class Track:
     @property
     def full_length(self):
         """The length of the track"""
-        return max(note.end_time for note in self.note)
+        return self._cached(
+            "full_length", lambda: max(note.end_time for note in self.note)
+        )
 
     @property
     def bar_number(self):
@@ -171,14 +271,17 @@ class Track:
         """Transpose the track by the given interval"""
         for note in self.note:
             note.pitch += interval
+        self.touch()
 
     def inverse(self, center):
         """Inverse the track by the given center"""
         for note in self.note:
             note.pitch = 2 * center - note.pitch
+        self.touch()
 
     def retrograde(self):
         """Retrograde the track"""
+        full_length = self.full_length
         for note in self.note:
-            note.start_time = self.full_length - note.end_time
+            note.start_time = full_length - note.end_time
         self.note.reverse()
@@ -0,0 +1,153 @@
+"""The transforms of the notes as arrays of `NOTE_DTYPE`, like the methods
+`Track.transpose`, `Track.inverse` and `Track.retrograde`, but vectorized.
+
+Every transform returns new notes and leaves the given ones unchanged.
+The notes of a batch of tracks are transformed at once by stacking them
+with `stack_notes`, and passing the `groups` to the transform, in which
+case each value may be given for every track.
+"""
+
+import numpy as np
+from typing import Callable, List, Sequence, Tuple, Union
+
+from .musicType import *
+from .scale import PITCH_NUMBER, scale_table
+from .track import Track
+from .genome import Genome
+
+# A value for all the notes, or one for each track of a batch
+Value_T = Union[int, float, Sequence, np.ndarray]
+
+
+def stack_notes(arrays: Sequence[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """Stack the notes of several tracks into one array.
+    Return the notes, and the index of the track of each note."""
+    notes = np.concatenate(arrays)
+    groups = np.repeat(np.arange(len(arrays)), [len(array) for array in arrays])
+    return notes, groups
+
+
+def unstack_notes(
+    notes: np.ndarray, groups: np.ndarray, number: int
+) -> List[np.ndarray]:
+    """Split the stacked notes back into the notes of `number` tracks."""
+    return np.split(notes, np.searchsorted(groups, np.arange(1, number)))
+
+
+def _per_note(value: Value_T, groups: np.ndarray = None) -> np.ndarray:
+    """The value for each note, from one value or one for each track."""
+    value = np.asarray(value)
+    if value.ndim == 0:
+        return value
+    if groups is None:
+        raise ValueError("The values for each track need the groups of the notes")
+    return value[groups]
+
+
+def _with_pitch(notes: np.ndarray, pitch: np.ndarray) -> np.ndarray:
+    if len(pitch) and (pitch.min() < 0 or pitch.max() >= PITCH_NUMBER):
+        raise ValueError("The transformed pitch is out of the midi range")
+    notes = notes.copy()
+    notes["pitch"] = pitch
+    return notes
+
+
+def transpose_notes(
+    notes: np.ndarray, interval: Value_T, groups: np.ndarray = None
+) -> np.ndarray:
+    """Transpose the notes by the given interval in semitones."""
+    return _with_pitch(notes, notes["pitch"] + _per_note(interval, groups))
+
+
+def inverse_notes(
+    notes: np.ndarray, center: Value_T, groups: np.ndarray = None
+) -> np.ndarray:
+    """Inverse the notes by the given center."""
+    return _with_pitch(notes, 2 * _per_note(center, groups) - notes["pitch"])
+
+
+def diatonic_transpose(
+    notes: np.ndarray, steps: Value_T, key: Key_T, groups: np.ndarray = None
+) -> np.ndarray:
+    """Transpose the notes by the given steps in the mode of the key,
+    e.g. C4 to E4 by 2 steps in C. A note not in the mode keeps its
+    distance to the pitch of the mode below it."""
+    pitches = scale_table(key).pitches
+    pitch = notes["pitch"].astype(int)
+    below = np.searchsorted(pitches, pitch, side="right") - 1
+    target = below + _per_note(steps, groups)
+    if len(pitch) and (
+        below.min() < 0 or target.min() < 0 or target.max() >= len(pitches)
+    ):
+        raise ValueError(f"The transformed pitch is out of the mode {key}")
+    return _with_pitch(notes, pitches[target] + pitch - pitches[below])
+
+
+def retrograde_notes(notes: np.ndarray, groups: np.ndarray = None) -> np.ndarray:
+    """Retrograde the notes, and reverse their order in each track.
+    The groups should be ordered, as given by `stack_notes`."""
+    end = notes["start_time"] + notes["length"]
+    if groups is None:
+        full_length = end.max(initial=0)
+        order = np.arange(len(notes))[::-1]
+    else:
+        full_length = np.zeros(groups.max(initial=-1) + 1, dtype=end.dtype)
+        np.maximum.at(full_length, groups, end)
+        full_length = full_length[groups]
+        order = np.lexsort((-np.arange(len(notes)), groups))
+    notes = notes.copy()
+    notes["start_time"] = full_length - end
+    return notes[order]
+
+
+def scale_time(
+    notes: np.ndarray, factor: Value_T, groups: np.ndarray = None
+) -> np.ndarray:
+    """Scale the time of the notes by the factor: augmentation if it is
+    greater than 1, and diminution if less. The start and the end of the
+    notes are rounded to the tick, and a note lasts one tick at least."""
+    factor = _per_note(factor, groups)
+    if np.any(factor <= 0):
+        raise ValueError("The factor of the time should be positive")
+    start = np.rint(notes["start_time"] * factor).astype(np.int64)
+    end = np.rint((notes["start_time"] + notes["length"]) * factor).astype(np.int64)
+    notes = notes.copy()
+    notes["start_time"] = start
+    notes["length"] = np.maximum(end - start, 1)
+    return notes
+
+
+def shift_time(
+    notes: np.ndarray, offset: Value_T, groups: np.ndarray = None
+) -> np.ndarray:
+    """Shift the notes later by the offset in ticks, or earlier if negative."""
+    start = notes["start_time"] + _per_note(offset, groups)
+    if len(start) and start.min() < 0:
+        raise ValueError("The notes are shifted before the start of the track")
+    notes = notes.copy()
+    notes["start_time"] = start
+    return notes
+
+
+def batch_transform(
+    tracks: Sequence[Union[Track, Genome]],
+    transform: Callable[..., np.ndarray],
+    *args,
+    **kwargs,
+) -> List[Union[Track, Genome]]:
+    """Apply the transform to the tracks (or genomes) in one vectorized call,
+    e.g. `batch_transform(tracks, transpose_notes, [0, 2, 4])`.
+    Return the transformed copies of the tracks, of the same types."""
+    genomes = [
+        Genome.from_track(track) if isinstance(track, Track) else track
+        for track in tracks
+    ]
+    notes, groups = stack_notes([genome.notes for genome in genomes])
+    notes = transform(notes, *args, groups=groups, **kwargs)
+    result = []
+    for track, genome, part in zip(
+        tracks, genomes, unstack_notes(notes, groups, len(genomes))
+    ):
+        genome = Genome(part, genome.sts, genome.instrument)
+        result.append(genome.to_track() if isinstance(track, Track) else genome)
+    return result
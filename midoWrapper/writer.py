@@ -0,0 +1,140 @@
+import os
+import math
+import struct
+import mido
+import numpy as np
+from typing import List, Union
+from .musicSettings import MusicSettings
+from .track import Track
+from .genome import Genome
+from .reader import _key_signature_decode
+
+_key_signature_encode = {key: code for code, key in _key_signature_decode.items()}
+
+# The ticks per beat of the files saved by mido by default
+TICKS_PER_BEAT = 480
+
+NOTE_OFF, NOTE_ON, PROGRAM_CHANGE = 0x80, 0x90, 0xC0
+END_OF_TRACK = b"\x00\xff\x2f\x00"
+
+
+def encode_variable_int(value: int) -> bytes:
+    """Encode the variable length integer of midi."""
+    if value < 0:
+        raise ValueError("variable int must be a non-negative integer")
+    data = [value & 0x7F]
+    value >>= 7
+    while value:
+        data.append(value & 0x7F | 0x80)
+        value >>= 7
+    return bytes(reversed(data))
+
+
+def _chunk(name: bytes, data: bytes) -> bytes:
+    return name + struct.pack(">L", len(data)) + data
+
+
+def _meta(meta_type: int, data: bytes) -> bytes:
+    # the delta time is always 0 here
+    return bytes((0, 0xFF, meta_type)) + encode_variable_int(len(data)) + data
+
+
+def _key_signature(key: str) -> bytes:
+    if key not in _key_signature_encode:
+        raise ValueError(f"invalid key {key!r}")
+    sf, minor = _key_signature_encode[key]
+    return _meta(0x59, struct.pack(">bB", sf, minor))
+
+
+def encode_notes(notes: np.ndarray) -> bytes:
+    """Encode the notes (a structured array of `NOTE_DTYPE`) into the midi
+    events of a track, the same as mido saves `Track.to_mido_track`:
+    sorted by time with note_off before note_on, and with running status.
+    The events of the same kind at the same time, which mido saves in any
+    order, are in the order of the notes."""
+    if len(notes) == 0:
+        return b""
+    pitch = notes["pitch"].astype(np.int64)
+    velocity = notes["velocity"].astype(np.int64)
+    if pitch.min() < 0 or pitch.max() > 127:
+        raise ValueError("note must be in range 0..127")
+    if velocity.min() < 0 or velocity.max() > 127:
+        raise ValueError("velocity must be in range 0..127")
+
+    start = notes["start_time"].astype(np.int64)
+    times = np.concatenate((start, start + notes["length"]))
+    kinds = np.repeat([1, 0], len(notes))
+    order = np.lexsort((kinds, times))
+    times, kinds = times[order], kinds[order]
+    index = order % len(notes)
+
+    delta = np.diff(times, prepend=0)
+    if delta.min() < 0:
+        raise ValueError("message time must be non-negative in MIDI file")
+    # the bytes of each event: the delta time, the status byte when
+    # it is not the same as the last one, the pitch and the velocity
+    vlq_size = 1 + sum(delta >= 1 << (7 * k) for k in range(1, 5))
+    status = np.ones(len(times), dtype=bool)
+    status[1:] = kinds[1:] != kinds[:-1]
+    size = vlq_size + status + 2
+    offset = np.cumsum(size) - size
+
+    data = np.zeros(int(size.sum()), dtype=np.uint8)
+    for k in range(int(vlq_size.max())):
+        has = vlq_size > k
+        # the k-th group of 7 bits from the end, with the continue bit
+        position = offset[has] + vlq_size[has] - 1 - k
+        data[position] = (delta[has] >> (7 * k)) & 0x7F | (0x80 if k else 0)
+    position = offset + vlq_size
+    data[position[status]] = np.where(kinds[status], NOTE_ON, NOTE_OFF)
+    position += status
+    data[position] = pitch[index]
+    data[position + 1] = velocity[index]
+    return data.tobytes()
+
+
+def encode_track(track: Union[Track, Genome]) -> bytes:
+    """Encode the track into a track chunk of midi,
+    the same bytes as mido saves `Track.to_mido_track`."""
+    if isinstance(track, Track):
+        track = Genome.from_track(track)
+    if not 0 <= track.instrument <= 127:
+        raise ValueError("program must be in range 0..127")
+    data = (
+        _key_signature(track.key)
+        + bytes((0, PROGRAM_CHANGE, track.instrument))
+        + encode_notes(track.notes)
+        + END_OF_TRACK
+    )
+    return _chunk(b"MTrk", data)
+
+
+def encode_meta_track(settings: MusicSettings) -> bytes:
+    """Encode the parameters of the music into the first track of midi."""
+    tempo = mido.bpm2tempo(settings.bpm)
+    data = _meta(0x51, tempo.to_bytes(3, "big"))
+    data += _meta(
+        0x58,
+        bytes(
+            (settings.numerator, int(math.log(settings.denominator, 2)), 24, 8)
+        ),
+    )
+    if settings.key is not None:
+        data += _key_signature(settings.key)
+    return _chunk(b"MTrk", data + END_OF_TRACK)
+
+
+def encode_midi(settings: MusicSettings, tracks: List[Track]) -> bytes:
+    """Encode the tracks into the bytes of a midi file, the same as
+    `Midi.to_mido_midi` saved by mido."""
+    header = _chunk(b"MThd", struct.pack(">hhh", 1, len(tracks) + 1, TICKS_PER_BEAT))
+    return header + encode_meta_track(settings) + b"".join(map(encode_track, tracks))
+
+
+def write_midi(filename: str, settings: MusicSettings, tracks: List[Track]):
+    """Write the tracks into a midi file directly."""
+    data = encode_midi(settings, tracks)
+    if os.path.dirname(filename):
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with open(filename, "wb") as f:
+        f.write(data)
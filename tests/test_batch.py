@@ -0,0 +1,33 @@
+import os
+import json
+import shutil
+from train import run_batch
+
+REFERENCE = "midi/reference.mid"
+
+
+def test_references_with_the_same_name(tmp_path):
+    for folder in ("pop", "jazz"):
+        os.makedirs(tmp_path / folder)
+        shutil.copy(REFERENCE, tmp_path / folder / "song.mid")
+    manifest = tmp_path / "manifest.json"
+    references = ["pop/song.mid", {"reference": "jazz/song.mid", "variations": 2}]
+    manifest.write_text(json.dumps(references + ["pop/song.mid"]))
+    output = tmp_path / "output"
+
+    summaries = run_batch(
+        str(manifest), str(output), population_size=4, iteration_num=2, seed=0
+    )
+    assert [summary["output"] for summary in summaries] == [
+        str(output / f"song_{idx}.mid") for idx in range(4)
+    ]
+    assert [summary["reference"] for summary in summaries] == [
+        str(tmp_path / path)
+        for path in ("pop/song.mid", "jazz/song.mid", "jazz/song.mid", "pop/song.mid")
+    ]
+    assert all("error" not in summary for summary in summaries)
+    assert sorted(os.listdir(output)) == [f"song_{idx}.mid" for idx in range(4)] + [
+        "summary.json"
+    ]
+    with open(output / "summary.json") as f:
+        assert json.load(f)["jobs"] == summaries
@@ -0,0 +1,20 @@
+import numpy as np
+from train.cache import FitnessCache
+
+
+def test_nan_fitness_is_cached():
+    cache = FitnessCache()
+    cache.store([b"a", b"b"], np.array([np.nan, 1.0]))
+    fitness, found = cache.lookup([b"a", b"b", b"c"])
+    np.testing.assert_array_equal(found, [True, True, False])
+    assert np.isnan(fitness[0]) and fitness[1] == 1.0
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_least_recently_used_is_dropped():
+    cache = FitnessCache(max_size=2)
+    cache.store([b"a", b"b"], np.array([1.0, 2.0]))
+    cache.lookup([b"a"])
+    cache.store([b"c"], np.array([3.0]))
+    _, found = cache.lookup([b"a", b"b", b"c"])
+    np.testing.assert_array_equal(found, [True, False, True])
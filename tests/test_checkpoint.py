@@ -0,0 +1,52 @@
+import io
+import contextlib
+import pytest
+from midoWrapper import *
+from train import train, Checkpoint, Progress, TrainingCancelled
+
+REFERENCE = "midi/reference.mid"
+SEED = 1  # the rhythm phase does not reach the target in 60 generations
+
+
+class KillAt(Progress):
+    """Cancel the training at the generation of the phase, like a kill."""
+
+    def __init__(self, phase: str, generation: int):
+        super().__init__()
+        self.phase_to_kill, self.generation = phase, generation
+
+    def update(self, ga):
+        if ga.name == self.phase_to_kill and ga.generation == self.generation:
+            raise TrainingCancelled(f"killed at {ga.name} {ga.generation}")
+
+
+def notes_of(track: Track):
+    return [vars(note) for note in track.note]
+
+
+def quiet_train(seed: int = SEED, output: io.StringIO = None, **kwargs) -> Track:
+    ref_track = Midi.from_midi(REFERENCE).tracks[0]
+    with contextlib.redirect_stdout(output or io.StringIO()):
+        return train(ref_track, 10, 0.8, 60, seed=seed, **kwargs)
+
+
+@pytest.fixture(scope="module")
+def uninterrupted():
+    return notes_of(quiet_train())
+
+
+@pytest.mark.parametrize("phase", ["rhythm", "pitch"])
+def test_resume_as_never_killed(tmp_path, uninterrupted, phase):
+    checkpoint = Checkpoint(str(tmp_path / "train.ckpt.npz"), interval=10)
+    with pytest.raises(TrainingCancelled):
+        quiet_train(checkpoint=checkpoint, progress=KillAt(phase, 25))
+    assert checkpoint.exists()
+
+    # the state of the generator comes from the checkpoint, not the seed
+    output = io.StringIO()
+    result = quiet_train(
+        seed=SEED + 1, output=output, checkpoint=checkpoint, resume=True
+    )
+    assert f"Resume the {phase} training at generation 20" in output.getvalue()
+    assert notes_of(result) == uninterrupted
+    assert not checkpoint.exists()
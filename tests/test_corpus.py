@@ -0,0 +1,59 @@
+import os
+import shutil
+from midoWrapper import *
+
+REFERENCE = "midi/reference.mid"
+
+
+def test_update_only_the_changed_files(tmp_path):
+    folder, database = tmp_path / "corpus", str(tmp_path / "index.sqlite")
+    os.makedirs(folder)
+    for name in ("touched", "edited", "deleted", "unchanged"):
+        shutil.copy(REFERENCE, folder / f"{name}.mid")
+    path = {name: str(folder / f"{name}.mid") for name in ("touched", "edited")}
+
+    with CorpusIndex(database) as index:
+        counts = index.update(str(folder), processes=2)
+        assert counts == {
+            "indexed": 4,
+            "touched": 0,
+            "unchanged": 0,
+            "failed": 0,
+            "removed": 0,
+        }
+        bar_number = index.find()[0]["bar_number"]
+
+        st = os.stat(path["touched"])
+        os.utime(path["touched"], (st.st_atime, st.st_mtime + 10))
+        (folder / "edited.mid").write_bytes(
+            Midi.from_stream(REFERENCE, max_bars=2).to_bytes()
+        )
+        os.utime(path["edited"], (st.st_atime, st.st_mtime + 10))
+        os.remove(folder / "deleted.mid")
+        shutil.copy(REFERENCE, folder / "new.mid")
+        (folder / "broken.mid").write_bytes(b"not a midi file")
+
+        counts = index.update(str(folder), processes=2)
+        assert counts == {
+            "indexed": 2,
+            "touched": 1,
+            "unchanged": 1,
+            "failed": 1,
+            "removed": 1,
+        }
+        rows = {os.path.basename(row["path"]): row for row in index.find()}
+        assert sorted(rows) == ["edited.mid", "new.mid", "touched.mid", "unchanged.mid"]
+        assert rows["edited.mid"]["bar_number"] == 2
+        assert rows["touched.mid"]["bar_number"] == bar_number
+        assert rows["touched.mid"]["mtime"] == os.stat(path["touched"]).st_mtime
+        assert [os.path.basename(row["path"]) for row in index.failures()] == [
+            "broken.mid"
+        ]
+        assert index.tracks(str(folder / "new.mid"))
+        assert not index.tracks(str(folder / "deleted.mid"))
+        assert len(index) == 5
+
+    # the failed file is not parsed again until changed
+    with CorpusIndex(database) as index:
+        counts = index.update(str(folder), processes=2)
+        assert counts["unchanged"] == 5 and counts["failed"] == 0
@@ -0,0 +1,44 @@
+import random
+import numpy as np
+import pytest
+from midoWrapper import *
+from train.base import random_population
+
+REFERENCE = "midi/reference.mid"
+
+
+def split_by_segments(genome: Genome):
+    """The bars of the genome split by `split_bars`, copied."""
+    segments, _, bars = split_bars(genome.notes, genome.sts.bar_length)
+    return np.split(segments, np.searchsorted(bars, np.arange(1, genome.bar_number)))
+
+
+def assert_same_bars(genome: Genome):
+    index = genome.index_bars()
+    expected = split_by_segments(genome)
+    assert len(index) == len(expected)
+    for bar, other in zip(index.bars(), expected):
+        np.testing.assert_array_equal(bar, other)
+    return index
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_aligned_bars_are_views(seed):
+    settings = Midi.from_midi(REFERENCE).sts
+    for genome in random_population(settings, 5, random.Random(seed)):
+        index = assert_same_bars(genome)
+        assert index.aligned
+        assert np.shares_memory(index.bar(1), genome.notes)
+        assert not index.bar(1).flags.writeable
+        np.testing.assert_array_equal(
+            np.concatenate((index.span(0, 3), index.span(3, len(index)))),
+            genome.notes,
+        )
+
+
+def test_exceeding_notes_are_split():
+    genome = Genome.from_track(Midi.from_midi(REFERENCE).tracks[0])
+    genome.notes["length"][0] += genome.sts.bar_length
+    index = assert_same_bars(genome)
+    assert not index.aligned
+    assert len(index.span(0, len(index))) == len(genome) + 1
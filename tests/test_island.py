@@ -0,0 +1,27 @@
+import queue
+import random
+import numpy as np
+from midoWrapper import *
+from train.base import random_population
+from train.rhythm import GAForRhythm
+from train.island import Island
+
+REFERENCE = "midi/reference.mid"
+
+
+def test_migrants_keep_the_best():
+    rng = random.Random(0)
+    settings = Midi.from_midi(REFERENCE).sts
+    ga = GAForRhythm(random_population(settings, 6, rng), 0.8, rng=rng)
+    own_best = sorted(ga.fitness)[-2:]
+    inbox = queue.Queue()
+    # all better than the island, and more than it has room for
+    received = [[10.0, 5.0], [11.0, 6.0], [12.0, 7.0]]
+    for sender, fitness in enumerate(received):
+        tracks = random_population(settings, len(fitness), rng)
+        inbox.put((sender, tracks, np.array(fitness)))
+    island = Island(0, ga, 1.0, 3, inbox, [queue.Queue()], None, None, None)
+
+    island.migrate(2)
+    assert sorted(ga.fitness) == sorted(own_best + [7.0, 10.0, 11.0, 12.0])
+    assert island.best_fitness == 12.0
@@ -0,0 +1,75 @@
+import copy
+import random
+import numpy as np
+import pytest
+from midoWrapper import *
+from train.base import random_population, random_population_on_rhythm
+from train.pitch import GAForPitch, PitchParameter, ReferenceSet, incremental_bar_number
+from train.reference import repeat_reference
+
+REFERENCE = "midi/reference.mid"
+
+
+def pitch_ga(ref_track: Track, seed: int, **kwargs) -> GAForPitch:
+    rng = random.Random(seed)
+    rhythm = random_population(ref_track.sts, 1, rng)[0].to_track()
+    population = random_population_on_rhythm(ref_track.sts, rhythm, 20, rng)
+    return GAForPitch(ref_track, population, 0.8, rng=rng, **kwargs)
+
+
+def full_fitness(ga: GAForPitch, population) -> np.ndarray:
+    incremental, ga.incremental = ga.incremental, False
+    try:
+        return ga.get_population_fitness(population)
+    finally:
+        ga.incremental = incremental
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_incremental_fitness(seed):
+    ga = pitch_ga(repeat_reference(REFERENCE, incremental_bar_number), seed)
+    assert ga.incremental
+    for _ in range(30):
+        ga.epoch()
+        # the fitness of the epoch comes from the cached bars
+        np.testing.assert_allclose(
+            ga.fitness, full_fitness(ga, ga.population), rtol=1e-9, atol=1e-9
+        )
+    np.testing.assert_allclose(
+        ga.get_population_fitness(ga.population),
+        full_fitness(ga, ga.population),
+        rtol=1e-9,
+        atol=1e-9,
+    )
+
+
+def in_three_four(track: Track) -> Track:
+    """The same notes in bars of 3/4."""
+    settings = copy.copy(track.sts)
+    settings.numerator = 3
+    result = Track(settings, track.instrument)
+    result.note = [copy.copy(note) for note in track.note]
+    return result
+
+
+@pytest.mark.parametrize("aggregate", [ReferenceSet.MEAN, ReferenceSet.NEAREST])
+def test_references_of_different_bars(aggregate):
+    track = repeat_reference(REFERENCE, 8)
+    with pytest.raises(ValueError):
+        ReferenceSet.from_tracks([track, in_three_four(track)], 8, aggregate)
+    # and the individuals should have the same bars as the references
+    references = ReferenceSet.from_tracks([in_three_four(track)], 8, aggregate)
+    with pytest.raises(ValueError):
+        pitch_ga(track, 0, ref_param=references)
+
+
+def test_references_of_different_lengths():
+    short, long = repeat_reference(REFERENCE, 8), repeat_reference(REFERENCE, 12)
+    references = ReferenceSet.from_tracks([short, long], 8, ReferenceSet.NEAREST)
+    short_line = PitchParameter(short).melody_line[0]
+    long_line = PitchParameter(long).melody_line[0][: len(short_line)]
+    # the longer reference is cut at the same bar, not stretched
+    np.testing.assert_array_equal(references.melody_line[0], short_line)
+    np.testing.assert_allclose(
+        references.melody_line[1], long_line - np.mean(long_line)
+    )
@@ -0,0 +1,117 @@
+import io
+import mido
+import struct
+import pytest
+from midoWrapper import *
+
+REFERENCE = "midi/reference.mid"
+
+
+class RecordingFile(io.BytesIO):
+    """A binary file recording the furthest position read."""
+
+    def __init__(self, data: bytes):
+        super().__init__(data)
+        self.furthest = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.furthest = max(self.furthest, self.tell())
+        return data
+
+
+def with_broken_chunk(data: bytes) -> bytes:
+    """The midi file with a chunk cut short after the last track."""
+    track_number = struct.unpack(">h", data[10:12])[0]
+    broken = b"MTrk" + struct.pack(">L", 1000) + b"\x00\x90\x3c"
+    return data[:10] + struct.pack(">h", track_number + 1) + data[12:] + broken
+
+
+@pytest.fixture(scope="module")
+def data() -> bytes:
+    with open(REFERENCE, "rb") as f:
+        return f.read()
+
+
+def test_same_as_mido(data):
+    expected = Midi.from_midi(REFERENCE)
+    midi = Midi.from_stream(data)
+    assert len(midi.tracks) == len(expected.tracks)
+    for track, other in zip(midi.tracks, expected.tracks):
+        assert [vars(note) for note in track.note] == [
+            vars(note) for note in other.note
+        ]
+
+
+def test_broken_chunk_after_the_tracks(data):
+    broken = with_broken_chunk(data)
+    tracks = len(Midi.from_stream(data).tracks)
+    with pytest.raises(Exception):
+        Midi.from_stream(broken)
+
+    file = RecordingFile(broken)
+    midi = Midi.from_stream(file, max_tracks=tracks)
+    assert len(midi.tracks) == tracks
+    assert file.furthest <= len(data)
+
+
+def midi_of_notes(*notes) -> bytes:
+    """A midi file of one track of notes, given as (type, note, velocity, time)."""
+    midi = mido.MidiFile(ticks_per_beat=480)
+    meta = mido.MidiTrack([mido.MetaMessage("time_signature", numerator=4)])
+    track = mido.MidiTrack(
+        mido.Message(kind, note=note, velocity=velocity, time=time)
+        for kind, note, velocity, time in notes
+    )
+    midi.tracks += [meta, track]
+    file = io.BytesIO()
+    midi.save(file=file)
+    return file.getvalue()
+
+
+def note_values(midi: Midi):
+    notes = [(note.pitch, note.length, note.start_time) for note in midi.tracks[0].note]
+    return sorted(notes, key=lambda note: note[2])
+
+
+def test_note_on_without_velocity_ends_the_note(tmp_path):
+    data = midi_of_notes(
+        ("note_on", 60, 100, 0),
+        ("note_on", 62, 100, 960),
+        ("note_on", 62, 0, 480),
+        ("note_on", 60, 0, 960),
+        ("note_on", 64, 100, 0),
+        ("note_on", 64, 0, 480),
+    )
+    full = [(60, 2400, 0), (62, 480, 960), (64, 480, 2400)]
+    assert note_values(Midi.from_stream(data)) == full
+    (tmp_path / "notes.mid").write_bytes(data)
+    assert note_values(Midi.from_midi(str(tmp_path / "notes.mid"))) == full
+    # 60 ends after the first bar, by a note_on not taken for a new note
+    assert note_values(Midi.from_stream(data, max_bars=1)) == full[:2]
+
+
+def test_note_across_the_cutoff():
+    data = midi_of_notes(
+        ("note_on", 60, 100, 0),
+        ("note_on", 62, 100, 960),
+        ("note_off", 62, 0, 480),
+        ("note_on", 64, 100, 960),
+        ("note_off", 60, 0, 960),
+        ("note_off", 64, 0, 0),
+    )
+    # 60 starts in the first bar and ends in the third, kept whole
+    midi = Midi.from_stream(data, max_bars=1)
+    assert note_values(midi) == [(60, 3360, 0), (62, 480, 960)]
+
+
+def test_nothing_after_the_requested_tracks():
+    # the meta track, then the tracks of notes
+    data = Midi.from_midi(REFERENCE).to_bytes()
+    file = RecordingFile(with_broken_chunk(data))
+    tracks = list(Midi.iter_tracks(file, max_tracks=1))
+    assert len(tracks) == 1
+    # only the meta track and the first track of notes are read
+    with MidiReader(data) as reader:
+        chunks = list(reader.track_chunks(2))
+    assert file.furthest == 14 + sum(8 + len(chunk) for chunk in chunks)
@@ -0,0 +1,57 @@
+import random
+import numpy as np
+import pytest
+from midoWrapper import *
+from train.base import random_population
+from train.rhythm import GAForRhythm
+
+REFERENCE = "midi/reference.mid"
+# the fitness of the melody of the reference, frozen
+REFERENCE_FITNESS = -0.1173809523809523
+
+
+@pytest.fixture(scope="module")
+def reference() -> Genome:
+    return Genome.from_track(Midi.from_midi(REFERENCE).tracks[0])
+
+
+def per_track_fitness(population):
+    return np.array([GAForRhythm.get_fitness(track) for track in population])
+
+
+def test_reference_fitness(reference):
+    assert GAForRhythm.get_fitness(reference) == pytest.approx(REFERENCE_FITNESS)
+    ga = GAForRhythm([reference, reference.copy()], 0.8)
+    assert ga.get_population_fitness([reference])[0] == pytest.approx(
+        REFERENCE_FITNESS
+    )
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_random_population(reference, seed):
+    population = [reference] + random_population(
+        reference.sts, 20, random.Random(seed)
+    )
+    ga = GAForRhythm(population, 0.8, rng=random.Random(seed))
+    np.testing.assert_array_equal(
+        ga.get_population_fitness(population), per_track_fitness(population)
+    )
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_mutated_population(reference, seed):
+    rng = random.Random(seed)
+    ga = GAForRhythm(random_population(reference.sts, 20, rng), 1.0, rng=rng)
+    mutations = [ga._mutate_1, ga._mutate_2, ga._mutate_3, ga._mutate_4]
+    mutated = []
+    for track in ga.population:
+        for mutate in mutations:
+            child = track.clone()
+            mutate(child)
+            mutated.append(child)
+    for _ in range(5):
+        ga.epoch()
+    population = mutated + ga.population
+    np.testing.assert_array_equal(
+        ga.get_population_fitness(population), per_track_fitness(population)
+    )
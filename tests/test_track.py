@@ -0,0 +1,62 @@
+import copy
+import pytest
+from midoWrapper import *
+
+REFERENCE = "midi/reference.mid"
+
+
+@pytest.fixture
+def track() -> Track:
+    track = Midi.from_midi(REFERENCE).tracks[0]
+    # fill the cache before changing the notes
+    derived(track)
+    return track
+
+
+def derived(track: Track):
+    return track.full_length, track.bar_number, track.bar_index()
+
+
+def fresh(track: Track):
+    """The derived values calculated again from a new track."""
+    other = Track(track.sts, track.instrument)
+    other.note = [copy.copy(note) for note in track.note]
+    return derived(other)
+
+
+def later_note(track: Track, bars: int) -> Note:
+    """A note in the bar after the last one of the track plus `bars`."""
+    start_time = (track.bar_number + bars - 1) * track.sts.bar_length
+    return Note(60, track.sts.quarter, start_time, 100)
+
+
+def test_changed_in_place(track):
+    track.note[-1].length += 2 * track.sts.bar_length
+    track.touch()
+    assert derived(track) == fresh(track)
+    track.note.append(later_note(track, 3))
+    assert derived(track) == fresh(track)
+    del track.note[-1]
+    assert derived(track) == fresh(track)
+
+
+def test_notes_reassigned(track):
+    bar_number = track.bar_number
+    track.note = track.note + [later_note(track, 4)]
+    assert track.bar_number == bar_number + 4
+    assert derived(track) == fresh(track)
+
+
+@pytest.mark.parametrize("copier", [copy.copy, copy.deepcopy])
+def test_copy_keeps_its_own_cache(track, copier):
+    expected = derived(track)
+    other = copier(track)
+    other.note = other.note + [later_note(other, 4)]
+    assert derived(other) == fresh(other)
+    assert derived(track) == expected
+
+    other = copier(track)
+    other.note.append(later_note(other, 2))
+    assert derived(other) == fresh(other)
+    assert derived(track) == expected
+    assert len(track.note) + 1 == len(other.note)
@@ -0,0 +1,117 @@
+import copy
+import random
+import numpy as np
+import pytest
+from midoWrapper import *
+from train.base import random_population
+
+REFERENCE = "midi/reference.mid"
+
+
+@pytest.fixture(scope="module")
+def tracks():
+    """The melody of the reference and a few random tracks."""
+    melody = Midi.from_midi(REFERENCE).tracks[0]
+    genomes = random_population(melody.sts, 4, random.Random(0))
+    return [melody] + [genome.to_track() for genome in genomes]
+
+
+def values(track: Track):
+    return [
+        (note.pitch, note.length, note.start_time, note.velocity) for note in track.note
+    ]
+
+
+def notes_of(pitch, start_time=None, length=None) -> np.ndarray:
+    notes = np.zeros(len(pitch), dtype=NOTE_DTYPE)
+    notes["pitch"] = pitch
+    notes["start_time"] = start_time if start_time is not None else 0
+    notes["length"] = length if length is not None else 1
+    return notes
+
+
+@pytest.mark.parametrize(
+    "transform, method, args",
+    [
+        (transpose_notes, Track.transpose, [[0, 2, -3, 5, -12]]),
+        (inverse_notes, Track.inverse, [[60, 66, 72, 64, 70]]),
+        (retrograde_notes, Track.retrograde, []),
+    ],
+)
+def test_same_as_track(tracks, transform, method, args):
+    before = [values(track) for track in tracks]
+    result = batch_transform(tracks, transform, *args)
+    for idx, (track, transformed) in enumerate(zip(tracks, result)):
+        assert isinstance(transformed, Track)
+        expected = copy.deepcopy(track)
+        method(expected, *(arg[idx] for arg in args))
+        assert values(transformed) == values(expected)
+    # the given tracks are unchanged
+    assert [values(track) for track in tracks] == before
+
+
+def test_single_track(tracks):
+    genome = Genome.from_track(tracks[0])
+    expected = copy.deepcopy(tracks[0])
+    expected.transpose(4)
+    np.testing.assert_array_equal(
+        transpose_notes(genome.notes, 4), Genome.from_track(expected).notes
+    )
+    (result,) = batch_transform([genome], retrograde_notes)
+    assert isinstance(result, Genome)
+    expected = copy.deepcopy(tracks[0])
+    expected.retrograde()
+    np.testing.assert_array_equal(result.notes, Genome.from_track(expected).notes)
+
+
+def test_values_need_groups():
+    with pytest.raises(ValueError):
+        transpose_notes(notes_of([60, 62]), [1, 2])
+
+
+def test_out_of_the_midi_range():
+    with pytest.raises(ValueError):
+        transpose_notes(notes_of([60, 120]), 10)
+    with pytest.raises(ValueError):
+        inverse_notes(notes_of([60, 2]), 0)
+
+
+@pytest.mark.parametrize(
+    "key, pitch, steps, expected",
+    [
+        # Bb major: Bb C D Eb F G A
+        ("Bb", [60, 63, 58, 69], 1, [62, 65, 60, 70]),
+        ("Bb", [60, 63, 58, 69], -2, [57, 60, 55, 65]),
+        ("Bb", [70], 7, [82]),
+        # E is not in Bb, and keeps its distance to Eb below it
+        ("Bb", [64], 1, [66]),
+        # F minor: F G Ab Bb C Db Eb
+        ("Fm", [65, 68, 73, 75], 1, [67, 70, 75, 77]),
+        ("Eb", [63, 68, 70], 2, [67, 72, 74]),
+    ],
+)
+def test_diatonic_transpose_with_flats(key, pitch, steps, expected):
+    result = diatonic_transpose(notes_of(pitch), steps, key)
+    assert result["pitch"].tolist() == expected
+
+
+def test_diatonic_transpose_each_track():
+    notes, groups = stack_notes([notes_of([60, 62]), notes_of([63, 65])])
+    result = diatonic_transpose(notes, [1, -1], "Bb", groups)
+    assert result["pitch"].tolist() == [62, 63, 62, 63]
+    with pytest.raises(ValueError):
+        diatonic_transpose(notes_of([125]), 3, "Bb")
+
+
+def test_scale_time():
+    notes = notes_of([60, 62, 64], start_time=[0, 3, 5], length=[3, 2, 1])
+    result = scale_time(notes, 2)
+    assert result["start_time"].tolist() == [0, 6, 10]
+    assert result["length"].tolist() == [6, 4, 2]
+    result = scale_time(notes, 0.25)
+    # rounded to the tick, and one tick at least
+    assert result["start_time"].tolist() == [0, 1, 1]
+    assert result["length"].tolist() == [1, 1, 1]
+    np.testing.assert_array_equal(notes["start_time"], [0, 3, 5])
+    with pytest.raises(ValueError):
+        scale_time(notes, 0)
@@ -0,0 +1,87 @@
+import io
+import copy
+import numpy as np
+import pytest
+import mido
+from mido.midifiles.meta import encode_variable_int as mido_variable_int
+from midoWrapper import *
+from midoWrapper.writer import encode_notes, encode_variable_int
+
+REFERENCE = "midi/reference.mid"
+
+
+def mido_bytes(midi: Midi) -> bytes:
+    """The bytes of the midi file saved by mido, the old way."""
+    f = io.BytesIO()
+    midi.to_mido_midi().save(file=f)
+    return f.getvalue()
+
+
+def note_events(data: bytes) -> list:
+    """The note events of each track by the absolute time. The events at
+    the same time are sorted, since mido saves them in any order."""
+    tracks = []
+    for track in mido.MidiFile(file=io.BytesIO(data)).tracks:
+        time, messages = 0, []
+        for msg in track:
+            time += msg.time
+            if msg.type in ("note_on", "note_off"):
+                messages.append((time, msg.type == "note_on", msg.note, msg.velocity))
+        tracks.append(sorted(messages))
+    return tracks
+
+
+def midi_of_notes(notes) -> Midi:
+    midi = Midi()
+    track = Track(midi.sts)
+    track.note = [Note(*note) for note in notes]
+    midi.tracks.append(track)
+    return midi
+
+
+def test_reference_same_as_mido(tmp_path):
+    # no two events of the reference are at the same time
+    midi = Midi.from_midi(REFERENCE)
+    expected = mido_bytes(midi)
+    assert midi.to_bytes() == expected
+    midi.save_midi(str(tmp_path / "reference.mid"))
+    assert (tmp_path / "reference.mid").read_bytes() == expected
+
+
+def test_running_status():
+    # a chord and overlapping notes: note_on after note_on, off after off
+    notes = [
+        (60, 480, 0, 64),
+        (64, 480, 0, 64),
+        (67, 960, 240, 64),
+        (72, 240, 960, 80),
+    ]
+    midi = midi_of_notes(notes)
+    data, expected = midi.to_bytes(), mido_bytes(midi)
+    assert len(data) == len(expected)
+    assert note_events(data) == note_events(expected)
+    # on on on off off on off off: 4 status bytes for 8 events,
+    # and 4 deltas of 240 or 480 ticks taking 2 bytes
+    events = encode_notes(Genome.from_track(midi.tracks[0]).notes)
+    assert len(events) == 8 * 3 + 4 + 4
+
+
+@pytest.mark.parametrize("gap", [127, 128, 16383, 16384, 2**21 - 1, 2**21, 2**27])
+def test_long_delta_time(gap):
+    notes = [(60, 480, 0, 64), (62, gap, 480 + gap, 64), (64, 1, 480 + 3 * gap, 64)]
+    midi = midi_of_notes(notes)
+    assert midi.to_bytes() == mido_bytes(midi)
+
+
+@pytest.mark.parametrize(
+    "value", [0, 1, 127, 128, 8191, 16383, 16384, 2**21, 2**28 - 1]
+)
+def test_variable_int(value):
+    assert encode_variable_int(value) == bytes(mido_variable_int(value))
+
+
+def test_genome_same_as_track():
+    track = Midi.from_midi(REFERENCE).tracks[0]
+    genome = Genome.from_track(copy.deepcopy(track))
+    assert encode_track(genome) == encode_track(track)
+    assert np.array_equal(genome.notes, Genome.from_track(track).notes)
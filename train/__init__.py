@@ -1,23 +1,144 @@
+import random
+from typing import Union
 from midoWrapper import *
-from .pitch import GAForPitch
+from .base import TrackGABase, random_population, random_population_on_rhythm
+from .pitch import GAForPitch, PitchParameter, ReferenceSet
 from .rhythm import GAForRhythm
+from .island import train_islands, migration_targets
+from .batch import generate, run_batch, load_references
+from .reference import (
+    load_reference,
+    save_reference,
+    load_reference_file,
+    load_reference_set,
+    repeat_reference,
+)
+from .stopping import EarlyStopping
+from .checkpoint import Checkpoint
+from .progress import Progress, ProgressInfo, TrainingCancelled
 
 
 def train(
-    ref_track: Track, population_size: int, mutation_rate: float, iteration_num: int
+    ref_track: Track,
+    population_size: int,
+    mutation_rate: float,
+    iteration_num: int,
+    workers: int = 0,
+    seed: int = None,
+    summary: dict = None,
+    ref_param: Union[PitchParameter, ReferenceSet] = None,
+    profile: str = None,
+    stopping: EarlyStopping = None,
+    checkpoint: Checkpoint = None,
+    resume: bool = False,
+    rng: Rng_T = None,
+    progress: Progress = None,
 ):
-    """Train with GA using a reference track."""
-    population = [
-        Track(ref_track.sts).generate_random_track() for _ in range(population_size)
-    ]
-    ga_rhythm = GAForRhythm(population, mutation_rate)
-    rhythm_track = ga_rhythm.run(iteration_num)
-
-    # Use the rhythm of the track forever
-    population_with_rhythm = [
-        Track(ref_track.sts).generate_random_pitch_on_rhythm(rhythm_track)
-        for _ in range(population_size)
-    ]
-    ga_pitch = GAForPitch(ref_track, population_with_rhythm, mutation_rate)
-    result = ga_pitch.run(iteration_num)
-    return result
+    """Train with GA using a reference track.
+
+    If `workers` is not 0, the fitness is evaluated in a pool of processes
+    (`None` for all the cores). Give a `seed` for a reproducible result,
+    which does not depend on the number of workers, or the generator `rng`
+    to draw all the random numbers from (`random` by default).
+    The final fitness and the generations used are saved in `summary` if given.
+    Give `ref_param` if the pitch parameters of the reference are known,
+    or a `ReferenceSet` to train the pitch against several references.
+    With a `profile` file, the stats of the phases of each epoch are appended
+    to it as json lines, and their totals are saved in `summary`.
+    Each phase stops early by the `stopping` policy if given, and the
+    reasons to stop are saved in `summary`.
+
+    With a `checkpoint`, the state of the training is saved periodically
+    and removed when finished. If `resume` and the checkpoint is there,
+    the training continues from it, with the same result as if it had
+    never been interrupted.
+
+    The `progress` is reported after the epochs, and it may cancel the
+    training by raising `TrainingCancelled`."""
+    if rng is None:
+        rng = random.Random(seed) if seed is not None else get_rng()
+    phase, state = None, None
+    if checkpoint is not None:
+        if resume and checkpoint.exists():
+            phase, state = checkpoint.load(ref_track.sts, rng)
+            print(f"Resume the {phase} training at generation {state['generation']}")
+        else:
+            checkpoint.summary = {}
+
+    if phase != GAForPitch.name:
+        if state is not None:
+            population = state["population"]
+        else:
+            population = random_population(ref_track.sts, population_size, rng)
+        ga_rhythm = GAForRhythm(population, mutation_rate, rng=rng)
+        if state is not None:
+            ga_rhythm.set_state(state)
+        rhythm_track = _run(
+            ga_rhythm, iteration_num, workers, profile, stopping, checkpoint, progress
+        ).to_track()
+        rhythm_summary = {
+            "rhythm_fitness": float(ga_rhythm.final_fitness),
+            "rhythm_generations": ga_rhythm.generation,
+            "rhythm_stop": ga_rhythm.stop_reason,
+        }
+
+        # Use the rhythm of the track forever
+        population_with_rhythm = random_population_on_rhythm(
+            ref_track.sts, rhythm_track, population_size, rng
+        )
+        ga_pitch = GAForPitch(
+            ref_track,
+            population_with_rhythm,
+            mutation_rate,
+            ref_param=ref_param,
+            rng=rng,
+        )
+        if checkpoint is not None:
+            checkpoint.summary = rhythm_summary
+            checkpoint.save(ga_pitch)
+    else:
+        ga_rhythm = None
+        rhythm_summary = checkpoint.summary
+        ga_pitch = GAForPitch(
+            ref_track, state["population"], mutation_rate, ref_param=ref_param, rng=rng
+        )
+        ga_pitch.set_state(state)
+    result = _run(
+        ga_pitch, iteration_num, workers, profile, stopping, checkpoint, progress
+    )
+    if checkpoint is not None:
+        checkpoint.remove()
+
+    if summary is not None:
+        summary.update(rhythm_summary)
+        summary["pitch_fitness"] = float(ga_pitch.final_fitness)
+        summary["pitch_generations"] = ga_pitch.generation
+        summary["pitch_stop"] = ga_pitch.stop_reason
+        if profile is not None:
+            if ga_rhythm is not None:
+                summary["rhythm_profile"] = ga_rhythm.profiler.total.to_dict()
+            summary["pitch_profile"] = ga_pitch.profiler.total.to_dict()
+    return result.to_track()
+
+
+def _run(
+    ga: TrackGABase,
+    iteration_num: int,
+    workers: int,
+    profile: str = None,
+    stopping: EarlyStopping = None,
+    checkpoint: Checkpoint = None,
+    progress: Progress = None,
+) -> Genome:
+    ga.progress = progress
+    if profile is not None:
+        ga.start_profiler(profile)
+    if workers != 0:
+        ga.start_pool(workers)
+    try:
+        return ga.run(iteration_num, stopping, checkpoint)
+    finally:
+        ga.close_pool()
+        if ga.profiler is not None:
+            # keep the stats, only close the stream
+            ga.profiler.close()
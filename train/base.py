@@ -1,13 +1,25 @@
 from abc import ABCMeta, abstractmethod
-from random import random
-from typing import List
+from contextlib import nullcontext
+from typing import Dict, List, Union
+import numpy as np
 from midoWrapper import *
+from .parallel import FitnessPool
+from .cache import FitnessCache, genome_key
+from .profile import EpochProfiler
+from .stopping import EarlyStopping
+from .progress import Progress
+from .checkpoint import Checkpoint
 
+# The number of fitness values remembered by each GA, 0 to disable it
+fitness_cache_size = 1024
 
-def choice_with_weight(choices_list: List, weighted_list: List[float]):
+
+def choice_with_weight(
+    choices_list: List, weighted_list: List[float], rng: Rng_T = None
+):
     """Randomly choose an element from choices_list with weight in weighted_list"""
     sum_weight = sum(weighted_list)
-    rand = random() * sum_weight
+    rand = get_rng(rng).random() * sum_weight
     temp = 0
     for i, weight in enumerate(weighted_list):
         if temp <= rand < temp + weight:
@@ -16,14 +28,63 @@ def choice_with_weight(choices_list: List, weighted_list: List[float]):
     return choices_list[-1]
 
 
+def random_population(
+    settings: MusicSettings, size: int, rng: Rng_T = None
+) -> List[Genome]:
+    """Generate a population of random tracks."""
+    return [
+        Genome.from_track(Track(settings).generate_random_track(rng))
+        for _ in range(size)
+    ]
+
+
+def random_population_on_rhythm(
+    settings: MusicSettings, rhythm_track: Track, size: int, rng: Rng_T = None
+) -> List[Genome]:
+    """Generate a population of random pitches on the rhythm of the track."""
+    return [
+        Genome.from_track(
+            Track(settings).generate_random_pitch_on_rhythm(rhythm_track, rng)
+        )
+        for _ in range(size)
+    ]
+
+
+def echo_bars(bar_number: int) -> np.ndarray:
+    """The first bars of the echoing pairs of bars.
+    Bar 0 and 2; 1 and 3; 4 and 6; 5 and 7 are echo, etc."""
+    return np.array(
+        [bar + i for bar in range(0, bar_number - 3, 4) for i in (0, 1)], dtype=int
+    )
+
+
+def degree_table(key: Key_T) -> np.ndarray:
+    """The order in the given mode of the 12 pitch classes starting from C.
+    For example, in C major, C is 1, D is 2, and 0 for C# (not in the mode)."""
+    return scale_table(key).degree
+
+
+def sequential_sum(values: np.ndarray, axis: int = -1) -> np.ndarray:
+    """Sum the values one by one along the axis, like a python loop does.
+    The result is the same as the loop to the last bit."""
+    if values.shape[axis] == 0:
+        return np.sum(values, axis=axis)
+    return np.take(np.cumsum(values, axis=axis), -1, axis=axis)
+
+
 class TrackParameterBase(metaclass=ABCMeta):
     """Base class for calculating parameters of the tracks"""
 
-    def __init__(self, track: Track):
+    def __init__(self, track: Union[Track, Genome]):
+        if isinstance(track, Track):
+            track = Genome.from_track(track)
         self.settings = track.sts
         self.track = track
         self.bar_number = track.bar_number
-        self.bars = self.track.split_into_bars()
+        # the notes split into bars, the note they come from and their bar index
+        self.segments, self.segment_index, self.segment_bars = split_bars(
+            track.notes, self.settings.bar_length
+        )
 
     @abstractmethod
     def update_parameters(self):
@@ -33,22 +94,112 @@ class TrackParameterBase(metaclass=ABCMeta):
 class TrackGABase(metaclass=ABCMeta):
     """Base class for GA"""
 
-    def __init__(self, population: List[Track], mutation_rate: float):
+    name: str = None  # the phase of the training it runs
+
+    def __init__(
+        self,
+        population: List[Genome],
+        mutation_rate: float,
+        cache_size: int = fitness_cache_size,
+        rng: Rng_T = None,
+    ):
         self.population = population
         self.bar_number = population[0].bar_number
         self.mutation_rate = mutation_rate
-        self.fitness = [0] * len(population)
+        self.fitness = np.zeros(len(population), dtype=float)
         self.best_index, self.second_index = 0, 0
         self.settings = population[0].sts
+        self.pool: FitnessPool = None
+        self.generation = 0  # the number of epochs done
+        self.final_fitness = None  # the fitness of the result of `run`
+        self.fitness_cache = FitnessCache(cache_size) if cache_size else None
+        self.profiler: EpochProfiler = None
+        self.evaluations = 0  # the number of individuals evaluated
+        self.stop_reason: str = None  # why `run` stopped, see `EarlyStopping`
+        self.rng = get_rng(rng)  # the generator of the crossover and the mutation
+        self.progress: Progress = None  # reported after each epoch if given
+
+    def __getstate__(self):
+        # The GA is shipped to the workers of the pool without its population
+        state = self.__dict__.copy()
+        state["population"] = []
+        state["pool"] = None
+        state["fitness_cache"] = None
+        state["profiler"] = None
+        state["rng"] = None
+        state["progress"] = None
+        return state
+
+    def start_pool(self, workers: int = None, chunk_size: int = None):
+        """Evaluate the fitness in a pool of `workers` processes from now on,
+        `chunk_size` individuals per task. All the cores are used by default."""
+        self.pool = FitnessPool(self, workers, chunk_size)
+
+    def close_pool(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+
+    def start_profiler(self, stream=None) -> EpochProfiler:
+        """Record the time, the calls and the allocations of each phase of
+        the epochs from now on, and the number of evaluations. The stats of
+        each epoch are written as a json line to `stream` if given."""
+        self.profiler = EpochProfiler(stream, type(self).__name__)
+        return self.profiler
+
+    def stop_profiler(self) -> EpochProfiler:
+        profiler, self.profiler = self.profiler, None
+        if profiler is not None:
+            profiler.close()
+        return profiler
+
+    def phase(self, name: str):
+        """The context recording a phase of the epoch if profiling."""
+        if self.profiler is None:
+            return nullcontext()
+        return self.profiler.phase(name)
+
+    def count(self, name: str, value: int = 1):
+        if self.profiler is not None:
+            self.profiler.count(name, value)
 
     def update_fitness(self):
-        for idx, track in enumerate(self.population):
-            self.fitness[idx] = self.get_fitness(track)
+        if self.fitness_cache is None:
+            self.fitness = self._evaluate(self.population)
+            return
+
+        # Evaluate only the individuals not seen before, each of them once
+        keys = [genome_key(track) for track in self.population]
+        fitness, found = self.fitness_cache.lookup(keys)
+        missing = {}
+        for i in np.flatnonzero(~found):
+            missing.setdefault(keys[i], []).append(i)
+        self.count("cache_hits", len(keys) - len(missing))
+        if missing:
+            values = self._evaluate(
+                [self.population[idx[0]] for idx in missing.values()]
+            )
+            self.fitness_cache.store(list(missing), values)
+            for idx, value in zip(missing.values(), values):
+                fitness[idx] = value
+        self.fitness = fitness
+
+    def _evaluate(self, population: List[Genome]) -> np.ndarray:
+        self.evaluations += len(population)
+        self.count("evaluations", len(population))
+        if self.pool is None:
+            return self.get_population_fitness(population)
+        return self.pool.evaluate(population)
 
     @abstractmethod
-    def get_fitness(self, track: Track) -> float:
+    def get_fitness(self, track: Genome) -> float:
         raise NotImplementedError
 
+    def get_population_fitness(self, population: List[Genome]) -> np.ndarray:
+        """The fitness of all the individuals.
+        Override it if they can be evaluated at once."""
+        return np.array([self.get_fitness(track) for track in population], dtype=float)
+
     def select(self):
         for i in range(len(self.fitness)):
             if self.fitness[i] > self.fitness[self.best_index]:
@@ -66,14 +217,60 @@ class TrackGABase(metaclass=ABCMeta):
         raise NotImplementedError
 
     def train_info(self):
-        return "Now the best fitness is " + str(self.fitness[self.best_index])
+        info = "Now the best fitness is " + str(self.fitness[self.best_index])
+        if self.fitness_cache is not None:
+            info += f", {self.fitness_cache.info()}"
+        return info
 
     def epoch(self):
-        self.crossover()
-        self.mutate()
-        self.update_fitness()
-        self.select()
+        with self.phase("crossover"):
+            self.crossover()
+        with self.phase("mutate"):
+            self.mutate()
+        with self.phase("update_fitness"):
+            self.update_fitness()
+        with self.phase("select"):
+            self.select()
+        self.generation += 1
+        if self.profiler is not None:
+            self.profiler.end_epoch(self.generation, self.fitness[self.best_index])
+        if self.progress is not None:
+            self.progress.update(self)
+
+    def apply_mutation(self, mutation, track: Genome):
+        """Apply the mutation to the track, recorded by its name if profiling."""
+        if self.profiler is None:
+            return mutation(track)
+        with self.profiler.phase(mutation.__name__.lstrip("_")):
+            return mutation(track)
+
+    def get_state(self) -> dict:
+        """The state of the training to be checkpointed."""
+        return {
+            "population": self.population,
+            "fitness": self.fitness,
+            "best_index": self.best_index,
+            "second_index": self.second_index,
+            "generation": self.generation,
+            "evaluations": self.evaluations,
+        }
+
+    def set_state(self, state: dict):
+        """Continue the training from the state given by `get_state`."""
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def check_stop(self, stopping: EarlyStopping) -> str:
+        """The reason to stop by the early stopping policy, None to go on."""
+        if stopping is None:
+            return None
+        return stopping.check(self.fitness[self.best_index], self.evaluations)
 
     @abstractmethod
-    def run(self, generation):
+    def run(
+        self,
+        generation: int,
+        stopping: EarlyStopping = None,
+        checkpoint: Checkpoint = None,
+    ):
         raise NotImplementedError
@@ -0,0 +1,233 @@
+import os
+import sys
+import json
+import random
+from time import time
+from multiprocessing import Pool
+from typing import List, Tuple
+from midoWrapper import *
+from .island import train_islands
+from .reference import load_reference, load_reference_set
+from .pitch import ReferenceSet
+from .stopping import EarlyStopping
+from .checkpoint import Checkpoint
+from .progress import Progress
+
+
+def generate(
+    reference_file: str,
+    output_file: str,
+    population_size: int,
+    mutation_rate: float,
+    iteration_num: int,
+    with_accompaniment: bool = True,
+    workers: int = 0,
+    islands: int = 0,
+    seed: int = None,
+    cache_folder: str = None,
+    stopping: EarlyStopping = None,
+    checkpoint: Checkpoint = None,
+    resume: bool = False,
+    progress: Progress = None,
+    style: List[str] = None,
+    aggregate: str = ReferenceSet.MEAN,
+) -> dict:
+    """Generate a piece with GA using the reference midi file and save it.
+    Train on islands in parallel processes if `islands` is not 0.
+    The parsed reference is cached in `cache_folder` if given.
+    Stop each phase early by the `stopping` policy if given, and save the
+    state to `checkpoint` periodically, resumed from it if `resume`
+    (both not on islands). Report the `progress` of the training if given.
+    With the midi files of a `style`, the pitch is trained against all of
+    them, aggregated by `aggregate` (see `ReferenceSet`), instead of the
+    reference alone, which still gives the settings and the accompaniment.
+
+    Return the summary of the training: the final fitness and the
+    generations used in each phase, and the time cost."""
+    from . import train
+
+    t_start = time()
+    summary = {"reference": reference_file, "output": output_file, "seed": seed}
+
+    refmidi, ref_param = load_reference(reference_file, cache_folder)
+    ref_track, left_hand = refmidi.tracks
+    if style:
+        ref_param = load_reference_set(
+            style, ref_track.sts.bar_number, aggregate, cache_folder
+        )
+    if islands:
+        result = train_islands(
+            ref_track,
+            population_size,
+            mutation_rate,
+            iteration_num,
+            islands,
+            seed=seed,
+            summary=summary,
+            ref_param=ref_param,
+        )
+    else:
+        result = train(
+            ref_track,
+            population_size,
+            mutation_rate,
+            iteration_num,
+            workers,
+            seed,
+            summary,
+            ref_param,
+            stopping=stopping,
+            checkpoint=checkpoint,
+            resume=resume,
+            progress=progress,
+        )
+
+    s = Midi(ref_track.sts)
+    s.sts.bpm = 120
+    s.tracks.append(result)
+
+    # accompaniment (stolen from reference)
+    if with_accompaniment:
+        for note in left_hand.note:
+            note.velocity = ref_track.sts.velocity
+        s.tracks.append(left_hand)
+
+    s.save_midi(output_file)
+    summary["time"] = time() - t_start
+    print(f"Time cost: {summary['time']}s")
+    return summary
+
+
+def load_references(source: str) -> List[Tuple[str, int]]:
+    """Load the reference files and their numbers of variations from
+    a directory (all the midi files in it) or a json manifest.
+
+    The manifest is a list of file names, or of objects like
+    `{"reference": "a.mid", "variations": 3}`, relative to the manifest.
+    The number of variations is None if not given."""
+    if os.path.isdir(source):
+        return [
+            (os.path.join(source, name), None)
+            for name in sorted(os.listdir(source))
+            if name.lower().endswith((".mid", ".midi"))
+        ]
+
+    with open(source, encoding="utf-8") as f:
+        manifest = json.load(f)
+    folder = os.path.dirname(source)
+    references = []
+    for item in manifest:
+        if isinstance(item, str):
+            item = {"reference": item}
+        references.append(
+            (os.path.join(folder, item["reference"]), item.get("variations"))
+        )
+    return references
+
+
+def _run_job(item: Tuple[int, dict]) -> Tuple[int, dict]:
+    idx, job = item
+    return idx, _generate_job(job)
+
+
+def _generate_job(job: dict) -> dict:
+    # The forked workers share the random state, so seed each job
+    random.seed(job["seed"])
+    stdout = sys.stdout
+    if not job.pop("verbose"):
+        sys.stdout = open(os.devnull, "w")
+    try:
+        return generate(**job)
+    except Exception as e:
+        return {
+            "reference": job["reference_file"],
+            "output": job["output_file"],
+            "seed": job["seed"],
+            "error": str(e),
+        }
+    finally:
+        if sys.stdout is not stdout:
+            sys.stdout.close()
+            sys.stdout = stdout
+
+
+def run_batch(
+    source: str,
+    output_folder: str,
+    variations: int = 1,
+    population_size: int = 20,
+    mutation_rate: float = 0.8,
+    iteration_num: int = 1000,
+    with_accompaniment: bool = True,
+    processes: int = None,
+    seed: int = None,
+    verbose: bool = False,
+    cache_folder: str = None,
+    stopping: EarlyStopping = None,
+    checkpoint_interval: int = 0,
+    style: str = None,
+    aggregate: str = ReferenceSet.MEAN,
+) -> List[dict]:
+    """Generate `variations` pieces for each reference file in `source`
+    (see `load_references`), with the training jobs scheduled over a pool
+    of processes, one for each core by default.
+
+    The pieces are saved as `<reference>_<n>.mid` in the output folder,
+    together with `summary.json`. The references with the same name, in
+    different folders or listed again, continue the numbers `n` of the
+    previous ones. Return the summaries of the jobs, in order.
+    The parsed references are shared by the jobs through `cache_folder`.
+    If `checkpoint_interval` is not 0, each job saves its state as
+    `<reference>_<n>.ckpt.npz` every so many generations, and continues
+    from it when the batch is run again after being killed.
+    With a `style` (a source like `source`), the pitch of every job is
+    trained against all the files of the style (see `generate`)."""
+    t_start = time()
+    jobs = []
+    style_files = None
+    if style is not None:
+        style_files = [reference for reference, _ in load_references(style)]
+    numbers = {}  # the pieces named after each reference name
+    for reference, count in load_references(source):
+        name = os.path.splitext(os.path.basename(reference))[0]
+        first = numbers.get(name.casefold(), 0)
+        count = count if count is not None else variations
+        numbers[name.casefold()] = first + count
+        for idx in range(first, first + count):
+            checkpoint = None
+            if checkpoint_interval:
+                checkpoint = Checkpoint(
+                    os.path.join(output_folder, f"{name}_{idx}.ckpt.npz"),
+                    checkpoint_interval,
+                )
+            jobs.append(
+                {
+                    "reference_file": reference,
+                    "output_file": os.path.join(output_folder, f"{name}_{idx}.mid"),
+                    "population_size": population_size,
+                    "mutation_rate": mutation_rate,
+                    "iteration_num": iteration_num,
+                    "with_accompaniment": with_accompaniment,
+                    "seed": None if seed is None else seed + len(jobs),
+                    "cache_folder": cache_folder,
+                    "stopping": stopping,
+                    "checkpoint": checkpoint,
+                    "resume": True,
+                    "style": style_files,
+                    "aggregate": aggregate,
+                    "verbose": verbose,
+                }
+            )
+
+    summaries = [None] * len(jobs)
+    with Pool(processes) as pool:
+        results = pool.imap_unordered(_run_job, enumerate(jobs))
+        for done, (idx, summary) in enumerate(results, 1):
+            summaries[idx] = summary
+            status = summary.get("error") or f"{summary['time']:.2f}s"
+            print(f"[{done}/{len(jobs)}] {summary['output']}: {status}")
+
+    os.makedirs(output_folder, exist_ok=True)
+    with open(os.path.join(output_folder, "summary.json"), "w") as f:
+        json.dump({"time": time() - t_start, "jobs": summaries}, f, indent=2)
+    return summaries
@@ -0,0 +1,64 @@
+import hashlib
+import numpy as np
+from collections import OrderedDict
+from typing import List, Tuple
+from midoWrapper import Genome
+
+
+def genome_key(genome: Genome) -> bytes:
+    """A fast hash of the notes of the genome."""
+    return hashlib.blake2b(genome.notes.tobytes(), digest_size=16).digest()
+
+
+class FitnessCache:
+    """A bounded LRU cache of the fitness of the individuals,
+    keyed by the hash of their notes.
+
+    The GAs copy the best individuals and often leave them unchanged,
+    so the same notes are evaluated again and again without it."""
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self.values: OrderedDict[bytes, float] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.values)
+
+    def lookup(self, keys: List[bytes]) -> Tuple[np.ndarray, np.ndarray]:
+        """The cached fitness of the keys, and whether each of them is found.
+        The fitness of the missing ones is nan, which is a valid fitness too."""
+        fitness = np.full(len(keys), np.nan, dtype=float)
+        found = np.zeros(len(keys), dtype=bool)
+        for i, key in enumerate(keys):
+            if key in self.values:
+                self.values.move_to_end(key)
+                fitness[i] = self.values[key]
+                found[i] = True
+                self.hits += 1
+            else:
+                self.misses += 1
+        return fitness, found
+
+    def store(self, keys: List[bytes], fitness: np.ndarray):
+        for key, value in zip(keys, fitness.tolist()):
+            self.values[key] = value
+            self.values.move_to_end(key)
+        while len(self.values) > self.max_size:
+            self.values.popitem(last=False)
+
+    def clear(self):
+        self.values.clear()
+        self.hits = self.misses = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def info(self) -> str:
+        return (
+            f"fitness cache {self.hits} hits, {self.misses} misses "
+            f"({self.hit_rate:.0%})"
+        )
@@ -0,0 +1,133 @@
+import os
+import json
+import numpy as np
+from typing import TYPE_CHECKING, List, Tuple
+from midoWrapper import *
+
+if TYPE_CHECKING:
+    # only for the annotations, since the GAs use the checkpoints
+    from .base import TrackGABase
+
+# Change it when the format changes, to refuse the old files
+CHECKPOINT_VERSION = 1
+
+
+def _pack_genomes(genomes: List[Genome]) -> dict:
+    return {
+        "notes": np.concatenate(
+            [genome.notes for genome in genomes] or [np.zeros(0, dtype=NOTE_DTYPE)]
+        ),
+        "offsets": np.cumsum([0] + [len(genome) for genome in genomes]),
+        "instruments": np.array([genome.instrument for genome in genomes], dtype=int),
+    }
+
+
+def _unpack_genomes(
+    notes: np.ndarray,
+    offsets: np.ndarray,
+    instruments: np.ndarray,
+    settings: MusicSettings,
+) -> List[Genome]:
+    return [
+        Genome(notes[offsets[idx] : offsets[idx + 1]].copy(), settings, instrument)
+        for idx, instrument in enumerate(instruments.tolist())
+    ]
+
+
+class Checkpoint:
+    """Save the state of the training to `filename` every `interval`
+    generations: the population, the fitness, the best individuals,
+    the generation, the state of the generator of the GA and the phase
+    (rhythm or pitch),
+    together with the summary of the phases already finished.
+
+    The file is a compressed npz, written to a temporary file first,
+    so a killed process leaves the last complete checkpoint behind."""
+
+    def __init__(self, filename: str, interval: int = 50):
+        self.filename = filename
+        self.interval = interval
+        self.summary = {}  # the summary of the phases already finished
+
+    def due(self, ga: "TrackGABase") -> bool:
+        return self.interval > 0 and ga.generation % self.interval == 0
+
+    def exists(self) -> bool:
+        return os.path.exists(self.filename)
+
+    def save(self, ga: "TrackGABase"):
+        state = ga.get_state()
+        version, internal, gauss_next = ga.rng.getstate()
+        meta = {
+            "phase": ga.name,
+            "bar_number": ga.bar_number,
+            "random_version": version,
+            "gauss_next": gauss_next,
+            "summary": self.summary,
+        }
+        arrays = {
+            "version": np.array(CHECKPOINT_VERSION),
+            "random_state": np.array(internal, dtype=np.uint32),
+            "fitness": state.pop("fitness"),
+        }
+        for name, value in _pack_genomes(state.pop("population")).items():
+            arrays[f"population_{name}"] = value
+        if state.get("best_track") is not None:
+            for name, value in _pack_genomes([state["best_track"]]).items():
+                arrays[f"best_{name}"] = value
+        state.pop("best_track", None)
+        meta["state"] = state
+        arrays["meta"] = np.array(json.dumps(meta))
+
+        folder = os.path.dirname(self.filename)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        temp = f"{self.filename}.{os.getpid()}.tmp"
+        with open(temp, "wb") as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(temp, self.filename)
+
+    def load(self, settings: MusicSettings, rng: Rng_T = None) -> Tuple[str, dict]:
+        """The phase and the state of the GA saved in the file, with
+        the genomes in the given settings. The state of the generator
+        (`random` by default) and the summary of the finished phases
+        are restored too."""
+        with np.load(self.filename) as data:
+            arrays = {name: data[name] for name in data.files}
+        if int(arrays["version"]) != CHECKPOINT_VERSION:
+            raise ValueError(f"Unknown version of the checkpoint: {self.filename}")
+        meta = json.loads(str(arrays["meta"]))
+        if meta["bar_number"] != settings.bar_number:
+            raise ValueError(
+                f"The checkpoint is for {meta['bar_number']} bars, "
+                f"not {settings.bar_number}: {self.filename}"
+            )
+
+        state = meta["state"]
+        state["fitness"] = arrays["fitness"]
+        state["population"] = _unpack_genomes(
+            arrays["population_notes"],
+            arrays["population_offsets"],
+            arrays["population_instruments"],
+            settings,
+        )
+        if "best_notes" in arrays:
+            state["best_track"] = _unpack_genomes(
+                arrays["best_notes"],
+                arrays["best_offsets"],
+                arrays["best_instruments"],
+                settings,
+            )[0]
+        get_rng(rng).setstate(
+            (
+                meta["random_version"],
+                tuple(arrays["random_state"].tolist()),
+                meta["gauss_next"],
+            )
+        )
+        self.summary = meta["summary"]
+        return meta["phase"], state
+
+    def remove(self):
+        if self.exists():
+            os.remove(self.filename)
@@ -0,0 +1,273 @@
+import os
+import numpy as np
+from multiprocessing import Process, Queue, Event, Barrier
+from typing import List, Literal, Union
+from midoWrapper import *
+from .base import TrackGABase, random_population, random_population_on_rhythm
+from .pitch import GAForPitch, PitchParameter, ReferenceSet, pitch_target
+from .rhythm import GAForRhythm, rhythm_target
+
+Topology_T = Literal["ring", "full"]
+
+
+def migration_targets(topology: Topology_T, islands: int) -> List[List[int]]:
+    """The islands each island sends its migrants to.
+    In a ring, island i sends to island i + 1; when full, to all the others."""
+    if topology == "ring":
+        return [[(i + 1) % islands] if islands > 1 else [] for i in range(islands)]
+    elif topology == "full":
+        return [[j for j in range(islands) if j != i] for i in range(islands)]
+    raise ValueError(f"Unknown migration topology: {topology}")
+
+
+class Island:
+    """One population evolving in its own process,
+    exchanging its best individuals with the others periodically."""
+
+    def __init__(
+        self,
+        index: int,
+        ga: TrackGABase,
+        target: float,
+        senders: int,
+        inbox: Queue,
+        outboxes: List[Queue],
+        results: Queue,
+        stop: Event,
+        barrier: Barrier,
+    ):
+        self.index = index
+        self.ga = ga
+        self.target = target
+        self.senders = senders
+        self.inbox = inbox
+        self.outboxes = outboxes
+        self.results = results
+        self.stop = stop
+        self.barrier = barrier
+        self.best_track = ga.population[ga.best_index].clone()
+        self.best_fitness = ga.fitness[ga.best_index]
+
+    def run(self, generation: int, interval: int, migrants: int):
+        reached = False
+        for i in range(generation):
+            # Stop evolving once the target is reached,
+            # but keep migrating until all the islands stop together
+            if not reached:
+                self.ga.epoch()
+                self._update_best()
+                reached = self.best_fitness > self.target
+            if (i + 1) % interval == 0 or i == generation - 1:
+                print(
+                    f"Island {self.index} generation {i}: "
+                    f"Now the best fitness is {self.best_fitness}"
+                )
+                if reached:
+                    self.stop.set()
+                self.migrate(migrants)
+                self.barrier.wait()
+                if self.stop.is_set():
+                    break
+        self.results.put(
+            (self.index, self.best_fitness, self.best_track, self.ga.generation)
+        )
+
+    def _update_best(self):
+        fitness = self.ga.fitness[self.ga.best_index]
+        if fitness > self.best_fitness:
+            self.best_fitness = fitness
+            self.best_track = self.ga.population[self.ga.best_index].clone()
+
+    def migrate(self, migrants: int):
+        """Send the best individuals to the target islands,
+        and replace the worst individuals with those received,
+        but never the `migrants` best ones."""
+        order = np.argsort(self.ga.fitness, kind="stable")
+        best = order[::-1][:migrants]
+        message = (
+            self.index,
+            [self.ga.population[idx].clone() for idx in best],
+            self.ga.fitness[best].copy(),
+        )
+        for outbox in self.outboxes:
+            outbox.put(message)
+
+        # Sort the messages by the sender, so that the result is reproducible
+        messages = sorted(
+            (self.inbox.get() for _ in range(self.senders)), key=lambda x: x[0]
+        )
+        migrated = [
+            (track, value)
+            for _, population, fitness in messages
+            for track, value in zip(population, fitness)
+        ]
+        # Keep as many own best individuals as sent, for the elitism,
+        # and only the best of the received if there are too many
+        room = max(len(self.ga.population) - migrants, 0)
+        if len(migrated) > room:
+            migrated.sort(key=lambda x: x[1], reverse=True)
+            migrated = migrated[:room]
+        for idx, (track, value) in zip(order, migrated):
+            self.ga.population[idx] = track
+            self.ga.fitness[idx] = value
+        self.ga.select()
+        self._update_best()
+
+
+def _run_island(
+    index: int,
+    rng: Rng_T,
+    phase: str,
+    ref_track: Track,
+    rhythm_track: Track,
+    ref_param: Union[PitchParameter, ReferenceSet],
+    population_size: int,
+    mutation_rate: float,
+    generation: int,
+    interval: int,
+    migrants: int,
+    senders: int,
+    inbox: Queue,
+    outboxes: List[Queue],
+    results: Queue,
+    stop: Event,
+    barrier: Barrier,
+):
+    # Each island draws from its own generator, independent of the others
+    if phase == "rhythm":
+        population = random_population(ref_track.sts, population_size, rng)
+        ga, target = GAForRhythm(population, mutation_rate, rng=rng), rhythm_target
+    else:
+        population = random_population_on_rhythm(
+            ref_track.sts, rhythm_track, population_size, rng
+        )
+        ga = GAForPitch(
+            ref_track, population, mutation_rate, ref_param=ref_param, rng=rng
+        )
+        target = pitch_target
+    island = Island(index, ga, target, senders, inbox, outboxes, results, stop, barrier)
+    island.run(generation, interval, migrants)
+
+
+def _run_islands(
+    phase: str,
+    ref_track: Track,
+    rhythm_track: Track,
+    ref_param: Union[PitchParameter, ReferenceSet],
+    population_size: int,
+    mutation_rate: float,
+    generation: int,
+    islands: int,
+    topology: Topology_T,
+    interval: int,
+    migrants: int,
+    rngs: List[Rng_T],
+    summary: dict,
+) -> Genome:
+    targets = migration_targets(topology, islands)
+    senders = [sum(i in target for target in targets) for i in range(islands)]
+    inboxes = [Queue() for _ in range(islands)]
+    results, stop, barrier = Queue(), Event(), Barrier(islands)
+
+    processes = [
+        Process(
+            target=_run_island,
+            args=(
+                i,
+                rngs[i],
+                phase,
+                ref_track,
+                rhythm_track,
+                ref_param,
+                population_size,
+                mutation_rate,
+                generation,
+                interval,
+                migrants,
+                senders[i],
+                inboxes[i],
+                [inboxes[j] for j in targets[i]],
+                results,
+                stop,
+                barrier,
+            ),
+        )
+        for i in range(islands)
+    ]
+    for process in processes:
+        process.start()
+    # Collect the results before joining, in case the queue blocks the processes
+    best = sorted(results.get() for _ in range(islands))
+    for process in processes:
+        process.join()
+
+    index, fitness, track, _ = max(best, key=lambda result: result[1])
+    print(f"Final fitness for {phase}: {fitness} (island {index})")
+    summary[f"{phase}_fitness"] = float(fitness)
+    summary[f"{phase}_generations"] = max(result[3] for result in best)
+    return track
+
+
+def train_islands(
+    ref_track: Track,
+    population_size: int,
+    mutation_rate: float,
+    iteration_num: int,
+    islands: int = None,
+    topology: Topology_T = "ring",
+    interval: int = 50,
+    migrants: int = 1,
+    seed: int = None,
+    summary: dict = None,
+    ref_param: Union[PitchParameter, ReferenceSet] = None,
+) -> Track:
+    """Train with GA using a reference track, with several populations
+    (islands) evolving in parallel processes, one for each core by default.
+
+    Every `interval` generations, each island sends its best `migrants`
+    individuals to the islands given by the `topology`, where they replace
+    the worst ones, keeping the best `migrants` of each island. Give a `seed` for a reproducible result. The final fitness
+    and the generations used (by the longest island) are saved in `summary`.
+    Give `ref_param` if the pitch parameters of the reference are known,
+    or a `ReferenceSet` to train the pitch against several references."""
+    islands = islands if islands else os.cpu_count()
+    summary = summary if summary is not None else {}
+    # independent generators for the islands of both phases
+    rngs = spawn_rngs(seed, islands * 2)
+
+    print("--------- Start Rhythm Training ---------")
+    rhythm_track = _run_islands(
+        "rhythm",
+        ref_track,
+        None,
+        None,
+        population_size,
+        mutation_rate,
+        iteration_num,
+        islands,
+        topology,
+        interval,
+        migrants,
+        rngs[:islands],
+        summary,
+    ).to_track()
+    print("--------- Finish Rhythm Training ---------")
+
+    print("--------- Start Pitch Training ---------")
+    result = _run_islands(
+        "pitch",
+        ref_track,
+        rhythm_track,
+        ref_param,
+        population_size,
+        mutation_rate,
+        iteration_num,
+        islands,
+        topology,
+        interval,
+        migrants,
+        rngs[islands:],
+        summary,
+    )
+    print("--------- Finish Pitch Training ---------")
+    return result.to_track()
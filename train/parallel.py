@@ -0,0 +1,50 @@
+import os
+import math
+import numpy as np
+from multiprocessing import Pool
+from typing import List
+from midoWrapper import Genome
+
+# The GA owned by the worker process, set once when the worker starts
+_worker_ga = None
+
+
+def _init_worker(ga):
+    global _worker_ga
+    _worker_ga = ga
+
+
+def _evaluate_chunk(chunk: List[Genome]) -> np.ndarray:
+    return _worker_ga.get_population_fitness(chunk)
+
+
+class FitnessPool:
+    """A pool of processes evaluating the fitness of the population in chunks.
+
+    The GA (with its reference parameters but without its population) is
+    shipped to each worker only once, when the worker starts. The fitness
+    does not depend on how the population is chunked."""
+
+    def __init__(self, ga, workers: int = None, chunk_size: int = None):
+        self.workers = workers if workers else os.cpu_count()
+        self.chunk_size = chunk_size
+        self.pool = Pool(self.workers, initializer=_init_worker, initargs=(ga,))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def evaluate(self, population: List[Genome]) -> np.ndarray:
+        """The fitness of all the individuals, in the order of the population."""
+        chunk_size = self.chunk_size or math.ceil(len(population) / self.workers)
+        chunks = [
+            population[i : i + chunk_size]
+            for i in range(0, len(population), chunk_size)
+        ]
+        return np.concatenate(self.pool.map(_evaluate_chunk, chunks))
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
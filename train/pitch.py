@@ -1,5 +1,4 @@
-from copy import deepcopy
-from random import choice, randint, random
+from random import random
 import numpy as np
 from .base import *
 
@@ -26,6 +25,10 @@ interval_emotion_dict = {
     6: 2,  # sixth: submediant, semi-cadence
     7: 5,  # seventh: lead, strong tension
 }
+# look-up table of interval_emotion_dict, 0 for the notes not in the mode
+emotion_table = np.array(
+    [0] + [interval_emotion_dict[order] for order in range(1, 8)], dtype=float
+)
 # the target value
 pitch_target = 8.5
 
@@ -35,21 +38,61 @@ mutation_rate_2 = 1
 mutation_rate_3 = 1
 mutation_rate_4 = 2
 
+# Evaluate only the changed bars for the tracks at least this long,
+# for the shorter ones, evaluating the whole track at once is faster
+incremental_bar_number = 32
+
+
+def echo_of_differences(diff: np.ndarray) -> np.ndarray:
+    """The echo of the individuals by the pitch differences in their bars
+    (individuals x bars x note units)."""
+    left = echo_bars(diff.shape[1])
+    similarity = np.mean(np.abs(diff[:, left] - diff[:, left + 2]), axis=2)
+    return np.sum(similarity, axis=1)
+
 
 class PitchParameter(TrackParameterBase):
-    def __init__(self, track: Track) -> None:
+    """Pitch parameters of a batch of tracks sharing the rhythm of `track`.
+
+    `pitch` is the matrix of their pitches (individuals x notes), and
+    the track itself is evaluated if not given. All the parameters have
+    a leading axis for the individuals."""
+
+    def __init__(self, track: Union[Track, Genome], pitch: np.ndarray = None) -> None:
         super().__init__(track)
-        self.means = np.zeros(self.bar_number, dtype=float)
-        self.emotion = np.zeros(self.bar_number * 2, dtype=float)
+        if pitch is None:
+            pitch = self.track.pitch[None, :]
+        self.pitch = pitch.astype(int)
+        self.size = len(self.pitch)
+        self.segment_pitch = self.pitch[:, self.segment_index]
+        self.means = np.zeros((self.size, self.bar_number), dtype=float)
+        self.emotion = np.zeros((self.size, self.bar_number * 2), dtype=float)
         self.melody_line = np.zeros(
-            self.bar_number * self.settings.bar_length // self.settings.note_unit,
+            (
+                self.size,
+                self.bar_number * self.settings.bar_length // self.settings.note_unit,
+            ),
             dtype=float,
         )
-        self.bad_notes = 0
-        self.three_notes = 0.0
-        self.echo = 0.0
+        self.bad_notes = np.zeros(self.size, dtype=int)
+        self.three_notes = np.zeros(self.size, dtype=float)
+        self.echo = np.zeros(self.size, dtype=float)
         self.update_parameters()
 
+    @staticmethod
+    def restore(
+        track: Union[Track, Genome], values: Dict[str, np.ndarray]
+    ) -> "PitchParameter":
+        """Restore the parameters of the track from the saved values
+        (name -> array), without calculating them again."""
+        param = PitchParameter.__new__(PitchParameter)
+        TrackParameterBase.__init__(param, track)
+        param.pitch = param.track.pitch[None, :].astype(int)
+        param.size = 1
+        param.segment_pitch = param.pitch[:, param.segment_index]
+        param.__dict__.update(values)
+        return param
+
     def update_parameters(self):
         self._update_interval_parameters()
         self._update_bad_notes()
@@ -58,110 +101,398 @@ class PitchParameter(TrackParameterBase):
         self._update_echo()
         self._update_melody_line()
 
+    def _sum_by_bar(self, values: np.ndarray, bars: np.ndarray) -> np.ndarray:
+        """Sum the values (individuals x items) of the items in each bar.
+        The items are added in order, so each row does not depend on the others."""
+        keys = np.arange(self.size)[:, None] * self.bar_number + bars
+        total = np.bincount(
+            keys.ravel(), values.ravel(), minlength=self.size * self.bar_number
+        )
+        return total.reshape(self.size, self.bar_number)
+
     def _update_interval_parameters(self):
-        for idx, bar in enumerate(self.bars):
-            values = []
-            for i in range(len(bar) - 1):
-                interval = bar[i + 1].pitch - bar[i].pitch
-                values.append(abs(interval) / 3)
-            if idx > 0:
-                # add the interval between the last note of the previous bar
-                # and the first note of the current bar
-                interval = bar[0].pitch - self.bars[idx - 1][-1].pitch
-                values.append(abs(interval) / 3)
-            if not values:
-                self.means[idx] = 0
-                continue
-            self.means[idx] = np.mean(values)
+        # The intervals in a bar, with the interval between the last note
+        # of the previous bar and the first note of the current bar
+        intervals = np.abs(np.diff(self.segment_pitch, axis=1)) / 3
+        bars = self.segment_bars[1:]
+        count = np.bincount(bars, minlength=self.bar_number)
+        self.means = self._sum_by_bar(intervals, bars)
+        np.divide(self.means, count, out=self.means, where=count > 0)
 
     def _update_three_note_parameters(self):
-        for bar in self.bars:
-            score_in_bar = 0
-            for idx in range(len(bar) - 2):
-                diff1 = bar[idx + 1].pitch - bar[idx].pitch
-                diff2 = bar[idx + 2].pitch - bar[idx + 1].pitch
-                if abs(diff1) <= 5 and abs(diff2) <= 5 and diff1 * diff2 >= 0:
-                    score_in_bar += 1
-                elif diff1 * diff2 < -25:
-                    score_in_bar -= 3
-            if len(bar) > 2:
-                self.three_notes += score_in_bar / (len(bar) - 2)
+        diff = np.diff(self.segment_pitch, axis=1)
+        diff1, diff2 = diff[:, :-1], diff[:, 1:]
+        good = (np.abs(diff1) <= 5) & (np.abs(diff2) <= 5) & (diff1 * diff2 >= 0)
+        bad = diff1 * diff2 < -25
+        score = good.astype(int) - 3 * bad
+        # only the three notes in the same bar are considered,
+        # and the score of a bar is averaged by its number of notes
+        count = np.bincount(self.segment_bars, minlength=self.bar_number)
+        weight = np.zeros(self.bar_number, dtype=float)
+        np.divide(1, count - 2, out=weight, where=count > 2)
+        in_bar = self.segment_bars[:-2] == self.segment_bars[2:]
+        score_weight = in_bar * weight[self.segment_bars[:-2]]
+        self.three_notes = np.sum(score * score_weight, axis=1)
 
     def _update_bad_notes(self):
-        self.bad_notes = 0
-        for note in self.track.note:
-            if not Note.in_mode(note.pitch, self.track.key):
-                self.bad_notes += 1
+        degree = degree_table(self.track.key)
+        self.bad_notes = np.count_nonzero(degree[self.pitch % 12] == 0, axis=1)
 
     def _update_emotions(self):
-        self.emotion = np.zeros(self.bar_number * 2, dtype=float)
-        for note in self.track.note:
-            if note.start_time % self.settings.half == 0:
-                order = Note.ord_in_mode(note.pitch, self.track.key)
-                self.emotion[
-                    note.start_time // self.settings.half
-                ] = interval_emotion_dict[order]
-        for i in range(self.bar_number * 2):
-            if self.emotion[i] == 0:
-                self.emotion[i] = 3  # default emotion
-
-    def _pitch_similarity_of_bars(self, bar1: Bar, bar2: Bar):
-        diff1 = np.zeros(self.settings.bar_length // self.settings.note_unit, dtype=int)
-        diff2 = np.zeros(self.settings.bar_length // self.settings.note_unit, dtype=int)
-        bar1_start = bar1[0].start_time
-        bar2_start = bar2[0].start_time
-        for idx in range(len(bar1) - 1):
-            idx1 = (bar1[idx].start_time - bar1_start) // self.settings.note_unit
-            diff1[idx1] = bar1[idx].pitch - bar1[idx + 1].pitch
-        for idx in range(len(bar2) - 1):
-            idx2 = (bar2[idx].start_time - bar2_start) // self.settings.note_unit
-            diff2[idx2] = bar2[idx].pitch - bar2[idx + 1].pitch
-        return np.mean(np.abs(diff1 - diff2))
+        self.emotion = np.zeros((self.size, self.bar_number * 2), dtype=float)
+        start_time = self.track.start_time
+        on_beat = start_time % self.settings.half == 0
+        order = degree_table(self.track.key)[self.pitch[:, on_beat] % 12]
+        self.emotion[:, start_time[on_beat] // self.settings.half] = emotion_table[
+            order
+        ]
+        self.emotion[self.emotion == 0] = 3  # default emotion
 
     def _update_echo(self):
         # Bar 0 and 2; 1 and 3; 4 and 6; 5 and 7 are echo, etc.
         # If they have the similar pitch difference, the echo will be higher
-        self.echo = 0.0
-        for bar in range(0, self.bar_number, 4):
-            self.echo += self._pitch_similarity_of_bars(
-                self.bars[bar], self.bars[bar + 2]
-            )
-            self.echo += self._pitch_similarity_of_bars(
-                self.bars[bar + 1], self.bars[bar + 3]
-            )
+        unit = self.settings.note_unit
+        start_time = self.segments["start_time"]
+        bars = self.segment_bars
+        # the pitch difference to the next note in the bar,
+        # placed by the distance to the first note of the bar
+        bar_start = start_time[np.searchsorted(bars, bars)]
+        idx = (start_time - bar_start) // unit
+        has_next = bars[:-1] == bars[1:]
+        diff = np.zeros(
+            (self.size, self.bar_number, self.settings.bar_length // unit), dtype=int
+        )
+        diff[:, bars[:-1][has_next], idx[:-1][has_next]] = (
+            self.segment_pitch[:, :-1] - self.segment_pitch[:, 1:]
+        )[:, has_next]
+
+        self.echo = echo_of_differences(diff)
 
     def _update_melody_line(self):
+        unit = self.settings.note_unit
         self.melody_line = np.zeros(
-            self.bar_number * self.settings.bar_length // self.settings.note_unit,
+            (self.size, self.bar_number * self.settings.bar_length // unit),
             dtype=float,
         )
-        for note in self.track.note:
-            note_size = note.length // self.settings.note_unit
+        length, start_time = self.track.length, self.track.start_time
+        note_size = length // unit
+        # debugger for those notes that are too short
+        note_size[(length < unit) & (start_time % unit == 0)] = 1
+
+        # fill the melody line with the pitch of the note
+        note_idx = np.repeat(np.arange(len(note_size)), note_size)
+        offset = np.arange(len(note_idx)) - np.repeat(
+            np.cumsum(note_size) - note_size, note_size
+        )
+        idx = np.repeat(start_time // unit, note_size) + offset
+        inside = idx < self.melody_line.shape[1]
+        self.melody_line[:, idx[inside]] = self.pitch[:, note_idx[inside]]
+        # normalize
+        self.melody_line -= np.mean(self.melody_line, axis=1, keepdims=True)
+
+
+class ReferenceSet:
+    """The pitch parameters of several reference tracks, e.g. a style,
+    stacked so that the individuals are compared with all of them at once.
+
+    With `aggregate` MEAN, the individuals are compared with the mean of the
+    references, and the difference in each feature is divided by one plus
+    its standard deviation over the references, so the features the
+    references disagree on weigh less. With NEAREST, they are compared with
+    every reference and scored by the nearest one. A single reference
+    gives the same fitness as comparing with it alone either way.
+
+    The features are the targets (targets x features) for the fitness:
+    `means`, `emotion` and `melody_line`, with the `mean_scale` and the
+    `emotion_scale` dividing the differences. The references are repeated
+    or cut to `bar_number` bars if they have a different length, but they
+    should have the same bars: a `ValueError` is raised for the references
+    of different time signatures."""
+
+    MEAN, NEAREST = "mean", "nearest"
+
+    def __init__(
+        self,
+        params: List[PitchParameter],
+        bar_number: int = None,
+        aggregate: str = MEAN,
+    ):
+        if not params:
+            raise ValueError("No reference for the reference set")
+        if aggregate not in (ReferenceSet.MEAN, ReferenceSet.NEAREST):
+            raise ValueError(f"Unknown aggregate of the references: {aggregate}")
+        sts = params[0].settings
+        for param in params[1:]:
+            if (param.settings.bar_length, param.settings.note_unit) != (
+                sts.bar_length,
+                sts.note_unit,
+            ):
+                raise ValueError(
+                    f"The references have different bars: "
+                    f"{param.settings.numerator}/{param.settings.denominator} "
+                    f"and {sts.numerator}/{sts.denominator}"
+                )
+        if bar_number is None:
+            bar_number = params[0].bar_number
+        self.aggregate = aggregate
+        self.bar_number = bar_number
+        self.bar_length, self.note_unit = sts.bar_length, sts.note_unit
+        self.size = len(params)
+
+        means = self._stack(params, "means", bar_number)
+        emotion = self._stack(params, "emotion", bar_number * 2)
+        lines = self._stack(
+            params, "melody_line", bar_number * sts.bar_length // sts.note_unit
+        )
+        if aggregate == ReferenceSet.MEAN:
+            self.means = np.mean(means, axis=0, keepdims=True)
+            self.emotion = np.mean(emotion, axis=0, keepdims=True)
+            self.melody_line = np.mean(lines, axis=0, keepdims=True)
+            self.mean_scale = 1 + np.std(means, axis=0, keepdims=True)
+            self.emotion_scale = 1 + np.std(emotion, axis=0, keepdims=True)
+        else:
+            self.means, self.emotion, self.melody_line = means, emotion, lines
+            self.mean_scale = np.ones((1, bar_number))
+            self.emotion_scale = np.ones((1, bar_number * 2))
+
+    @staticmethod
+    def from_tracks(
+        tracks: List[Union[Track, Genome]], bar_number: int = None, aggregate=MEAN
+    ) -> "ReferenceSet":
+        """The reference set of the tracks, calculating their parameters."""
+        params = [PitchParameter(track) for track in tracks]
+        return ReferenceSet(params, bar_number, aggregate)
+
+    def _stack(self, params: List[PitchParameter], field: str, size: int):
+        rows = [getattr(param, field)[0] for param in params]
+        stacked = np.zeros((len(rows), size), dtype=float)
+        for row, values in zip(stacked, rows):
+            if len(values) == size:
+                row[:] = values
+            else:
+                row[:] = np.resize(values, size)
+                if field == "melody_line":
+                    row -= np.mean(row)  # normalized again
+        return stacked
+
+
+class BarCache:
+    """The contributions of each bar of an individual to its pitch parameters,
+    saved with the individual and recalculated only for the dirty bars.
+
+    The columns of `values` (bars x columns) are the interval mean, the
+    three-note score, the two emotion slots, the sum and the sum of squares
+    of the melody line, its dot products with the reference lines, and the
+    pitch differences used by echo, after the dot products (see
+    `PitchLayout.echo_column`)."""
+
+    __slots__ = ("values", "dirty")
+
+    MEAN, THREE_NOTES, EMOTION, LINE, DOT = 0, 1, 2, 4, 6
+
+    def __init__(self, values: np.ndarray, dirty: np.ndarray):
+        self.values = values
+        self.dirty = dirty
+
+    def copy(self) -> "BarCache":
+        return BarCache(self.values.copy(), self.dirty.copy())
+
+
+class PitchLayout:
+    """The positions in the rhythm shared by the individuals of the pitch GA,
+    used to evaluate some bars of an individual without the others."""
+
+    def __init__(self, track: Genome, lines: int = 1):
+        self.settings = sts = track.sts
+        # the cached values of echo are after the dot products with the lines
+        self.echo_column = BarCache.DOT + lines
+        self.bar_number = track.bar_number
+        self.unit_number = sts.bar_length // sts.note_unit
+        start_time, length = track.start_time, track.length
+        segments, self.segment_index, self.segment_bars = split_bars(
+            track.notes, sts.bar_length
+        )
+        self.bar_offsets = np.searchsorted(
+            self.segment_bars, np.arange(self.bar_number + 1)
+        )
+
+        # the place of the pitch difference of each note for echo,
+        # by the distance to the first note of the bar
+        segment_start = segments["start_time"]
+        bar_start = segment_start[self.bar_offsets[self.segment_bars]]
+        self.echo_idx = (segment_start - bar_start) // sts.note_unit
+
+        # the note deciding each emotion slot and each melody line cell,
+        # the later notes cover the earlier ones
+        self.slot_note = np.full(self.bar_number * 2, -1)
+        on_beat = np.flatnonzero(start_time % sts.half == 0)
+        self.slot_note[start_time[on_beat] // sts.half] = on_beat
+        self.cell_note = np.full(self.bar_number * self.unit_number, -1)
+        note_size = length // sts.note_unit
+        note_size[(length < sts.note_unit) & (start_time % sts.note_unit == 0)] = 1
+        note_idx = np.repeat(np.arange(len(track)), note_size)
+        offset = np.arange(len(note_idx)) - np.repeat(
+            np.cumsum(note_size) - note_size, note_size
+        )
+        cells = np.repeat(start_time // sts.note_unit, note_size) + offset
+        inside = cells < len(self.cell_note)
+        self.cell_note[cells[inside]] = note_idx[inside]
+
+        # changing a note affects the bars it lies in,
+        # and the bar of the next part by the interval between them
+        position = np.arange(len(self.segment_index))
+        first, last = np.full(len(track), len(position)), np.zeros(len(track), int)
+        np.minimum.at(first, self.segment_index, position)
+        np.maximum.at(last, self.segment_index, position)
+        self.dirty_from = self.segment_bars[first]
+        self.dirty_to = self.segment_bars[np.minimum(last + 1, len(position) - 1)]
+
+    def mark_dirty(self, track: Genome, notes: np.ndarray):
+        """Mark the bars affected by changing the pitch of the given notes."""
+        if track.cache is None:
+            return
+        for idx in np.atleast_1d(notes):
+            track.cache.dirty[self.dirty_from[idx] : self.dirty_to[idx] + 1] = True
+
+    def update(self, population: List[Genome], ref_lines: np.ndarray) -> np.ndarray:
+        """Recalculate the dirty bars of the individuals, with `ref_lines`
+        the normalized melody lines of the references (`lines` x cells).
+        Return the cached values of all of them (individuals x bars x columns)."""
+        columns = self.echo_column + self.unit_number
+        for track in population:
+            if track.cache is None:
+                track.cache = BarCache(
+                    np.zeros((self.bar_number, columns), dtype=float),
+                    np.ones(self.bar_number, dtype=bool),
+                )
+        values = np.stack([track.cache.values for track in population])
+        dirty = np.stack([track.cache.dirty for track in population])
+        ind, bar = np.nonzero(dirty)
+        if len(ind) == 0:
+            return values
+
+        pitch = np.stack([track.pitch for track in population]).astype(int)
+        values[ind, bar] = self._bar_values(pitch[ind], bar, ref_lines)
+        for idx in np.unique(ind):
+            population[idx].cache.values = values[idx].copy()
+            population[idx].cache.dirty[:] = False
+        return values
+
+    def _bar_values(
+        self, pitch: np.ndarray, bar: np.ndarray, ref_lines: np.ndarray
+    ) -> np.ndarray:
+        """The cached values of the given bars (items), each of them with
+        the pitches of its individual (items x notes)."""
+        items = len(bar)
+        result = np.zeros((items, self.echo_column + self.unit_number), dtype=float)
+
+        # the parts of the notes in the bars, flattened
+        begin, end = self.bar_offsets[bar], self.bar_offsets[bar + 1]
+        size = end - begin
+        item = np.repeat(np.arange(items), size)
+        segment = np.repeat(begin, size) + (
+            np.arange(len(item)) - np.repeat(np.cumsum(size) - size, size)
+        )
+        last = len(self.segment_index) - 1
+
+        def pitch_at(offset):
+            idx = np.clip(segment + offset, 0, last)
+            return pitch[item, self.segment_index[idx]]
+
+        current, previous = pitch_at(0), pitch_at(-1)
+        next1, next2 = pitch_at(1), pitch_at(2)
+
+        # interval parameters
+        has_previous = segment > 0
+        intervals = np.abs(current - previous) / 3 * has_previous
+        total = np.bincount(item, intervals, minlength=items)
+        count = np.bincount(item, has_previous, minlength=items)
+        np.divide(total, count, out=result[:, BarCache.MEAN], where=count > 0)
+
+        # three notes
+        diff1, diff2 = next1 - current, next2 - next1
+        good = (np.abs(diff1) <= 5) & (np.abs(diff2) <= 5) & (diff1 * diff2 >= 0)
+        score = good.astype(int) - 3 * (diff1 * diff2 < -25)
+        in_bar = segment + 2 < np.repeat(end, size)
+        weight = np.zeros(items, dtype=float)
+        np.divide(1, size - 2, out=weight, where=size > 2)
+        result[:, BarCache.THREE_NOTES] = np.bincount(
+            item, score * in_bar * weight[item], minlength=items
+        )
+
+        # emotion
+        slot = self.slot_note[bar[:, None] * 2 + np.arange(2)]
+        order = degree_table(self.settings.key)[
+            pitch[np.arange(items)[:, None], slot] % 12
+        ]
+        emotion = np.where(slot >= 0, emotion_table[order], 0)
+        emotion[emotion == 0] = 3  # default emotion
+        result[:, BarCache.EMOTION : BarCache.EMOTION + 2] = emotion
 
-            # debugger for those notes that are too short
-            if note.length < self.settings.note_unit:
-                if note.start_time % self.settings.note_unit == 0:
-                    note_size = 1
-                else:
-                    continue
+        # melody line
+        cells = bar[:, None] * self.unit_number + np.arange(self.unit_number)
+        cell = self.cell_note[cells]
+        line = np.where(cell >= 0, pitch[np.arange(items)[:, None], cell], 0)
+        result[:, BarCache.LINE] = np.sum(line, axis=1)
+        result[:, BarCache.LINE + 1] = np.sum(line**2, axis=1)
+        result[:, BarCache.DOT : self.echo_column] = np.sum(
+            line * ref_lines[:, cells], axis=2
+        ).T
 
-            start_idx = note.start_time // self.settings.note_unit
-            # fill the melody line with the pitch of the note
-            self.melody_line[start_idx : start_idx + note_size] = note.pitch
-        self.melody_line -= np.mean(self.melody_line)  # normalize
+        # the pitch difference to the next note in the bar for echo
+        has_next = segment + 1 < np.repeat(end, size)
+        echo = result[:, self.echo_column :]
+        echo[item[has_next], self.echo_idx[segment[has_next]]] = (current - next1)[
+            has_next
+        ]
+        return result
 
 
 class GAForPitch(TrackGABase):
+    name = "pitch"
+
     def __init__(
         self,
         reference_track: Track,
-        population: List[Track],
+        population: List[Genome],
         mutation_rate: float,
+        incremental: bool = None,
+        cache_size: int = fitness_cache_size,
+        ref_param: Union[PitchParameter, ReferenceSet] = None,
+        rng: Rng_T = None,
     ):
-        super().__init__(population, mutation_rate)
-        self.ref_param = PitchParameter(reference_track)
+        super().__init__(population, mutation_rate, cache_size, rng)
+        if ref_param is None:
+            ref_param = PitchParameter(reference_track)
+        self.ref_param = ref_param
+        # the individuals are compared with all the references at once
+        if isinstance(ref_param, ReferenceSet):
+            self.references = ref_param
+        else:
+            self.references = ReferenceSet([ref_param], self.bar_number)
+        if self.references.bar_number != self.bar_number:
+            raise ValueError(
+                f"The references have {self.references.bar_number} bars, "
+                f"but the individuals have {self.bar_number}"
+            )
+        if (self.references.bar_length, self.references.note_unit) != (
+            self.settings.bar_length,
+            self.settings.note_unit,
+        ):
+            raise ValueError(
+                f"The references have bars of {self.references.bar_length} ticks, "
+                f"but the individuals have {self.settings.bar_length}"
+            )
+        # Only the bars changed by the mutation are evaluated again
+        if incremental is None:
+            incremental = self.bar_number >= incremental_bar_number
+        self.incremental = incremental
+        self.layout = PitchLayout(population[0], len(self.references.melody_line))
         self.mean_coeff = np.ones(self.bar_number, dtype=float)
         self.emotion_coeff = np.zeros(self.bar_number * 2, dtype=float)
+        # the best track kept by `run` and its fitness
+        self.best_track: Genome = None
+        self.best_fitness = 0
         self._update_coeff()
         self.update_fitness()
 
@@ -177,22 +508,73 @@ class GAForPitch(TrackGABase):
                 self.emotion_coeff[idx] = 0.5
         self.mean_coeff[0] = self.mean_coeff[-1] = 2
 
-    def get_fitness(self, track: Track) -> float:
-        param = PitchParameter(track)
-        mean_diff = np.abs(param.means - self.ref_param.means)
-        f1 = p1 * np.exp(-(np.sum(mean_diff) / self.bar_number))
-        f2 = p2 * param.three_notes / self.bar_number
-        emotion_diff = np.abs(param.emotion - self.ref_param.emotion)
+    def get_fitness(self, track: Genome) -> float:
+        return self.get_population_fitness([track])[0]
+
+    def get_population_fitness(self, population: List[Genome]) -> np.ndarray:
+        if self.incremental:
+            means, three_notes, emotion, echo, correlation = self._cached_parameters(
+                population
+            )
+        else:
+            # All the individuals share the same rhythm, only the pitches differ
+            pitch = np.stack([track.pitch for track in population])
+            param = PitchParameter(population[0], pitch)
+            means, three_notes = param.means, param.three_notes
+            emotion, echo = param.emotion, param.echo
+            correlation = self._correlation(
+                param.melody_line, self.references.melody_line
+            )
+
+        # compared with each target of the references (individuals x targets)
+        refs = self.references
+        mean_diff = np.abs(means[:, None] - refs.means) / refs.mean_scale
+        f1 = p1 * np.exp(-(np.sum(mean_diff, axis=2) / self.bar_number))
+        f2 = p2 * three_notes[:, None] / self.bar_number
+        emotion_diff = np.abs(emotion[:, None] - refs.emotion) / refs.emotion_scale
         f3 = p3 * np.exp(
-            -(np.dot(self.emotion_coeff, emotion_diff) / (self.bar_number * 2))
+            -(np.sum(emotion_diff * self.emotion_coeff, axis=2) / (self.bar_number * 2))
         )
-        f4 = p4 * self.bar_number / (param.echo + 1)
-        f5 = p5 * np.corrcoef(param.melody_line, self.ref_param.melody_line)[0, 1]
+        f4 = p4 * self.bar_number / (echo[:, None] + 1)
+        f5 = p5 * correlation
 
         if DEBUG and random() < 0.01:
-            print(f"{f1} \t {f2} \t {f3} \t {f4} \t {f5}")
+            i = int(random() * len(population))
+            print(f"{f1[i]} \t {f2[i]} \t {f3[i]} \t {f4[i]} \t {f5[i]}")
 
-        return f1 + f2 + f3 + f4 + f5
+        # scored by the nearest target
+        return np.max(f1 + f2 + f3 + f4 + f5, axis=1)
+
+    def _cached_parameters(self, population: List[Genome]):
+        """The parameters from the cached values of the bars,
+        where only the dirty bars are evaluated again."""
+        ref_lines = self.references.melody_line
+        values = self.layout.update(population, ref_lines)
+        size = len(population)
+        means = values[:, :, BarCache.MEAN]
+        three_notes = np.sum(values[:, :, BarCache.THREE_NOTES], axis=1)
+        emotion = values[:, :, BarCache.EMOTION : BarCache.EMOTION + 2].reshape(
+            size, -1
+        )
+        echo = echo_of_differences(values[:, :, self.layout.echo_column :])
+
+        # the correlation of the normalized melody line with the references
+        line = np.sum(values[:, :, BarCache.LINE : self.layout.echo_column], axis=1)
+        line_sum, line_square, line_dot = line[:, 0], line[:, 1], line[:, 2:]
+        variance = line_square - line_sum**2 / ref_lines.shape[1]
+        correlation = line_dot / np.sqrt(
+            variance[:, None] * np.sum(ref_lines**2, axis=1)
+        )
+        return means, three_notes, emotion, echo, correlation
+
+    @staticmethod
+    def _correlation(lines: np.ndarray, ref_lines: np.ndarray) -> np.ndarray:
+        """The correlation coefficient of each normalized line with each
+        of the reference lines (lines x references)."""
+        lines = lines - np.mean(lines, axis=1, keepdims=True)
+        ref_lines = ref_lines - np.mean(ref_lines, axis=1, keepdims=True)
+        norm = np.sqrt(np.sum(lines**2, axis=1)[:, None] * np.sum(ref_lines**2, axis=1))
+        return np.sum(lines[:, None] * ref_lines, axis=2) / norm
 
     def crossover(self):
         # No crossover for pitch
@@ -200,12 +582,13 @@ class GAForPitch(TrackGABase):
 
     def mutate(self):
         for i in range(len(self.population)):
-            if random() > self.mutation_rate:
+            if self.rng.random() > self.mutation_rate:
                 continue
             # TODO: mutation
-            track = deepcopy(
-                self.population[choice([self.best_index, self.second_index])]
-            )
+            with self.phase("copy"):
+                track = self.population[
+                    self.rng.choice([self.best_index, self.second_index])
+                ].clone()
             mutate_type = choice_with_weight(
                 [self._mutate_1, self._mutate_2, self._mutate_3, self._mutate_4],
                 [
@@ -214,59 +597,89 @@ class GAForPitch(TrackGABase):
                     mutation_rate_3,
                     mutation_rate_4,
                 ],
+                self.rng,
             )
-            mutate_type(track)
+            self.apply_mutation(mutate_type, track)
             self.population[i] = track
 
-    def _mutate_1(self, track: Track):
+    def _mutate_1(self, track: Genome):
         # If the interval between two notes is too large, change it
-        for idx in range(len(track.note) - 1):
-            if track.note[idx + 1].pitch - track.note[idx].pitch > 12:
-                track.note[idx].pitch += 12
-            elif track.note[idx + 1].pitch - track.note[idx].pitch < -12:
-                track.note[idx].pitch -= 12
+        pitch = track.pitch
+        diff = pitch[1:] - pitch[:-1]
+        change = 12 * (diff > 12) - 12 * (diff < -12)
+        changed = np.flatnonzero(change)
+        if len(changed):
+            track.detach().pitch[:-1] += change
+            self.layout.mark_dirty(track, changed)
 
-    def _mutate_2(self, track: Track):
+    def _mutate_2(self, track: Genome):
         # Change the pitch of a random note
-        idx = randint(0, len(track.note) - 2)
-        track.note[idx].pitch = Note.random_pitch_in_mode(track.key)
+        idx = self.rng.randint(0, len(track) - 2)
+        track.detach().pitch[idx] = Note.random_pitch_in_mode(track.key, rng=self.rng)
+        self.layout.mark_dirty(track, idx)
 
-    def _mutate_3(self, track: Track):
+    def _mutate_3(self, track: Genome):
         # Swap two notes' pitch
-        idx = randint(1, len(track.note) - 2)
-        track.note[idx], track.note[idx - 1] = track.note[idx - 1], track.note[idx]
+        idx = self.rng.randint(1, len(track) - 2)
+        pitch = track.detach().pitch
+        pitch[idx], pitch[idx - 1] = pitch[idx - 1], pitch[idx]
+        self.layout.mark_dirty(track, [idx - 1, idx])
 
-    def _mutate_4(self, track: Track):
+    def _mutate_4(self, track: Genome):
         # if a short note has a big interval with the next note, change it
-        for idx, note in enumerate(track.note[:-1]):
-            if note.length <= self.settings.eighth:
-                next_pitch = track.note[idx + 1].pitch
-                if abs(note.pitch - next_pitch) > 7:
-                    note.pitch = Note.random_pitch_in_mode(
-                        track.key, next_pitch - 7, next_pitch + 7
-                    )
-                    return
-
-    def run(self, generation: int):
-        best_track = deepcopy(self.population[self.best_index])
-        best_fitness = 0
+        pitch = track.pitch
+        short = track.length[:-1] <= self.settings.eighth
+        big = np.abs(pitch[:-1].astype(int) - pitch[1:]) > 7
+        candidates = np.flatnonzero(short & big)
+        if len(candidates):
+            idx = candidates[0]
+            next_pitch = int(pitch[idx + 1])
+            track.detach().pitch[idx] = Note.random_pitch_in_mode(
+                track.key, next_pitch - 7, next_pitch + 7, self.rng
+            )
+            self.layout.mark_dirty(track, idx)
+
+    def get_state(self) -> dict:
+        state = super().get_state()
+        state["best_track"] = self.best_track
+        state["best_fitness"] = self.best_fitness
+        return state
+
+    def run(
+        self,
+        generation: int,
+        stopping: EarlyStopping = None,
+        checkpoint: Checkpoint = None,
+    ):
+        if self.best_track is None:
+            self.best_track = self.population[self.best_index].clone()
 
         print("--------- Start Pitch Training ---------")
-        succeed = False
-        for i in range(generation):
+        if stopping is not None:
+            stopping.start(self.evaluations)
+        # continue from the generation of a resumed state
+        for i in range(self.generation, generation):
             if i % 30 == 0:
                 print(f"Pitch generation {i}: " + self.train_info())
             self.epoch()
             if self.fitness[self.best_index] > pitch_target:
                 print(f"[!] Target reached at generation {i}")
-                succeed = True
+                self.stop_reason = EarlyStopping.TARGET
+                break
+            elif self.fitness[self.best_index] > self.best_fitness:
+                self.best_fitness = self.fitness[self.best_index]
+                self.best_track = self.population[self.best_index].clone()
+            self.stop_reason = self.check_stop(stopping)
+            if self.stop_reason is not None:
+                print(f"[!] Stopped by {self.stop_reason} at generation {i}")
                 break
-            elif self.fitness[self.best_index] > best_fitness:
-                best_fitness = self.fitness[self.best_index]
-                best_track = deepcopy(self.population[self.best_index])
-        if not succeed:
+            if checkpoint is not None and checkpoint.due(self):
+                checkpoint.save(self)
+        else:
             print(f"[!] Target not reached after {generation} generations")
+            self.stop_reason = EarlyStopping.GENERATIONS
 
-        print(f"Final fitness for pitch: {best_fitness}")
+        self.final_fitness = self.best_fitness
+        print(f"Final fitness for pitch: {self.best_fitness}")
         print("--------- Finish Pitch Training ---------")
-        return best_track
+        return self.best_track
@@ -0,0 +1,116 @@
+import sys
+import json
+from time import perf_counter
+from contextlib import contextmanager
+from typing import Dict, TextIO
+
+
+class PhaseStats:
+    """The calls, the wall time in seconds and the allocated memory blocks
+    (the change of `sys.getallocatedblocks`) of a phase."""
+
+    __slots__ = ("calls", "time", "blocks")
+
+    def __init__(self):
+        self.calls = 0
+        self.time = 0.0
+        self.blocks = 0
+
+    def add(self, other: "PhaseStats"):
+        self.calls += other.calls
+        self.time += other.time
+        self.blocks += other.blocks
+
+    def to_dict(self) -> dict:
+        return {"calls": self.calls, "time": self.time, "blocks": self.blocks}
+
+
+class ProfileStats:
+    """The stats of the phases, e.g. `mutate` and `mutate_1`,
+    and the counters, e.g. `evaluations`, of some epochs."""
+
+    def __init__(self):
+        self.epochs = 0
+        self.phases: Dict[str, PhaseStats] = {}
+        self.counters: Dict[str, int] = {}
+
+    def add(self, other: "ProfileStats"):
+        self.epochs += other.epochs
+        for name, phase in other.phases.items():
+            self.phases.setdefault(name, PhaseStats()).add(phase)
+        for name, value in other.counters.items():
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_dict(self) -> dict:
+        return {
+            "epochs": self.epochs,
+            "phases": {name: phase.to_dict() for name, phase in self.phases.items()},
+            "counters": dict(self.counters),
+        }
+
+    def report(self) -> str:
+        """A table of the phases by their time, and the counters."""
+        lines = [f"{'phase':<16}{'calls':>10}{'time (s)':>12}{'blocks':>10}"]
+        for name, phase in sorted(
+            self.phases.items(), key=lambda item: -item[1].time
+        ):
+            lines.append(
+                f"{name:<16}{phase.calls:>10}{phase.time:>12.4f}{phase.blocks:>10}"
+            )
+        for name, value in self.counters.items():
+            lines.append(f"{name:<16}{value:>10}")
+        return "\n".join(lines)
+
+
+class EpochProfiler:
+    """Record the stats of each phase of the epochs of a GA.
+
+    The stats of the current epoch are added to `total` at the end of
+    the epoch, and written as a json line to `stream` if given,
+    a file name or an opened text file, with the `label` of the GA."""
+
+    def __init__(self, stream=None, label: str = None):
+        self.label = label
+        self.total = ProfileStats()
+        self.current = ProfileStats()
+        self.owned = isinstance(stream, str)
+        self.stream: TextIO = open(stream, "a") if self.owned else stream
+
+    @contextmanager
+    def phase(self, name: str):
+        stats = self.current.phases.get(name)
+        if stats is None:
+            stats = self.current.phases[name] = PhaseStats()
+        blocks = sys.getallocatedblocks()
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            stats.time += perf_counter() - start
+            stats.blocks += sys.getallocatedblocks() - blocks
+            stats.calls += 1
+
+    def count(self, name: str, value: int = 1):
+        self.current.counters[name] = self.current.counters.get(name, 0) + value
+
+    def end_epoch(self, generation: int, best_fitness: float):
+        self.current.epochs = 1
+        if self.stream is not None:
+            record = {
+                "ga": self.label,
+                "generation": generation,
+                "best_fitness": float(best_fitness),
+            }
+            record.update(self.current.to_dict())
+            del record["epochs"]
+            self.stream.write(json.dumps(record) + "\n")
+        self.total.add(self.current)
+        self.current = ProfileStats()
+
+    def close(self):
+        if self.stream is not None:
+            if self.owned:
+                self.stream.close()
+            else:
+                self.stream.flush()
+            self.stream = None
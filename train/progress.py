@@ -0,0 +1,78 @@
+from time import perf_counter
+from typing import Callable
+
+
+class TrainingCancelled(Exception):
+    """Raised in the training when it is cancelled from outside."""
+
+
+class ProgressInfo:
+    """The progress of a GA: its phase, the generation, the best fitness
+    and the evaluations per second since the last report."""
+
+    __slots__ = ("phase", "generation", "best_fitness", "evaluation_rate")
+
+    def __init__(
+        self, phase: str, generation: int, best_fitness: float, evaluation_rate: float
+    ):
+        self.phase = phase
+        self.generation = generation
+        self.best_fitness = best_fitness
+        self.evaluation_rate = evaluation_rate
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __str__(self):
+        return (
+            f"{self.phase} generation {self.generation}: "
+            f"best fitness {self.best_fitness:.4f}, "
+            f"{self.evaluation_rate:.0f} evaluations/s"
+        )
+
+
+class Progress:
+    """Report the progress of the GAs to `callback` after the epochs,
+    at most once every `interval` seconds, and at the start of each phase.
+
+    If `cancelled` is given, a function telling whether the training is
+    cancelled (e.g. `Event.is_set`), the training is stopped at the end
+    of the epoch by `TrainingCancelled`."""
+
+    def __init__(
+        self,
+        callback: Callable[[ProgressInfo], None] = None,
+        interval: float = 0.5,
+        cancelled: Callable[[], bool] = None,
+    ):
+        self.callback = callback
+        self.interval = interval
+        self.cancelled = cancelled
+        self.phase = None
+        self.last_time = 0.0
+        self.last_evaluations = 0
+
+    def update(self, ga):
+        """Called by the GA after each epoch."""
+        if self.cancelled is not None and self.cancelled():
+            raise TrainingCancelled(
+                f"cancelled at {ga.name} generation {ga.generation}"
+            )
+        if self.callback is None:
+            return
+
+        now = perf_counter()
+        if ga.name != self.phase:
+            # a new phase, report it at once
+            self.phase = ga.name
+            self.last_time, self.last_evaluations = now, ga.evaluations
+        elif now - self.last_time < self.interval:
+            return
+        elapsed = now - self.last_time
+        rate = (ga.evaluations - self.last_evaluations) / elapsed if elapsed else 0.0
+        self.last_time, self.last_evaluations = now, ga.evaluations
+        self.callback(
+            ProgressInfo(
+                ga.name, ga.generation, float(ga.fitness[ga.best_index]), rate
+            )
+        )
@@ -0,0 +1,159 @@
+import os
+import copy
+import json
+import struct
+import zipfile
+import numpy as np
+from typing import Dict, List, Tuple
+from midoWrapper import *
+from .pitch import PitchParameter, ReferenceSet
+
+# Change it when the format or the parameters change, to ignore the old files
+CACHE_VERSION = 1
+
+# The parameters of the reference track used by the pitch GA
+_pitch_fields = ("means", "emotion", "melody_line", "bad_notes", "three_notes", "echo")
+
+
+def save_reference(filename: str, midi: Midi, ref_param: PitchParameter):
+    """Save the parsed midi and the pitch parameters of its first track
+    in an uncompressed npz file, which can be memory-mapped when loaded."""
+    lengths = [len(track.note) for track in midi.tracks]
+    notes = np.concatenate(
+        [Genome.from_track(track).notes for track in midi.tracks]
+        or [np.zeros(0, dtype=NOTE_DTYPE)]
+    )
+    arrays = {
+        "version": np.array(CACHE_VERSION),
+        "settings": np.array(json.dumps(vars(midi.sts))),
+        "notes": notes,
+        "track_offsets": np.cumsum([0] + lengths),
+        "instruments": np.array([track.instrument for track in midi.tracks], dtype=int),
+    }
+    for field in _pitch_fields:
+        arrays[f"pitch_{field}"] = getattr(ref_param, field)
+
+    # write to a temporary file first, so that the readers never see half of it
+    folder = os.path.dirname(filename)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    temp = f"{filename}.{os.getpid()}.tmp"
+    with open(temp, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(temp, filename)
+
+
+def load_arrays(filename: str, mmap: bool = True) -> Dict[str, np.ndarray]:
+    """Load the arrays in an npz file, memory-mapping those not compressed."""
+    if not mmap:
+        with np.load(filename) as data:
+            return {name: data[name] for name in data.files}
+
+    arrays = {}
+    with zipfile.ZipFile(filename) as archive, open(filename, "rb") as f:
+        for info in archive.infolist():
+            name = info.filename[: -len(".npy")]
+            # skip the local file header to the npy data
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = struct.unpack("<HH", f.read(4))
+            f.seek(name_length + extra_length, os.SEEK_CUR)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                header = np.lib.format.read_array_header_1_0(f)
+            else:
+                header = np.lib.format.read_array_header_2_0(f)
+            shape, fortran_order, dtype = header
+
+            if info.compress_type != zipfile.ZIP_STORED or not shape or 0 in shape:
+                # not worth (or not able) to be mapped
+                with archive.open(info) as member:
+                    arrays[name] = np.lib.format.read_array(member)
+            else:
+                arrays[name] = np.memmap(
+                    filename,
+                    dtype=dtype,
+                    mode="r",
+                    offset=f.tell(),
+                    shape=shape,
+                    order="F" if fortran_order else "C",
+                )
+    return arrays
+
+
+def load_reference_file(
+    filename: str, mmap: bool = True
+) -> Tuple[Midi, PitchParameter]:
+    """Load the midi and the pitch parameters saved by `save_reference`.
+    The parameters are restored without calculating them again."""
+    arrays = load_arrays(filename, mmap)
+    if int(arrays["version"]) != CACHE_VERSION:
+        raise ValueError(f"Unknown version of the reference cache: {filename}")
+
+    settings = MusicSettings()
+    settings.__dict__.update(json.loads(str(arrays["settings"])))
+    midi = Midi(settings)
+    offsets = arrays["track_offsets"]
+    for idx, instrument in enumerate(arrays["instruments"].tolist()):
+        notes = np.array(arrays["notes"][offsets[idx] : offsets[idx + 1]])
+        midi.tracks.append(Genome(notes, settings, instrument).to_track())
+
+    ref_param = PitchParameter.restore(
+        midi.tracks[0],
+        {field: arrays[f"pitch_{field}"] for field in _pitch_fields},
+    )
+    return midi, ref_param
+
+
+def load_reference(
+    filename: str, cache_folder: str = None
+) -> Tuple[Midi, PitchParameter]:
+    """Parse the reference midi file and calculate the pitch parameters of
+    its first track (the melody).
+
+    With a `cache_folder`, the results are saved there by the hash of the
+    content of the file, and loaded from there the next time, skipping
+    both the parsing and the calculation."""
+    if cache_folder is None:
+        midi = Midi.from_midi(filename)
+        return midi, PitchParameter(midi.tracks[0])
+
+    cache_file = os.path.join(cache_folder, f"{content_hash(filename)}.npz")
+    try:
+        return load_reference_file(cache_file)
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        # missing, broken or outdated
+        pass
+    midi = Midi.from_midi(filename)
+    ref_param = PitchParameter(midi.tracks[0])
+    save_reference(cache_file, midi, ref_param)
+    return midi, ref_param
+
+
+def repeat_reference(filename: str, bars: int) -> Track:
+    """The melody (the first track) of the midi file, repeated or cut
+    to the given bars, e.g. for the references of any length."""
+    melody = Midi.from_midi(filename).tracks[0]
+    settings = copy.copy(melody.sts)
+    settings.bar_number = bars
+    track = Track(settings, melody.instrument)
+    length = melody.bar_number * settings.bar_length
+    track.note = [
+        Note(note.pitch, note.length, note.start_time + repeat * length, note.velocity)
+        for repeat in range(-(-bars // melody.bar_number))
+        for note in melody.note
+        if note.start_time + repeat * length < bars * settings.bar_length
+    ]
+    return track
+
+
+def load_reference_set(
+    filenames: List[str],
+    bar_number: int = None,
+    aggregate: str = ReferenceSet.MEAN,
+    cache_folder: str = None,
+) -> ReferenceSet:
+    """The reference set of the first tracks (the melodies) of the midi files,
+    e.g. of a style, with their parameters loaded like `load_reference`.
+    See `ReferenceSet` for `bar_number` and `aggregate`."""
+    params = [load_reference(filename, cache_folder)[1] for filename in filenames]
+    return ReferenceSet(params, bar_number, aggregate)
@@ -1,6 +1,5 @@
-from random import choice, randint, random
+from random import random
 from .base import *
-from copy import deepcopy
 
 
 DEBUG = False
@@ -23,7 +22,7 @@ mutation_rate_4 = 1  # Copy a bar and paste it to another bar
 
 
 class RhythmParameter(TrackParameterBase):
-    def __init__(self, track: Track) -> None:
+    def __init__(self, track: Union[Track, Genome]) -> None:
         super().__init__(track)
         self.strong_beats = 0
         self.echo = 0.0
@@ -39,73 +38,191 @@ class RhythmParameter(TrackParameterBase):
         self._update_neighboring_notes()
 
     def _update_beats(self):
-        self.strong_beats = 0
-        self.strong_notes_on_weak_beats = 0.0
-        for bar in self.bars:
-            bad_beats = 0
-            for note in bar:
-                if note.start_time % self.settings.half == 0:
-                    self.strong_beats += 1
-                # elif note.start_time % QUARTER == 0:
-                # self.weak_beats += 1
-                elif note.start_time % note.length != 0:
-                    bad_beats += 1
-            self.strong_notes_on_weak_beats += bad_beats / len(bar)
+        start_time = self.segments["start_time"]
+        length = self.segments["length"]
+        strong = start_time % self.settings.half == 0
+        self.strong_beats = int(np.count_nonzero(strong))
+        # elif note.start_time % QUARTER == 0:
+        # self.weak_beats += 1
+        bad = ~strong & (start_time % length != 0)
+        bad_beats = np.bincount(self.segment_bars, bad, minlength=self.bar_number)
+        count = np.bincount(self.segment_bars, minlength=self.bar_number)
+        valid = count > 0
+        self.strong_notes_on_weak_beats = float(
+            sequential_sum(bad_beats[valid] / count[valid])
+        )
 
     def _update_echo(self):
         # Bar 0 and 2; 1 and 3; 4 and 6; 5 and 7 are echo, etc.
         # If they have the similar rhythm, the echo will be higher
-        for bar in range(0, self.bar_number, 4):
-            self.echo += self._rhythm_similarity_of_bars(
-                self.bars[bar], self.bars[bar + 2]
-            )
-            self.echo += self._rhythm_similarity_of_bars(
-                self.bars[bar + 1], self.bars[bar + 3]
-            )
+        bars = np.split(
+            self.segments["start_time"] % self.settings.bar_length,
+            np.searchsorted(self.segment_bars, np.arange(1, self.bar_number)),
+        )
+        for bar in range(0, self.bar_number - 3, 4):
+            self.echo += self._rhythm_similarity_of_bars(bars[bar], bars[bar + 2])
+            self.echo += self._rhythm_similarity_of_bars(bars[bar + 1], bars[bar + 3])
         self.echo /= self.bar_number
 
     def _update_long_notes(self):
         # Too many long notes are not welcomed
-        self.long_notes = 0
-        for bar in self.bars:
-            for note in bar:
-                if note.length == self.settings.half:
-                    self.long_notes += 0.5
-                elif note.length >= self.settings.quarter:
-                    self.long_notes += 0.1
+        length = self.segments["length"]
+        half = length == self.settings.half
+        quarter = ~half & (length >= self.settings.quarter)
+        self.long_notes = float(sequential_sum(0.5 * half + 0.1 * quarter))
 
     def _update_neighboring_notes(self):
         # We don't want a quarter note followed by an eighth note, vice versa
-        self.neighboring_notes = 0.0
-        notes = self.track.note
-        for idx in range(len(notes) - 1):
-            if (
-                abs(notes[idx].length - notes[idx + 1].length)
-                == self.settings.half - self.settings.eighth
-            ):
-                self.neighboring_notes += 1
-
-    def _rhythm_similarity_of_bars(self, bar1: Bar, bar2: Bar):
-        """Calculate the similarity of the rhythm of two bars."""
-        same = 0
-        for note1 in bar1:
-            for note2 in bar2:
-                if (
-                    note1.start_time - note2.start_time
-                ) % self.settings.bar_length == 0:
-                    same += 1
+        diff = np.abs(np.diff(self.track.length))
+        self.neighboring_notes = float(
+            np.count_nonzero(diff == self.settings.half - self.settings.eighth)
+        )
+
+    @staticmethod
+    def _rhythm_similarity_of_bars(bar1: np.ndarray, bar2: np.ndarray):
+        """Calculate the similarity of the rhythm of two bars,
+        given the start time of the notes in the bars."""
+        same = np.count_nonzero(bar1[:, None] == bar2[None, :])
         return (same**2) / (len(bar1) * len(bar2))
 
 
+class PopulationRhythmParameter:
+    """Rhythm parameters of a whole population, calculated at once.
+
+    Every parameter is an array over the individuals. The echo is based on
+    the onset grid (individuals x bars x time units), which counts the notes
+    starting at each time unit, so that chords are counted like notes."""
+
+    def __init__(self, population: List[Genome]) -> None:
+        self.settings = population[0].sts
+        self.size = len(population)
+        self.bar_number = np.array([track.bar_number for track in population])
+        self.max_bar_number = int(self.bar_number.max())
+
+        self.notes = np.concatenate([track.notes for track in population])
+        self.owner = np.repeat(
+            np.arange(self.size), [len(track) for track in population]
+        )
+        self.segments, index, self.segment_bars = split_bars(
+            self.notes, self.settings.bar_length, self.owner
+        )
+        self.segment_owner = self.owner[index]
+        # the notes in each bar of each individual
+        self.segment_keys = self.segment_owner * self.max_bar_number + self.segment_bars
+        self.bar_count = self._sum_by_bar(np.ones(len(self.segments)))
+
+        self.strong_beats = np.zeros(self.size, dtype=int)
+        self.echo = np.zeros(self.size, dtype=float)
+        self.long_notes = np.zeros(self.size, dtype=float)
+        self.neighboring_notes = np.zeros(self.size, dtype=float)
+        self.strong_notes_on_weak_beats = np.zeros(self.size, dtype=float)
+        self.update_parameters()
+
+    def update_parameters(self):
+        self._update_beats()
+        self._update_echo()
+        self._update_long_notes()
+        self._update_neighboring_notes()
+
+    def _sum_by_bar(self, weights: np.ndarray) -> np.ndarray:
+        """Sum the weights of the notes in each bar (individuals x bars)."""
+        total = np.bincount(
+            self.segment_keys, weights, minlength=self.size * self.max_bar_number
+        )
+        return total.reshape(self.size, self.max_bar_number)
+
+    def _by_owner(self, values: np.ndarray) -> np.ndarray:
+        """Place the values of the notes in each individual in a row,
+        padded with zeros (individuals x notes)."""
+        count = np.bincount(self.segment_owner, minlength=self.size)
+        position = np.arange(len(values)) - np.repeat(np.cumsum(count) - count, count)
+        matrix = np.zeros((self.size, count.max()), dtype=values.dtype)
+        matrix[self.segment_owner, position] = values
+        return matrix
+
+    def _update_beats(self):
+        start_time = self.segments["start_time"]
+        length = self.segments["length"]
+        strong = start_time % self.settings.half == 0
+        self.strong_beats = np.bincount(
+            self.segment_owner, strong, minlength=self.size
+        ).astype(int)
+        bad = ~strong & (start_time % length != 0)
+        bad_beats = self._sum_by_bar(bad)
+        ratio = np.zeros_like(bad_beats)
+        np.divide(bad_beats, self.bar_count, out=ratio, where=self.bar_count > 0)
+        self.strong_notes_on_weak_beats = sequential_sum(ratio, axis=1)
+
+    def onset_grid(self) -> np.ndarray:
+        """The number of notes starting at each time unit of each bar
+        (individuals x bars x time units). The time unit is the note unit,
+        or a smaller common divisor if some notes are not on the grid."""
+        offset = self.segments["start_time"] % self.settings.bar_length
+        unit = int(np.gcd.reduce(offset, initial=self.settings.note_unit))
+        unit_number = self.settings.bar_length // unit
+        grid = np.bincount(
+            self.segment_keys * unit_number + offset // unit,
+            minlength=self.size * self.max_bar_number * unit_number,
+        )
+        return grid.reshape(self.size, self.max_bar_number, unit_number)
+
+    def _update_echo(self):
+        # Bar 0 and 2; 1 and 3; 4 and 6; 5 and 7 are echo, etc.
+        # If they have the similar rhythm, the echo will be higher
+        grid = self.onset_grid()
+        left = echo_bars(self.max_bar_number)
+        # the number of notes with the same position in the two bars
+        same = np.sum(grid[:, left] * grid[:, left + 2], axis=2)
+        size = self.bar_count[:, left] * self.bar_count[:, left + 2]
+        similarity = np.zeros(same.shape, dtype=float)
+        np.divide(same**2, size, out=similarity, where=size > 0)
+        # only the bars in the track are considered
+        similarity[left - left % 4 + 3 >= self.bar_number[:, None]] = 0
+        self.echo = np.sum(similarity, axis=1) / self.bar_number
+
+    def _update_long_notes(self):
+        # Too many long notes are not welcomed
+        length = self.segments["length"]
+        half = length == self.settings.half
+        quarter = ~half & (length >= self.settings.quarter)
+        self.long_notes = sequential_sum(self._by_owner(0.5 * half + 0.1 * quarter))
+
+    def _update_neighboring_notes(self):
+        # We don't want a quarter note followed by an eighth note, vice versa
+        diff = np.abs(np.diff(self.notes["length"]))
+        neighboring = (diff == self.settings.half - self.settings.eighth) & (
+            self.owner[:-1] == self.owner[1:]
+        )
+        self.neighboring_notes = np.bincount(
+            self.owner[:-1], neighboring, minlength=self.size
+        )
+
+
 class GAForRhythm(TrackGABase):
-    def __init__(self, population: List[Track], mutation_rate: float):
-        super().__init__(population, mutation_rate)
+    name = "rhythm"
+
+    def __init__(
+        self,
+        population: List[Genome],
+        mutation_rate: float,
+        cache_size: int = fitness_cache_size,
+        rng: Rng_T = None,
+    ):
+        super().__init__(population, mutation_rate, cache_size, rng)
         self.update_fitness()
 
     @staticmethod
-    def get_fitness(track: Track) -> float:
-        param = RhythmParameter(track)
-        f1 = (param.strong_beats - 2 * param.bar_number) * r1 / track.bar_number
+    def get_fitness(track: Genome) -> float:
+        return GAForRhythm._fitness_of_parameter(RhythmParameter(track))
+
+    def get_population_fitness(self, population: List[Genome]) -> np.ndarray:
+        return self._fitness_of_parameter(PopulationRhythmParameter(population))
+
+    @staticmethod
+    def _fitness_of_parameter(
+        param: Union[RhythmParameter, PopulationRhythmParameter]
+    ):
+        f1 = (param.strong_beats - 2 * param.bar_number) * r1 / param.bar_number
         # give encouragement if echo is high
         f2 = param.echo * r2
         # give punishment if there are strong notes on weak beats
@@ -117,22 +234,37 @@ class GAForRhythm(TrackGABase):
         return f1 + f2 + f3 + f4
 
     def crossover(self):
+        # The parents are indexed into bars only once, and the children
+        # splice the notes of two parents at a bar, until a parent is replaced
+        parent_index = {}
+
+        def index_of(index: int) -> BarIndex:
+            notes, bars = parent_index.get(index, (None, None))
+            if notes is not self.population[index].notes:
+                notes = self.population[index].notes
+                bars = self.population[index].index_bars()
+                parent_index[index] = notes, bars
+            return bars
+
         for i in range(len(self.population)):
-            index1 = self.best_index if randint(0, 1) else self.second_index
-            index2 = self.best_index if randint(0, 1) else self.second_index
-            bars1 = deepcopy(self.population[index1]).split_into_bars()
-            bars2 = deepcopy(self.population[index2]).split_into_bars()
-            cross_point = randint(0, self.bar_number // 2 - 1) * 2
-            bars = bars1[:cross_point] + bars2[cross_point:]
-            self.population[i] = self.population[i].join_bars(bars)
+            index1 = self.best_index if self.rng.randint(0, 1) else self.second_index
+            index2 = self.best_index if self.rng.randint(0, 1) else self.second_index
+            bars1, bars2 = index_of(index1), index_of(index2)
+            cross_point = self.rng.randint(0, self.bar_number // 2 - 1) * 2
+            child = self.population[i]
+            child.notes = np.concatenate(
+                (bars1.span(0, cross_point), bars2.span(cross_point, len(bars2)))
+            )
+            child.shared = False
 
     def mutate(self):
         for i in range(len(self.population)):
-            if random() > self.mutation_rate:
+            if self.rng.random() > self.mutation_rate:
                 continue
-            track = deepcopy(
-                self.population[choice([self.best_index, self.second_index])]
-            )
+            with self.phase("copy"):
+                track = self.population[
+                    self.rng.choice([self.best_index, self.second_index])
+                ].clone()
             # When mutating, do not change the last note pitch,
             # because we want the last note to be the tonic.
             # Meanwhile, do not change the first note pitch in every bar,
@@ -150,72 +282,98 @@ class GAForRhythm(TrackGABase):
                     mutation_rate_3,
                     mutation_rate_4,
                 ],
+                self.rng,
             )
-            mutate_type(track)
+            self.apply_mutation(mutate_type, track)
             self.population[i] = track
 
-    def _mutate_1(self, track: Track):
+    def _mutate_1(self, track: Genome):
         # Swap two notes' length
-        idx = randint(0, len(track.note) - 3)
-        note1, note2 = track.note[idx], track.note[idx + 1]
+        idx = self.rng.randint(0, len(track) - 3)
+        start_time, length = track.start_time, track.length
         if (
-            note2.start_time // self.settings.bar_length
-            != note1.start_time // self.settings.bar_length
+            start_time[idx + 1] // self.settings.bar_length
+            != start_time[idx] // self.settings.bar_length
         ):
             # The two notes are in different bars, don't swap them
             return
-        end = note2.end_time
-        note1.length, note2.length = note2.length, note1.length
-        note2.start_time = end - note2.length
+        start_time, length = track.detach().start_time, track.length
+        end = start_time[idx + 1] + length[idx + 1]
+        length[idx], length[idx + 1] = length[idx + 1], length[idx]
+        start_time[idx + 1] = end - length[idx + 1]
 
-    def _mutate_2(self, track: Track):
+    def _mutate_2(self, track: Genome):
         # Split a note into two notes
-        idx = randint(0, len(track.note) - 2)
-        note = track.note[idx]
-        if note.length <= self.settings.note_unit:  # We can't split it
+        idx = self.rng.randint(0, len(track) - 2)
+        note = track.notes[idx]
+        if note["length"] <= self.settings.note_unit:  # We can't split it
             return
         while True:
-            length = choice(self.settings.note_length)
-            if length < note.length:
-                end = note.end_time
-                note.length -= length
-                new_note = Note(note.pitch, length, end - length, note.velocity)
-                track.note.insert(idx + 1, new_note)
+            length = self.rng.choice(self.settings.note_length)
+            if length < note["length"]:
+                end = note["start_time"] + note["length"]
+                new_note = note.copy()
+                new_note["length"] = length
+                new_note["start_time"] = end - length
+                # the inserted array is a new one, change it instead
+                track.notes = np.insert(track.notes, idx + 1, new_note)
+                track.notes["length"][idx] -= length
+                track.shared = False
                 return
+            self.count("mutation_retries")
 
-    def _mutate_3(self, track: Track):
+    def _mutate_3(self, track: Genome):
         # merge two notes into one note
-        idx = randint(0, len(track.note) - 3)
-        note = track.note[idx]
-        if track.note[idx + 1].start_time % self.settings.bar_length == 0:
+        idx = self.rng.randint(0, len(track) - 3)
+        start_time = track.start_time
+        if start_time[idx + 1] % self.settings.bar_length == 0:
             # The next note is at the beginning of a bar, we can't merge it
             return
-        note.length = track.note[idx + 1].end_time - note.start_time
-        track.note.pop(idx + 1)
+        length = track.end_time[idx + 1] - start_time[idx]
+        track.notes = np.delete(track.notes, idx + 1)
+        track.notes["length"][idx] = length
+        track.shared = False
 
-    def _mutate_4(self, track: Track):
+    def _mutate_4(self, track: Genome):
         # copy a bar and paste it to another bar
-        idx = randint(2, track.bar_number - 1)
-        bars = track.split_into_bars()
-        bars[idx - 2] = deepcopy(bars[idx])
-        for note in bars[idx - 2]:
-            note.start_time -= self.settings.bar_length * 2
-        track.join_bars(bars)
-
-    def run(self, generation):
+        idx = self.rng.randint(2, track.bar_number - 1)
+        bars = track.index_bars()
+        bar = bars.bar(idx).copy()
+        bar["start_time"] -= self.settings.bar_length * 2
+        track.notes = np.concatenate(
+            (bars.span(0, idx - 2), bar, bars.span(idx - 1, len(bars)))
+        )
+        track.shared = False
+
+    def run(
+        self,
+        generation: int,
+        stopping: EarlyStopping = None,
+        checkpoint: Checkpoint = None,
+    ):
         print("--------- Start Rhythm Training ---------")
-        succeed = False
-        for i in range(generation):
+        if stopping is not None:
+            stopping.start(self.evaluations)
+        # continue from the generation of a resumed state
+        for i in range(self.generation, generation):
             if i % 30 == 0:
                 print(f"Rhythm generation {i}: " + self.train_info())
             self.epoch()
             if self.fitness[self.best_index] > rhythm_target:
                 print(f"[!] Target reached at generation {i}")
-                succeed = True
+                self.stop_reason = EarlyStopping.TARGET
+                break
+            self.stop_reason = self.check_stop(stopping)
+            if self.stop_reason is not None:
+                print(f"[!] Stopped by {self.stop_reason} at generation {i}")
                 break
-        if not succeed:
+            if checkpoint is not None and checkpoint.due(self):
+                checkpoint.save(self)
+        else:
             print(f"[!] Target not reached after {generation} generations")
+            self.stop_reason = EarlyStopping.GENERATIONS
 
-        print(f"Final fitness for rhythm: {self.fitness[self.best_index]}")
+        self.final_fitness = self.fitness[self.best_index]
+        print(f"Final fitness for rhythm: {self.final_fitness}")
         print("--------- Finish Rhythm Training ---------")
         return self.population[self.best_index]
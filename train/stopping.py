@@ -0,0 +1,75 @@
+from time import perf_counter
+from collections import deque
+
+
+class EarlyStopping:
+    """When to stop a GA run before all the generations, besides reaching
+    the target. Each of them is disabled if None.
+
+    * `patience`: the best fitness has not improved in so many generations.
+    * `window` and `tolerance`: the best fitness has improved by less than
+      `tolerance` (relative to itself) in the last `window` generations.
+    * `time_budget`: the run has taken so many seconds.
+    * `evaluation_budget`: so many individuals have been evaluated.
+
+    `check` returns the reason to stop, one of `STAGNATION`, `PLATEAU`,
+    `TIME` and `EVALUATIONS`, or None to go on. A run may also stop by
+    reaching the `TARGET`, or after all the `GENERATIONS`."""
+
+    TARGET = "target"
+    GENERATIONS = "generations"
+    STAGNATION = "stagnation"
+    PLATEAU = "plateau"
+    TIME = "time"
+    EVALUATIONS = "evaluations"
+
+    def __init__(
+        self,
+        patience: int = None,
+        window: int = None,
+        tolerance: float = 1e-3,
+        time_budget: float = None,
+        evaluation_budget: int = None,
+    ):
+        self.patience = patience
+        self.window = window
+        self.tolerance = tolerance
+        self.time_budget = time_budget
+        self.evaluation_budget = evaluation_budget
+        self.start(0)
+
+    def start(self, evaluations: int):
+        """Reset the state at the start of a run, with the evaluations done."""
+        self.start_time = perf_counter()
+        self.start_evaluations = evaluations
+        self.best = None
+        self.since_improved = 0
+        self.history = deque(maxlen=(self.window or 0) + 1)
+
+    def check(self, fitness: float, evaluations: int) -> str:
+        """Update the state with the best fitness of the generation and
+        the evaluations done, and return the reason to stop if any."""
+        if self.best is None or fitness > self.best:
+            self.best = fitness
+            self.since_improved = 0
+        else:
+            self.since_improved += 1
+        self.history.append(self.best)
+
+        if self.patience is not None and self.since_improved >= self.patience:
+            return self.STAGNATION
+        if self.window is not None and len(self.history) == self.history.maxlen:
+            improved = self.history[-1] - self.history[0]
+            if improved <= self.tolerance * abs(self.history[0]):
+                return self.PLATEAU
+        if (
+            self.time_budget is not None
+            and perf_counter() - self.start_time >= self.time_budget
+        ):
+            return self.TIME
+        if (
+            self.evaluation_budget is not None
+            and evaluations - self.start_evaluations >= self.evaluation_budget
+        ):
+            return self.EVALUATIONS
+        return None
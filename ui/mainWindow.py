@@ -15,6 +15,7 @@ from qframelesswindow import FramelessWindow, TitleBar
 
 from .parseInterface import ParseInterface
 from .trainInterface import TrainInterface
+from .queueInterface import QueueInterface
 from .infoInterface import InfoInterface
 from .config import cfg
 
@@ -111,6 +112,7 @@ class MainWindow(FramelessWindow):
         self.stackWidget = StackedWidget(self)
 
         self.trainInterface = TrainInterface(self)
+        self.queueInterface = QueueInterface(self)
         self.parseInterface = ParseInterface(self)
         self.infoInterface = InfoInterface(self)
 
@@ -127,6 +129,7 @@ class MainWindow(FramelessWindow):
 
     def initNavigation(self):
         self.addSubInterface(self.trainInterface, FluentIcon.SEND, "训练")
+        self.addSubInterface(self.queueInterface, FluentIcon.MENU, "队列")
         self.addSubInterface(self.parseInterface, FluentIcon.MUSIC_FOLDER, "解析")
         self.addSubInterface(self.infoInterface, FluentIcon.INFO, "关于")
 
@@ -168,4 +171,5 @@ class MainWindow(FramelessWindow):
 
     def closeEvent(self, a0: QCloseEvent) -> None:
         super().closeEvent(a0)
+        self.queueInterface.stopAll()
         cfg.save()  # save the configuration when the window is closed
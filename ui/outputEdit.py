@@ -36,6 +36,16 @@ class OutputEdit(PlainTextEdit):
             html = f"<b>{html}</b>"
         self.appendHtml(html)
 
+    def appendTrainLine(self, line: str) -> None:
+        """Append a line of the training output, highlighting the phases
+        and the results."""
+        if line.startswith("----"):
+            self.appendLine(line, "blue", True)
+        elif line.startswith(("[!]", "Final")):
+            self.appendLine(line, "red", True)
+        else:
+            self.appendLine(line)
+
     def printFinal(self):
         finalLine = "Finished. Result saved to " + self.outputPath
         self.appendLine(finalLine, "green", True)
@@ -0,0 +1,322 @@
+import os
+from typing import List
+
+from PyQt5.QtCore import Qt, QUrl, QThread
+from PyQt5.QtWidgets import (
+    QWidget,
+    QVBoxLayout,
+    QHBoxLayout,
+    QFileDialog,
+    QTableWidgetItem,
+    QAbstractItemView,
+    QHeaderView,
+)
+from PyQt5.QtGui import QDesktopServices
+from qfluentwidgets import (
+    PushButton,
+    PrimaryPushButton,
+    InfoBar,
+    BodyLabel,
+    SpinBox,
+    CardWidget,
+    TableWidget,
+    ProgressBar,
+)
+
+from .config import cfg
+from .outputEdit import OutputEdit
+from .trainInterface import TrainConnectionThread, ParameterWindow
+
+
+class TrainJob:
+    """A training job in the queue."""
+
+    WAITING = "等待中"
+    RUNNING = "训练中"
+    DONE = "完成"
+    FAILED = "失败"
+    STOPPED = "已终止"
+
+    def __init__(
+        self,
+        referenceFile: str,
+        outputFile: str,
+        population: int,
+        mutation: float,
+        iteration: int,
+        withCompany: bool,
+    ):
+        self.referenceFile = referenceFile
+        self.outputFile = outputFile
+        self.population = population
+        self.mutation = mutation
+        self.iteration = iteration
+        self.withCompany = withCompany
+        self.status = TrainJob.WAITING
+        self.thread: TrainConnectionThread = None
+        self.lines: List[str] = []  # the output of the training
+        self.progress = 0  # in percent
+        self.info = ""  # the latest progress or the error
+
+    @property
+    def params(self) -> str:
+        return f"种群 {self.population}, 变异率 {self.mutation}, 迭代 {self.iteration}"
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (TrainJob.DONE, TrainJob.FAILED, TrainJob.STOPPED)
+
+
+class QueueInterface(QWidget):
+    """The interface for a queue of training jobs, running at most the
+    given number of them (all the cores by default) at the same time,
+    each in its own process."""
+
+    columns = ["参考文件", "参数", "状态", "进度", "信息"]
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.setObjectName("queueInterface")
+        self.jobs: List[TrainJob] = []
+        self.jobNumber = 0  # the jobs ever added, to name the outputs
+        self.initUi()
+        self.connectSignalToSlot()
+        self.initParameters()
+
+    def initUi(self):
+        # layout
+        self.form = QVBoxLayout(self)
+        self.form.setContentsMargins(16, 20, 16, 20)
+        self.form.setSpacing(0)
+        self.form.setAlignment(Qt.AlignTop)
+
+        # button
+        self.fileLayout = QHBoxLayout()
+        self.fileLayout.setContentsMargins(0, 0, 0, 0)
+        self.addBtn = PrimaryPushButton("添加参考midi")
+        self.addBtn.setFixedWidth(150)
+        self.paramBtn = PushButton("参数设置")
+        self.paramBtn.setFixedWidth(150)
+        self.stopBtn = PushButton("终止选中")
+        self.stopBtn.setFixedWidth(150)
+        self.clearBtn = PushButton("清除已结束")
+        self.clearBtn.setFixedWidth(150)
+        self.fileLayout.addWidget(self.addBtn)
+        self.fileLayout.addWidget(self.paramBtn)
+        self.fileLayout.addWidget(self.stopBtn)
+        self.fileLayout.addWidget(self.clearBtn)
+        self.fileLayout.addStretch(1)
+
+        self.workerLayout = QHBoxLayout()
+        self.workerLayout.setContentsMargins(0, 0, 0, 0)
+        self.workerLabel = BodyLabel("同时训练的任务数", self)
+        self.workerEdit = SpinBox()
+        self.workerEdit.setRange(1, os.cpu_count() or 1)
+        self.workerEdit.setValue(os.cpu_count() or 1)
+        self.workerLayout.addWidget(self.workerLabel)
+        self.workerLayout.addSpacing(10)
+        self.workerLayout.addWidget(self.workerEdit)
+        self.workerLayout.addStretch(1)
+
+        # table
+        self.table = TableWidget(self)
+        self.table.setColumnCount(len(self.columns))
+        self.table.setHorizontalHeaderLabels(self.columns)
+        self.table.verticalHeader().hide()
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(
+            len(self.columns) - 1, QHeaderView.Stretch
+        )
+        self.table.setMinimumHeight(200)
+
+        # output of the selected job
+        self.output = OutputEdit("", self)
+
+        # card
+        self.card = CardWidget(self)
+        self.cardVbox = QVBoxLayout()
+        self.cardVbox.setContentsMargins(25, 20, 25, 20)
+        self.card.setLayout(self.cardVbox)
+        self.cardVbox.addLayout(self.fileLayout)
+        self.cardVbox.addSpacing(10)
+        self.cardVbox.addLayout(self.workerLayout)
+
+        self.form.addWidget(self.card)
+        self.form.addSpacing(20)
+        self.form.addWidget(self.table)
+        self.form.addSpacing(20)
+        self.form.addWidget(self.output)
+        self.setLayout(self.form)
+
+    def connectSignalToSlot(self):
+        self.addBtn.clicked.connect(self.fileDialog)
+        self.paramBtn.clicked.connect(self.showParamWindow)
+        self.stopBtn.clicked.connect(self.stopSelected)
+        self.clearBtn.clicked.connect(self.clearFinished)
+        self.workerEdit.valueChanged.connect(self.schedule)
+        self.table.itemSelectionChanged.connect(self.showSelectedOutput)
+
+    def initParameters(self):
+        self.population = cfg.trainPrams["population"]
+        self.mutation = cfg.trainPrams["mutation"]
+        self.iteration = cfg.trainPrams["iteration"]
+        self.withCompany = cfg.trainPrams["withCompany"]
+
+    def showParamWindow(self):
+        w = ParameterWindow(self)
+        w.yesButton.setText("确定")
+        w.cancelButton.setText("取消")
+        if w.exec():
+            self.population = w.populationEdit.value()
+            self.mutation = w.mutationEdit.value()
+            self.iteration = w.iterationEdit.value()
+            self.withCompany = w.withCompany
+
+    def fileDialog(self):
+        title = "添加训练任务"
+        dialog = QFileDialog(self, title, filter="midi files (*.mid)")
+        dialog.setFileMode(QFileDialog.ExistingFiles)
+        if dialog.exec_():
+            for referenceFile in dialog.selectedFiles():
+                self.addJob(referenceFile)
+            self.schedule()
+
+    def addJob(self, referenceFile: str):
+        """Add a job with the current parameters to the queue."""
+        self.jobNumber += 1
+        name = os.path.splitext(os.path.basename(referenceFile))[0]
+        outputFile = cfg.files["outputFolder"] + f"{name}_{self.jobNumber}.mid"
+        job = TrainJob(
+            referenceFile,
+            outputFile,
+            self.population,
+            self.mutation,
+            self.iteration,
+            self.withCompany,
+        )
+        self.jobs.append(job)
+
+        row = self.table.rowCount()
+        self.table.insertRow(row)
+        self.table.setItem(row, 0, QTableWidgetItem(os.path.basename(referenceFile)))
+        self.table.setItem(row, 1, QTableWidgetItem(job.params))
+        self.table.setItem(row, 2, QTableWidgetItem(job.status))
+        progressBar = ProgressBar(self.table)
+        progressBar.setRange(0, 100)
+        self.table.setCellWidget(row, 3, progressBar)
+        self.table.setItem(row, 4, QTableWidgetItem(job.info))
+
+    def schedule(self):
+        """Start the waiting jobs until enough of them are running."""
+        running = sum(job.status == TrainJob.RUNNING for job in self.jobs)
+        for job in self.jobs:
+            if running >= self.workerEdit.value():
+                break
+            if job.status == TrainJob.WAITING:
+                self.startJob(job)
+                running += 1
+
+    def startJob(self, job: TrainJob):
+        job.status = TrainJob.RUNNING
+        job.info = "正在准备训练..."
+        job.thread = TrainConnectionThread(
+            self,
+            job.referenceFile,
+            job.outputFile,
+            job.population,
+            job.mutation,
+            job.iteration,
+            job.withCompany,
+        )
+        job.thread.trainStatus.connect(
+            lambda status, info: self.jobStatus(job, status, info)
+        )
+        job.thread.outputBuf.connect(lambda buf: self.jobOutput(job, buf))
+        job.thread.trainProgress.connect(lambda info: self.jobProgress(job, info))
+        job.thread.start()
+        job.thread.setPriority(QThread.LowestPriority)
+        self.updateRow(job)
+
+    def jobOutput(self, job: TrainJob, buf: str):
+        lines = [line for line in buf.splitlines() if line]
+        job.lines.extend(lines)
+        if self.selectedJobs() == [job]:
+            for line in lines:
+                self.output.appendTrainLine(line)
+
+    def jobProgress(self, job: TrainJob, info: dict):
+        # the rhythm is the first half, and the pitch is the second
+        half = 50 if info["phase"] == "pitch" else 0
+        job.progress = half + min(50, 50 * info["generation"] // job.iteration)
+        job.info = (
+            f"第 {info['generation']} 代, 最佳适应度 {info['best_fitness']:.4f}, "
+            f"{info['evaluation_rate']:.0f} 次评估/秒"
+        )
+        self.updateRow(job)
+
+    def jobStatus(self, job: TrainJob, status: str, info: str):
+        if status == "0":  # train success
+            job.status, job.progress = TrainJob.DONE, 100
+            job.info = job.outputFile
+        elif status == "1":  # train failed
+            job.status = TrainJob.FAILED
+            job.info = "错误信息: " + (info or "").replace("\n", " ")
+        elif status == "2":  # train stopped
+            job.status = TrainJob.STOPPED
+            job.info = "训练被用户打断"
+        job.thread = None
+        self.updateRow(job)
+        self.schedule()
+
+        if all(other.finished for other in self.jobs):
+            InfoBar.success("队列已完成", "所有训练任务已结束", duration=3000, parent=self)
+            if cfg.openWhenDone:
+                qurl = QUrl.fromLocalFile(cfg.files["outputFolder"])
+                QDesktopServices.openUrl(qurl)
+
+    def updateRow(self, job: TrainJob):
+        row = self.jobs.index(job)
+        self.table.item(row, 2).setText(job.status)
+        self.table.cellWidget(row, 3).setValue(job.progress)
+        self.table.item(row, 4).setText(job.info)
+
+    def selectedJobs(self) -> List[TrainJob]:
+        rows = sorted({index.row() for index in self.table.selectedIndexes()})
+        return [self.jobs[row] for row in rows]
+
+    def stopSelected(self):
+        for job in self.selectedJobs():
+            if job.status == TrainJob.WAITING:
+                job.status = TrainJob.STOPPED
+                job.info = "训练被用户打断"
+                self.updateRow(job)
+            elif job.status == TrainJob.RUNNING:
+                job.info = "正在终止训练..."
+                job.thread.stopTrain()
+                self.updateRow(job)
+
+    def stopAll(self):
+        """Stop all the jobs, e.g. when the window is closed."""
+        for job in self.jobs:
+            if job.status == TrainJob.WAITING:
+                job.status = TrainJob.STOPPED
+            elif job.status == TrainJob.RUNNING:
+                job.thread.stopTrain()
+        for job in self.jobs:
+            if job.thread is not None:
+                job.thread.wait()
+
+    def clearFinished(self):
+        for row in reversed(range(len(self.jobs))):
+            if self.jobs[row].finished:
+                self.table.removeRow(row)
+                del self.jobs[row]
+        self.output.clear()
+
+    def showSelectedOutput(self):
+        self.output.clear()
+        jobs = self.selectedJobs()
+        if len(jobs) == 1:
+            for line in jobs[0].lines:
+                self.output.appendTrainLine(line)
@@ -1,6 +1,6 @@
 import sys
-from time import time
-from multiprocessing import Process, Pipe, freeze_support
+from time import monotonic
+from multiprocessing import Process, Pipe, Event, freeze_support
 from multiprocessing.connection import PipeConnection
 
 from PyQt5.QtCore import Qt, pyqtSignal, QThread, QUrl
@@ -25,8 +25,7 @@ from qfluentwidgets import (
     SwitchButton,
 )
 
-from midoWrapper import Midi
-from train import train
+from train import generate, Progress, ProgressInfo, TrainingCancelled
 from .config import cfg
 from .outputEdit import OutputEdit
 
@@ -80,6 +79,9 @@ class TrainInterface(QWidget):
         self.trainLayout.addWidget(self.stopBtn)
         self.trainLayout.addStretch(1)
 
+        self.progressLabel = BodyLabel(self)
+        self.progressLabel.setVisible(False)
+
         # output
         self.output = OutputEdit("result.mid", self)
 
@@ -93,6 +95,8 @@ class TrainInterface(QWidget):
         self.cardVbox.addWidget(self.fileLabel)
         self.cardVbox.addSpacing(20)
         self.cardVbox.addLayout(self.trainLayout)
+        self.cardVbox.addSpacing(10)
+        self.cardVbox.addWidget(self.progressLabel)
 
         self.form.addWidget(self.card)
         self.form.addSpacing(20)
@@ -142,18 +146,34 @@ class TrainInterface(QWidget):
             return
 
         self.startBtn.setEnabled(False)
+        self.stopBtn.setEnabled(True)
         self.stopBtn.setVisible(True)
+        self.progressLabel.setText("正在准备训练...")
+        self.progressLabel.setVisible(True)
         cfg.trainPrams["population"] = self.population
         cfg.trainPrams["mutation"] = self.mutation
         cfg.trainPrams["iteration"] = self.iteration
         cfg.trainPrams["withCompany"] = self.withCompany
         cfg.files["trainReference"] = self.refName
 
-        self.trainThr = TrainConnectionThread(self)
+        self.trainThr = TrainConnectionThread(
+            self,
+            self.refName,
+            self.output.outputPath,
+            self.population,
+            self.mutation,
+            self.iteration,
+            self.withCompany,
+        )
+        self.trainThr.trainStatus.connect(self.trainStatus)
+        self.trainThr.outputBuf.connect(self.writeBuf)
+        self.trainThr.trainProgress.connect(self.showProgress)
         self.trainThr.start()
         self.trainThr.setPriority(QThread.LowestPriority)
 
     def stopTrain(self):
+        self.stopBtn.setEnabled(False)
+        self.progressLabel.setText("正在终止训练...")
         self.trainThr.stopTrain()
 
     def showParamWindow(self):
@@ -167,14 +187,18 @@ class TrainInterface(QWidget):
             self.withCompany = w.withCompany
 
     def writeBuf(self, buf: str):
-        if buf == "\n":
-            return
-        elif buf.startswith("----"):
-            self.output.appendLine(buf, "blue", True)
-        elif buf.startswith(("[!]", "Final")):
-            self.output.appendLine(buf, "red", True)
-        else:
-            self.output.appendLine(buf)
+        # The output comes in batches of lines
+        for line in buf.splitlines():
+            if line:
+                self.output.appendTrainLine(line)
+
+    def showProgress(self, info: dict):
+        phase = {"rhythm": "节奏", "pitch": "音高"}.get(info["phase"], info["phase"])
+        self.progressLabel.setText(
+            f"{phase}训练: 第 {info['generation']} 代, "
+            f"最佳适应度 {info['best_fitness']:.4f}, "
+            f"{info['evaluation_rate']:.0f} 次评估/秒"
+        )
 
     def trainStatus(self, status: int, info: str):
         if status == "0":  # train success
@@ -201,6 +225,7 @@ class TrainInterface(QWidget):
 
         self.startBtn.setEnabled(True)
         self.stopBtn.setVisible(False)
+        self.progressLabel.setVisible(False)
 
 
 class ParameterWindow(MessageBoxBase):
@@ -243,51 +268,108 @@ class ParameterWindow(MessageBoxBase):
 
 
 class TrainConnectionThread(QThread):
-    """Thread for connection between the training process and the UI"""
+    """Thread for connection between the training process and the UI.
+
+    It blocks on the pipe until a message comes, and checks the process
+    when none comes in `recvTimeout` seconds. Stopping the training asks
+    the process to cancel itself, and terminates it only if it does not
+    stop in `stopTimeout` seconds."""
 
     trainStatus = pyqtSignal(str, str)
     outputBuf = pyqtSignal(str)
+    trainProgress = pyqtSignal(dict)
+
+    recvTimeout = 0.5
+    stopTimeout = 5.0
 
-    def __init__(self, parent: TrainInterface):
+    def __init__(
+        self,
+        parent: QWidget,
+        referenceFile: str,
+        outputFile: str,
+        population: int,
+        mutation: float,
+        iteration: int,
+        withCompany: bool,
+    ):
         super().__init__(parent)
-        self.trainStatus.connect(parent.trainStatus)
-        self.outputBuf.connect(parent.writeBuf)
-        self.recv, self.send = Pipe()
+        self.recv, self.send = Pipe(duplex=False)
+        self.cancel = Event()
+        self.cancelTime = None
         freeze_support()
         self.process = Process(
             target=TrainProcess.run,
             args=(
                 self.send,
-                parent.refName,
-                parent.output.outputPath,
-                parent.population,
-                parent.mutation,
-                parent.iteration,
-                parent.withCompany,
+                self.cancel,
+                referenceFile,
+                outputFile,
+                population,
+                mutation,
+                iteration,
+                withCompany,
             ),
         )
 
     def run(self):
         self.process.start()
-        while True:
-            if self.recv.poll():
-                msg: Protocol = self.recv.recv()
-                if msg.type == "status":  # train finished
-                    self.trainStatus.emit(msg.value, msg.info)
+        # Only the process sends from now on,
+        # so that the pipe is closed when the process exits
+        self.send.close()
+        try:
+            while True:
+                if self.recv.poll(self.recvTimeout):
+                    msg: Protocol = self.recv.recv()
+                    if msg.type == "status":  # train finished
+                        self.trainStatus.emit(msg.value, msg.info)
+                        break
+                    elif msg.type == "buf":
+                        self.outputBuf.emit(msg.value)
+                    elif msg.type == "progress":
+                        self.trainProgress.emit(msg.value)
+                elif self._checkProcess():
                     break
-                elif msg.type == "buf":
-                    self.outputBuf.emit(msg.value)
+        except EOFError:
+            # the process exited without the status
+            self._exited()
+        finally:
+            self.process.join()
+            self.recv.close()
+
+    def _checkProcess(self) -> bool:
+        """Check the process when no message comes, return if it ends."""
+        if not self.process.is_alive():
+            self._exited()
+            return True
+        if (
+            self.cancelTime is not None
+            and monotonic() - self.cancelTime > self.stopTimeout
+        ):
+            # it does not respond to the cancellation, e.g. when parsing
+            self.process.terminate()
+            self.trainStatus.emit("2", None)
+            return True
+        return False
+
+    def _exited(self):
+        if self.cancel.is_set():
+            self.trainStatus.emit("2", None)
+        else:
+            self.trainStatus.emit("1", "训练进程意外退出")
 
     def stopTrain(self):
-        self.trainStatus.emit("2", None)
-        self.process.terminate()
-        self.terminate()
+        self.cancelTime = monotonic()
+        self.cancel.set()
 
 
 class Protocol:
-    """Protocol between the training process and the UI."""
+    """Protocol between the training process and the UI.
+
+    The types are `buf` (lines of the output), `progress` (a dict of
+    `ProgressInfo`) and `status` (0 for success, 1 for failure and
+    2 for being stopped, with the error in `info`)."""
 
-    def __init__(self, msg_type: str, value: str, info: str = None):
+    def __init__(self, msg_type: str, value, info: str = None):
         self.type = msg_type
         self.value = value
         self.info = info
@@ -296,9 +378,13 @@ class Protocol:
 class TrainProcess:
     """Multiprocessing process for training."""
 
+    # seconds between two progress messages
+    progressInterval = 0.5
+
     @staticmethod
     def run(
         connect: PipeConnection,
+        cancel: Event,
         referenceFile: str,
         outputFile: str,
         population: int,
@@ -307,45 +393,69 @@ class TrainProcess:
         withCompany: bool,
     ):
         orignal = sys.stdout
-        sys.stdout = RedirectStdout(connect)
-
-        try:
-            t_start = time()
+        sys.stdout = output = RedirectStdout(connect)
 
-            refmidi = Midi.from_midi(referenceFile)
-            ref_track, left_hand = refmidi.tracks
-            result = train(ref_track, population, mutation, iteration)
+        def sendProgress(info: ProgressInfo):
+            # send the output before it, to keep the order
+            output.flush()
+            connect.send(Protocol("progress", info.to_dict()))
 
-            s = Midi(ref_track.sts)
-            s.sts.bpm = 120
-            s.tracks.append(result)
-
-            # accompaniment (stolen from reference)
-            if withCompany:
-                for note in left_hand.note:
-                    note.velocity = ref_track.sts.velocity
-                s.tracks.append(left_hand)
+        progress = Progress(sendProgress, TrainProcess.progressInterval, cancel.is_set)
+        # kept if the process is stopped by a BaseException, like SystemExit
+        status = Protocol("status", "1", "The training process is interrupted")
+        try:
+            generate(
+                referenceFile,
+                outputFile,
+                population,
+                mutation,
+                iteration,
+                withCompany,
+                progress=progress,
+            )
+            status = Protocol("status", "0")
 
-            s.save_midi(outputFile)
-            print(f"Time cost: {time() - t_start}s")
-            connect.send(Protocol("status", "0"))
+        except TrainingCancelled:
+            status = Protocol("status", "2")
 
         except Exception as e:
-            connect.send(Protocol("status", "1", str(e)))
+            status = Protocol("status", "1", str(e))
 
         finally:
+            output.flush()
             sys.stdout = orignal
+            connect.send(status)
+            connect.close()
 
 
 class RedirectStdout:
-    """IO redirection for the training process"""
+    """IO redirection for the training process.
+
+    The output is sent in batches of whole lines, at most once
+    every `interval` seconds, and all of it when flushed."""
 
-    def __init__(self, connect: PipeConnection):
+    def __init__(self, connect: PipeConnection, interval: float = 0.2):
         self.stdout = sys.stdout
         self.connect = connect
+        self.interval = interval
+        self.buffer = []
+        self.lastSend = 0.0
 
     def write(self, text: str):
-        self.connect.send(Protocol("buf", text))
+        self.buffer.append(text)
+        if "\n" in text and monotonic() - self.lastSend >= self.interval:
+            text = "".join(self.buffer)
+            end = text.rindex("\n") + 1
+            # keep the unfinished line for the next batch
+            self.buffer = [text[end:]] if end < len(text) else []
+            self._send(text[:end])
 
     def flush(self):
-        pass
+        text = "".join(self.buffer)
+        self.buffer = []
+        if text:
+            self._send(text)
+
+    def _send(self, text: str):
+        self.connect.send(Protocol("buf", text))
+        self.lastSend = monotonic()